@@ -660,7 +660,10 @@ class GridRandomSearchNode(ContextCompositeNode):
             data_store = {}
             for key in inputs.keys():
                 v = inputs[key]
-                if isinstance(v, cudf.DataFrame):
+                if key in self.input_refs:
+                    # already in the object store of the ray executor
+                    data_store[key] = self.input_refs[key]
+                elif isinstance(v, cudf.DataFrame):
                     # it is a work around,
                     # the ray.put doesn't support GPU cudf
                     data_store[key] = ray.put(v.to_pandas())
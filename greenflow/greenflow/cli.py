@@ -0,0 +1,131 @@
+import re
+import sys
+import time
+import argparse
+
+from greenflow.dataframe_flow._disk_cache import DiskCache
+from greenflow.dataframe_flow._plugin_manifest import write_manifest
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(size):
+    '''Parse a size like 100, 512K, 10M or 2G to bytes.'''
+    match = re.fullmatch(r'\s*(\d+(?:\.\d*)?)\s*([KMGT]?)I?B?\s*',
+                         size.upper())
+    if match is None:
+        raise argparse.ArgumentTypeError('invalid size "{}"'.format(size))
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+
+def format_size(nbytes):
+    if nbytes < 1024:
+        return '{}B'.format(nbytes)
+    for unit in ('K', 'M', 'G', 'T'):
+        nbytes /= 1024
+        if nbytes < 1024:
+            break
+    return '{:.1f}{}'.format(nbytes, unit)
+
+
+def format_time(seconds):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(seconds))
+
+
+def cache_list(cache, args):
+    entries = cache.entries()
+    keys = sorted(entries, key=lambda k: entries[k]['accessed'],
+                  reverse=True)
+    print('{:<40}  {:<24}  {:>8}  {:<19}  {:<19}'.format(
+        'key', 'task', 'size', 'created', 'accessed'))
+    for key in keys:
+        entry = entries[key]
+        print('{:<40}  {:<24}  {:>8}  {:<19}  {:<19}'.format(
+            key, entry['task_id'], format_size(entry['nbytes']),
+            format_time(entry['created']), format_time(entry['accessed'])))
+    print('{} entries, {}'.format(
+        len(entries),
+        format_size(sum(entry['nbytes'] for entry in entries.values()))))
+    return 0
+
+
+def cache_prune(cache, args):
+    if args.max_bytes is None and args.max_entries is None:
+        # prune everything
+        args.max_entries = 0
+    removed = cache.prune(max_bytes=args.max_bytes,
+                          max_entries=args.max_entries)
+    print('removed {} entries'.format(len(removed)))
+    return 0
+
+
+def cache_verify(cache, args):
+    broken = cache.verify(remove=args.remove)
+    for key, problem in sorted(broken.items()):
+        print('{}: {}'.format(key, problem))
+    if args.remove and broken:
+        print('removed {} entries'.format(len(broken)))
+    print('{} broken entries'.format(len(broken)))
+    return 1 if broken and not args.remove else 0
+
+
+def manifest(args):
+    for package in args.package:
+        filename = write_manifest(package, filename=args.output)
+        print('wrote {}'.format(filename))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='greenflow',
+                                     description='greenflow utilities')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    cache_parser = commands.add_parser(
+        'cache', help='manage the persistent result cache')
+    cache_parser.add_argument(
+        '--cache-dir', default=None,
+        help='the result cache directory, defaults to '
+        '$GREENFLOW_CACHE_DIR/results')
+    cache_commands = cache_parser.add_subparsers(dest='cache_command')
+    cache_commands.required = True
+
+    list_parser = cache_commands.add_parser(
+        'list', help='list the entries, most recently used first')
+    list_parser.set_defaults(fun=cache_list)
+
+    prune_parser = cache_commands.add_parser(
+        'prune', help='evict the least recently used entries, all of them '
+        'if no limit is given')
+    prune_parser.add_argument('--max-bytes', type=parse_size, default=None,
+                              help='keep at most this size, e.g. 10G')
+    prune_parser.add_argument('--max-entries', type=int, default=None,
+                              help='keep at most this number of entries')
+    prune_parser.set_defaults(fun=cache_prune)
+
+    verify_parser = cache_commands.add_parser(
+        'verify', help='check the entry files against the manifest')
+    verify_parser.add_argument('--remove', action='store_true',
+                               help='remove the broken entries')
+    verify_parser.set_defaults(fun=cache_verify)
+    cache_parser.set_defaults(
+        run=lambda args: args.fun(DiskCache(args.cache_dir), args))
+
+    manifest_parser = commands.add_parser(
+        'manifest', help='write the node type manifest of plugin packages, '
+        'so only the modules of the node types in use are imported')
+    manifest_parser.add_argument('package', nargs='+',
+                                 help='top level package of the plugin')
+    manifest_parser.add_argument(
+        '--output', default=None,
+        help='the manifest file, defaults to greenflow_manifest.json in '
+        'the package directory')
+    manifest_parser.set_defaults(run=manifest)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
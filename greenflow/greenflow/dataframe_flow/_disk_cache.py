@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import fcntl
+import pickle
+import hashlib
+import threading
+from contextlib import contextmanager
+
+__all__ = ['DiskCache', 'get_disk_cache']
+
+MANIFEST = 'manifest.json'
+# sub-directory of the node cache directory
+RESULTS_DIR = 'results'
+
+
+def _file_digest(filename):
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache(object):
+    '''
+    Persistent cache of node outputs keyed by the content address of the
+    node, see `TaskGraph.run` memoize option. Each entry is a pickle file
+    of the outputs dict. The manifest keeps per entry:
+        task_id: the task that computed the outputs
+        ports: the output port names
+        nbytes: size of the entry file
+        sha1: checksum of the entry file
+        created: creation time (seconds since epoch)
+        accessed: last access time (seconds since epoch)
+
+    The manifest is updated under a file lock, so several processes can
+    share the cache directory.
+    '''
+    # serialize the manifest updates among the threads of a process
+    _lock = threading.Lock()
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            from .node import Node
+            cache_dir = os.path.join(
+                os.getenv('GREENFLOW_CACHE_DIR', Node.cache_dir),
+                RESULTS_DIR)
+        self.cache_dir = cache_dir
+
+    def __entry_file(self, key):
+        return os.path.join(self.cache_dir, key + '.pkl')
+
+    @contextmanager
+    def __manifest(self, write=True):
+        '''Lock and load the manifest, save it back on exit if `write`.'''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._lock, \
+                open(os.path.join(self.cache_dir, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+            filename = os.path.join(self.cache_dir, MANIFEST)
+            try:
+                with open(filename) as f:
+                    entries = json.load(f)
+            except (FileNotFoundError, ValueError):
+                entries = {}
+            yield entries
+            if write:
+                tmpname = filename + '.tmp'
+                with open(tmpname, 'w') as f:
+                    json.dump(entries, f, indent=1, sort_keys=True)
+                os.replace(tmpname, filename)
+
+    def entries(self):
+        '''
+        returns
+            dict, the manifest entries keyed by cache key
+        '''
+        with self.__manifest(write=False) as entries:
+            return entries
+
+    def __contains__(self, key):
+        return key in self.entries()
+
+    def get(self, key):
+        '''
+        returns
+            dict, the outputs keyed by output port name or None if the key
+            is not cached. An entry that can not be loaded is removed, e.g.
+            one pickled with a class that was since renamed, so that the
+            outputs are computed and cached again.
+        '''
+        if key not in self.entries():
+            return None
+        try:
+            with open(self.__entry_file(key), 'rb') as f:
+                outputs = pickle.load(f)
+        except Exception:
+            # removed or corrupted behind our back, or its classes can not
+            # be imported anymore
+            self.remove([key])
+            return None
+        with self.__manifest() as entries:
+            if key in entries:
+                entries[key]['accessed'] = time.time()
+        return outputs
+
+    def put(self, key, outputs, task_id=''):
+        '''
+        Write the outputs of a node to the cache.
+        returns
+            boolean, whether the outputs are cached or not. Outputs that can
+            not be pickled are not cached.
+        '''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        filename = self.__entry_file(key)
+        tmpname = '{}.{}.{}.tmp'.format(filename, os.getpid(),
+                                        threading.get_ident())
+        try:
+            with open(tmpname, 'wb') as f:
+                pickle.dump(outputs, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+            return False
+        now = time.time()
+        entry = {
+            'task_id': task_id,
+            'ports': sorted(outputs.keys()),
+            'nbytes': os.path.getsize(tmpname),
+            'sha1': _file_digest(tmpname),
+            'created': now,
+            'accessed': now
+        }
+        os.replace(tmpname, filename)
+        with self.__manifest() as entries:
+            entries[key] = entry
+        return True
+
+    def remove(self, keys):
+        '''Remove the entries of the `keys` from the cache.'''
+        with self.__manifest() as entries:
+            for key in keys:
+                entries.pop(key, None)
+                if os.path.exists(self.__entry_file(key)):
+                    os.remove(self.__entry_file(key))
+
+    def prune(self, max_bytes=None, max_entries=None):
+        '''
+        Evict the least recently used entries until the cache holds at most
+        `max_bytes` and `max_entries`.
+        returns
+            list, the removed keys
+        '''
+        with self.__manifest() as entries:
+            lru = sorted(entries, key=lambda k: entries[k]['accessed'])
+            nbytes = sum(entry['nbytes'] for entry in entries.values())
+            removed = []
+            for key in lru:
+                if (max_bytes is None or nbytes <= max_bytes) and \
+                        (max_entries is None or
+                         len(entries) <= max_entries):
+                    break
+                nbytes -= entries.pop(key)['nbytes']
+                if os.path.exists(self.__entry_file(key)):
+                    os.remove(self.__entry_file(key))
+                removed.append(key)
+        return removed
+
+    def verify(self, remove=False):
+        '''
+        Check that every entry file exists and matches its checksum.
+        returns
+            dict, the problem of each broken entry keyed by cache key
+        '''
+        broken = {}
+        for key, entry in self.entries().items():
+            filename = self.__entry_file(key)
+            if not os.path.exists(filename):
+                broken[key] = 'missing file'
+            elif os.path.getsize(filename) != entry['nbytes']:
+                broken[key] = 'size mismatch'
+            elif _file_digest(filename) != entry['sha1']:
+                broken[key] = 'checksum mismatch'
+        if remove and broken:
+            self.remove(broken.keys())
+        return broken
+
+
+def get_disk_cache():
+    '''The disk cache in the `GREENFLOW_CACHE_DIR` directory.'''
+    return DiskCache()
@@ -0,0 +1,781 @@
+import pickle
+import operator
+import tracemalloc
+import uuid
+from collections import deque, Counter
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor,
+                                Future, wait, FIRST_COMPLETED)
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import cloudpickle
+import dask
+
+from ._node_flow import OUTPUT_ID
+from ._result_cache import register_sizeof, nbytes_or_none
+
+__all__ = ['register_executor', 'get_executor', 'topological_order',
+           'FlowEvents', 'LiveOutputs', 'dask_graph', 'dask_port_output']
+
+# dictionary of graph executors of function signiture
+# (nodes, progress_fun, max_workers, events) -> None
+_EXECUTORS = {}
+
+# buffers smaller than this are kept inside the pickle stream
+SHM_MIN_BYTES = 64 * 1024
+
+
+def register_executor(name: str,
+                      fun) -> None:
+    _EXECUTORS[name] = fun
+
+
+def get_executor(name: str):
+    if name not in _EXECUTORS:
+        raise ValueError('Unknown executor "{}". Available executors: {}'
+                         .format(name, sorted(_EXECUTORS.keys())))
+    return _EXECUTORS[name]
+
+
+def topological_order(nodes):
+    '''
+    Sort the nodes so every node comes after all of its parents, using
+    in-degree counters (Kahn's algorithm). It is O(V+E). Only the edges
+    between the given nodes are considered. Nodes that are part of a cycle
+    are left out of the order.
+
+    Arguments
+    -------
+    nodes: list
+        the nodes of the graph. Nodes without dependencies keep their
+        relative order.
+    Returns
+    -----
+    list
+        the nodes in topological order
+    '''
+    in_degree = {node: 0 for node in nodes}
+    for node in nodes:
+        for node_in in node.inputs:
+            if node_in['from_node'] in in_degree:
+                in_degree[node] += 1
+
+    queue = deque(node for node in nodes if in_degree[node] == 0)
+    order = []
+    while queue:
+        node = queue.popleft()
+        order.append(node)
+        for node_out in node.outputs:
+            child = node_out['to_node']
+            if child not in in_degree:
+                continue
+            in_degree[child] -= 1
+            if in_degree[child] == 0:
+                queue.append(child)
+    return order
+
+
+def _consumers(nodes):
+    '''Number of consuming edges per output port (node, port) among the
+    nodes. The flow roots do not consume their inputs.
+    '''
+    consumers = Counter()
+    participating = set(nodes)
+    for node in nodes:
+        if node.is_flow_root():
+            continue
+        for node_in in node.inputs:
+            if node_in['from_node'] in participating:
+                consumers[(node_in['from_node'], node_in['from_port'])] += 1
+    return consumers
+
+
+class FlowEvents(object):
+    '''
+    Receives the events of a flow. The executors call the methods from the
+    thread running the executor, before a node is computed (or submitted to
+    a worker) and once its outputs are available.
+    '''
+
+    def node_start(self, node):
+        pass
+
+    def node_end(self, node, output_df):
+        pass
+
+
+class LiveOutputs(FlowEvents):
+    '''
+    Reference counts the output ports by their number of downstream
+    consumers. An output is live from the end of its node until the last
+    consumer has started, which is when the consumers drop their reference
+    to it. It keeps track of the peak number of live bytes.
+    '''
+
+    def __init__(self, nodes):
+        self.consumers = _consumers(nodes)
+        # {(node, port): nbytes}
+        self.live = {}
+        self.live_bytes = 0
+        self.peak_bytes = 0
+        self.peak_task = None
+        self.peak_ports = []
+        self.total_bytes = 0
+        # output ports of unknown size, e.g. lazy dask collections
+        self.unsized_ports = []
+
+    def node_end(self, node, output_df):
+        # the output collector has no outputs
+        output_df = {} if output_df is None else output_df
+        for oport, out in output_df.items():
+            key = (node, oport)
+            if self.consumers[key] == 0:
+                # nobody holds on to it
+                continue
+            nbytes = nbytes_or_none(out)
+            if nbytes is None:
+                self.unsized_ports.append('{}.{}'.format(node.uid, oport))
+                continue
+            self.live[key] = nbytes
+            self.live_bytes += nbytes
+            self.total_bytes += nbytes
+        if self.live_bytes > self.peak_bytes:
+            self.peak_bytes = self.live_bytes
+            self.peak_task = node.uid
+            self.peak_ports = ['{}.{}'.format(lnode.uid, lport)
+                               for lnode, lport in self.live]
+
+    def node_start(self, node):
+        if node.is_flow_root():
+            return
+        for node_in in node.inputs:
+            key = (node_in['from_node'], node_in['from_port'])
+            if key not in self.live:
+                continue
+            self.consumers[key] -= 1
+            if self.consumers[key] == 0:
+                self.live_bytes -= self.live.pop(key)
+
+    def report(self):
+        '''
+        returns
+            dict, the peak live bytes, the task that completed at the peak,
+            the output ports live at the peak, the total bytes of the
+            consumed outputs and the output ports of unknown size, which are
+            not counted
+        '''
+        return {'peak_bytes': self.peak_bytes,
+                'peak_task': self.peak_task,
+                'peak_ports': self.peak_ports,
+                'total_bytes': self.total_bytes,
+                'unsized_ports': self.unsized_ports}
+
+
+def _pending_inputs(nodes):
+    '''Number of incoming edges each node is waiting on before it can be
+    computed. The flow roots do not wait on anything.
+    '''
+    return {node: 0 if node.is_flow_root() else len(node.inputs)
+            for node in nodes}
+
+
+def _flow_with_pool(nodes, submit, progress_fun=None, events=None):
+    '''
+    Submit each node as soon as all of its input ports are filled and pass
+    the outputs to the children nodes as the futures complete. The
+    bookkeeping is done in the calling thread.
+
+    Arguments
+    -------
+    nodes: list
+        the nodes that participate in the computation
+    submit: function
+        takes a node whose inputs are ready and returns a Future of its
+        outputs
+    progress_fun: function
+        called with the node id when the node is submitted
+    events: FlowEvents
+        receives the flow events
+    '''
+    events = FlowEvents() if events is None else events
+    pending = _pending_inputs(nodes)
+    futures = {}
+
+    def submit_node(node):
+        if progress_fun is not None:
+            progress_fun(node.uid)
+        events.node_start(node)
+        futures[submit(node)] = node
+
+    for node in nodes:
+        if pending[node] == 0:
+            submit_node(node)
+
+    try:
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for fut in done:
+                node = futures.pop(fut)
+                output_df = fut.result()
+                events.node_end(node, output_df)
+                for child in node.flow_outputs(output_df):
+                    if child not in pending or pending[child] == 0:
+                        # not participating or a flow root
+                        continue
+                    pending[child] -= 1
+                    if pending[child] == 0:
+                        submit_node(child)
+    except BaseException:
+        for fut in futures:
+            fut.cancel()
+        raise
+
+
+def run_serial(nodes, progress_fun=None, max_workers=None, events=None):
+    '''
+    Flow the nodes one after another in a flat loop.
+
+    Arguments
+    -------
+    nodes: list
+        the nodes that participate in the computation in topological order
+    progress_fun: function
+        called with the node id before the node is computed
+    max_workers: int
+        not used
+    events: FlowEvents
+        receives the flow events
+    '''
+    events = FlowEvents() if events is None else events
+    for node in nodes:
+        if progress_fun is not None:
+            progress_fun(node.uid)
+        events.node_start(node)
+        output_df = node.flow_call()
+        events.node_end(node, output_df)
+        node.flow_outputs(output_df)
+        del output_df
+
+
+def run_threads(nodes, progress_fun=None, max_workers=None, events=None):
+    '''
+    Flow the nodes using a thread pool. Independent branches of the graph
+    overlap whenever the node computations release the GIL. Only
+    `flow_call` runs in the worker threads.
+
+    Arguments
+    -------
+    nodes: list
+        the nodes that participate in the computation
+    progress_fun: function
+        called with the node id when the node is submitted
+    max_workers: int
+        maximum number of threads, defaults to ThreadPoolExecutor default
+    events: FlowEvents
+        receives the flow events
+    '''
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        _flow_with_pool(nodes, lambda node: pool.submit(node.flow_call),
+                        progress_fun, events)
+
+
+class SharedObject(object):
+    '''An object serialized with pickle protocol 5. Large buffers, e.g. the
+    numpy arrays backing a DataFrame, are kept out-of-band in shared memory
+    blocks so the object is written once and every consumer process maps the
+    same memory.
+    '''
+
+    def __init__(self, obj):
+        blocks = []
+
+        def buffer_callback(buf):
+            raw = buf.raw()
+            if raw.nbytes < SHM_MIN_BYTES:
+                # keep it in-band
+                return True
+            shm = SharedMemory(create=True, size=raw.nbytes)
+            shm.buf[:raw.nbytes] = raw
+            blocks.append((shm.name, raw.nbytes))
+            shm.close()
+            return False
+
+        self.header = pickle.dumps(obj, protocol=5,
+                                   buffer_callback=buffer_callback)
+        self.blocks = blocks
+
+    def load(self, copy=False):
+        '''
+        Unpickle the object. The out-of-band buffers are read-only views of
+        the shared memory unless `copy` is set.
+        returns
+            the object, list of attached SharedMemory
+        '''
+        buffers = []
+        attached = []
+        for name, nbytes in self.blocks:
+            shm = SharedMemory(name=name)
+            if copy:
+                buffers.append(bytearray(shm.buf[:nbytes]))
+                shm.close()
+            else:
+                buffers.append(shm.buf[:nbytes].toreadonly())
+                attached.append(shm)
+        return pickle.loads(self.header, buffers=buffers), attached
+
+    def unlink(self):
+        for name, _ in self.blocks:
+            try:
+                shm = SharedMemory(name=name)
+            except FileNotFoundError:
+                continue
+            shm.close()
+            shm.unlink()
+
+
+register_sizeof(SharedObject, lambda shared: len(shared.header) + sum(
+    nbytes for _, nbytes in shared.blocks))
+
+
+class _SharedRelease(FlowEvents):
+    '''Unlinks the shared memory blocks of an output port as soon as all
+    its consumers are done. It forwards the events to `events`.
+    '''
+
+    def __init__(self, nodes, events):
+        self.consumers = _consumers(nodes)
+        # {(node, port): SharedObject}
+        self.shared = {}
+        self.events = events
+
+    def node_start(self, node):
+        self.events.node_start(node)
+
+    def node_end(self, node, output_df):
+        self.events.node_end(node, output_df)
+        if not node.is_flow_root():
+            for node_in in node.inputs:
+                key = (node_in['from_node'], node_in['from_port'])
+                if key not in self.shared:
+                    continue
+                self.consumers[key] -= 1
+                if self.consumers[key] == 0:
+                    self.shared.pop(key).unlink()
+        if output_df is None:
+            # the output collector
+            return
+        for oport, shared in output_df.items():
+            if not isinstance(shared, SharedObject):
+                continue
+            if self.consumers[(node, oport)] > 0:
+                self.shared[(node, oport)] = shared
+            else:
+                shared.unlink()
+
+
+# worker process state
+_WORKER_NODES = {}
+_WORKER_ATTACHED = []
+
+
+def _init_process_worker(nodes_pickle):
+    _WORKER_NODES.clear()
+    for node in cloudpickle.loads(nodes_pickle):
+        _WORKER_NODES[node.uid] = node
+
+
+def _release_attached():
+    '''Close the shared memory mappings that are no longer referenced.'''
+    still_used = []
+    for shm in _WORKER_ATTACHED:
+        try:
+            shm.close()
+        except BufferError:
+            still_used.append(shm)
+    _WORKER_ATTACHED[:] = still_used
+
+
+def _process_call(uid, shared_inputs):
+    '''Runs in the worker process. Returns the shared outputs and the
+    profile record of the node.'''
+    _release_attached()
+    node = _WORKER_NODES[uid]
+    if node.profile_record is not None and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    inputs = {}
+    for iport, shared in shared_inputs.items():
+        inputs[iport], attached = shared.load()
+        _WORKER_ATTACHED.extend(attached)
+    output_df = node(inputs)
+    del inputs
+    return ({oport: SharedObject(out) for oport, out in output_df.items()},
+            node.profile_record)
+
+
+class _WorkerFuture(Future):
+    '''
+    Future of the outputs of a node computed in a worker process. It takes
+    the profile record of the node back from the worker before it is done.
+    '''
+
+    def __init__(self, node, fut):
+        super().__init__()
+        self.__fut = fut
+        fut.add_done_callback(lambda fut: self.__set(node, fut))
+
+    def __set(self, node, fut):
+        if fut.cancelled():
+            super().cancel()
+            return
+        if fut.exception() is not None:
+            self.set_exception(fut.exception())
+            return
+        output_df, record = fut.result()
+        if record is not None:
+            node.profile_record = record
+        self.set_result(output_df)
+
+    def cancel(self):
+        return self.__fut.cancel()
+
+
+def run_processes(nodes, progress_fun=None, max_workers=None, events=None):
+    '''
+    Flow the nodes using a process pool. It helps the nodes that hold the
+    GIL, e.g. pure python or pandas groupby-apply computations.
+
+    The nodes are pickled once with cloudpickle, using the
+    `NodeTaskGraphMixin.__getstate__`, and sent to every worker process when
+    it starts. The outputs stay in shared memory blocks while they flow
+    between worker processes. They are only unpickled in the main process
+    for the output collector. The blocks are unlinked once all the consumers
+    of the output are done.
+
+    Arguments
+    -------
+    nodes: list
+        the nodes that participate in the computation
+    progress_fun: function
+        called with the node id when the node is submitted
+    max_workers: int
+        maximum number of processes, defaults to the number of CPUs
+    events: FlowEvents
+        receives the flow events
+    '''
+    events = _SharedRelease(
+        nodes, FlowEvents() if events is None else events)
+    # the worker processes share the resource tracker with this process
+    resource_tracker.ensure_running()
+    nodes_pickle = cloudpickle.dumps(
+        [node for node in nodes if node.uid != OUTPUT_ID])
+    shared_objs = []
+
+    def call_local(node):
+        fut = Future()
+        try:
+            inputs = {}
+            for iport, shared in node.input_df.items():
+                inputs[iport], _ = shared.load(copy=True)
+            node.input_df = inputs
+            fut.set_result(node.flow_call())
+        except BaseException as e:
+            fut.set_exception(e)
+        return fut
+
+    def track_shared(fut):
+        if not fut.cancelled() and fut.exception() is None:
+            shared_objs.extend(fut.result().values())
+
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_init_process_worker,
+                                 initargs=(nodes_pickle,)) as pool:
+
+            def submit(node):
+                if node.uid == OUTPUT_ID:
+                    return call_local(node)
+                shared_inputs = node.input_df
+                if node.clear_input:
+                    node.input_df = {}
+                fut = _WorkerFuture(
+                    node, pool.submit(_process_call, node.uid, shared_inputs))
+                fut.add_done_callback(track_shared)
+                return fut
+
+            _flow_with_pool(nodes, submit, progress_fun, events)
+    finally:
+        # the pool has shut down, no worker holds on to the blocks anymore
+        for shared in shared_objs:
+            shared.unlink()
+
+
+def _port_output(output_df, oport, uid, to_uid=None):
+    '''The output at port `oport` of node `uid`, the whole outputs
+    dictionary if `oport` is None.'''
+    if oport is None:
+        return output_df
+    if oport not in output_df:
+        if to_uid in (None, OUTPUT_ID):
+            onode_msg = 'is listed in task-graph outputs'
+        else:
+            onode_msg = 'is required as input to node "{}"'.format(to_uid)
+        raise Exception('ERROR: Missing output port "{}" from node "{}". '
+                        'This output {}.'.format(oport, uid, onode_msg))
+    return output_df[oport]
+
+
+def dask_port_output(result, oport, uid, to_uid=None):
+    '''
+    The output at port `oport` of the dask task of node `uid`, the whole
+    outputs dictionary if `oport` is None. Used for delayed unpacking.
+    '''
+    return _port_output(result[0], oport, uid, to_uid)
+
+
+def _dask_flow_call(nodes, uid, parents):
+    '''Runs in the dask worker. Returns the outputs and the profile record
+    of the node.'''
+    node = nodes[uid]
+    node.input_df = {
+        iport: dask_port_output(result, oport, parent_uid, uid)
+        for iport, (result, oport, parent_uid) in parents.items()}
+    output_df = node.flow_call()
+    return output_df, node.profile_record
+
+
+def dask_graph(nodes):
+    '''
+    Turn the nodes into a dask graph with one task per node. The task of a
+    node depends on the tasks of its parents through the port connections,
+    except for the flow roots. The nodes are shipped to the dask workers
+    once, with the first task that needs them.
+
+    Arguments
+    -------
+    nodes: list
+        the nodes that participate in the computation, the parents of a
+        node that is not a flow root must be part of it
+
+    returns
+        dict, {node: dask Delayed of the tuple (outputs dict, profile
+        record)}. Use `dask_port_output` to get the output of a port.
+    '''
+    token = uuid.uuid4().hex
+    nodes_dly = dask.delayed({node.uid: node for node in nodes},
+                             name='greenflow-nodes-{}'.format(token),
+                             traverse=False)
+    graph = {}
+    for node in topological_order(nodes):
+        parents = {}
+        if not node.is_flow_root():
+            for node_in in node.inputs:
+                parent = node_in['from_node']
+                parents[node_in['to_port']] = (
+                    graph[parent], node_in['from_port'], parent.uid)
+        graph[node] = dask.delayed(_dask_flow_call, pure=False)(
+            nodes_dly, node.uid, parents,
+            dask_key_name='{}-{}'.format(node.uid, token))
+    return graph
+
+
+def run_dask(nodes, progress_fun=None, max_workers=None, events=None):
+    '''
+    Flow the nodes as one dask graph with a task per node, on the dask
+    scheduler in use. That is the distributed cluster of the default
+    `dask.distributed.Client`, e.g. a `LocalCluster`, otherwise the local
+    threaded scheduler. Independent nodes run concurrently and the
+    intermediate outputs stay on the workers, only the outputs of the
+    task graph are gathered.
+
+    The nodes flow on copies of the nodes on a distributed cluster, the
+    result cache of memoize is the one of the worker processes then. The
+    profile records are taken back from the workers.
+
+    Arguments
+    -------
+    nodes: list
+        the nodes that participate in the computation
+    progress_fun: function
+        called with the node id when the graph is submitted
+    max_workers: int
+        number of workers of the local dask schedulers
+    events: FlowEvents
+        receives the flow events. The outputs stay on the workers, the
+        node_end event is sent once the graph is computed with an empty
+        outputs dictionary, except for the output collector.
+    '''
+    events = FlowEvents() if events is None else events
+    collectors = [node for node in nodes if node.uid == OUTPUT_ID]
+    graph = dask_graph([node for node in nodes if node.uid != OUTPUT_ID])
+    for node in graph:
+        if progress_fun is not None:
+            progress_fun(node.uid)
+        events.node_start(node)
+
+    # only the ports picked up by the output collector are gathered
+    collected = []
+    for collector in collectors:
+        for node_in in collector.inputs:
+            parent = node_in['from_node']
+            if parent not in graph:
+                continue
+            collected.append((collector, node_in['to_port'], dask.delayed(
+                dask_port_output, pure=True)(graph[parent],
+                                             node_in['from_port'],
+                                             parent.uid)))
+    profiled = [node for node in graph if node.profile_record is not None]
+    kwargs = {} if max_workers is None else {'num_workers': max_workers}
+    outputs, records = dask.compute(
+        [dly for _, _, dly in collected],
+        [dask.delayed(operator.itemgetter(1))(graph[node])
+         for node in profiled], **kwargs)
+    _collect_outputs(graph, collectors, dict(zip(profiled, records)),
+                     [(collector, iport, output) for (collector, iport, _),
+                      output in zip(collected, outputs)],
+                     progress_fun, events)
+
+
+def _collect_outputs(nodes, collectors, records, collected, progress_fun,
+                     events):
+    '''
+    Finish the flow of the nodes computed on a cluster, once the outputs
+    of the task graph are back. It sends the node_end events, takes the
+    profile records back and flows the output collectors locally.
+
+    Arguments
+    -------
+    nodes: list
+        the nodes computed on the cluster
+    collectors: list
+        the output collector nodes
+    records: dict
+        {node: profile record computed on the cluster}
+    collected: list
+        (output collector, input port, output) of the gathered outputs
+    '''
+    for node, record in records.items():
+        node.profile_record = record
+    for node in nodes:
+        events.node_end(node, {})
+    for collector, iport, output in collected:
+        collector.input_df[iport] = output
+    for collector in collectors:
+        if progress_fun is not None:
+            progress_fun(collector.uid)
+        events.node_start(collector)
+        output_df = collector.flow_call()
+        events.node_end(collector, output_df)
+
+
+# worker process state of the ray executor {token: {uid: node}}
+_RAY_NODES = {}
+_RAY_REMOTE = None
+
+
+def _ray_flow_call(token, nodes_ref, uid, edges, oports, *parent_outputs):
+    '''Runs in the ray worker. The nodes are deserialized once per worker
+    process and run. Returns the outputs of the ports `oports` and the
+    profile record of the node.'''
+    import ray
+    if token not in _RAY_NODES:
+        _RAY_NODES.clear()
+        _RAY_NODES[token] = ray.get(nodes_ref[0])
+    node = _RAY_NODES[token][uid]
+    node.input_df = {iport: output
+                     for (iport, _), output in zip(edges, parent_outputs)}
+    # the references of the inputs in the object store, e.g. to share them
+    # with the trials of a hyper-parameter search instead of putting the
+    # inputs in the object store again
+    node.input_refs = dict(edges)
+    try:
+        output_df = node.flow_call()
+    finally:
+        node.input_refs = {}
+    returns = [_port_output(output_df, oport, uid) for oport in oports]
+    returns.append(node.profile_record)
+    return returns[0] if len(returns) == 1 else tuple(returns)
+
+
+def run_ray(nodes, progress_fun=None, max_workers=None, events=None):
+    '''
+    Flow the nodes as ray tasks, one per node, on the ray cluster the
+    driver is connected to, e.g. the one of the hyper-parameter search
+    nodes. A local ray instance is started otherwise. The outputs of each
+    port stay in the ray object store, zero-copy for the numpy backed
+    outputs, and the children tasks take their object references. Only
+    the outputs of the task graph are fetched.
+
+    Arguments
+    -------
+    nodes: list
+        the nodes that participate in the computation
+    progress_fun: function
+        called with the node id when the node is submitted
+    max_workers: int
+        number of CPUs of the local ray instance if it is started
+    events: FlowEvents
+        receives the flow events. The outputs stay in the object store,
+        the node_end event is sent once the graph is computed with an empty
+        outputs dictionary, except for the output collector.
+    '''
+    global _RAY_REMOTE
+    try:
+        import ray
+    except ImportError:
+        raise ImportError('The "ray" executor needs ray, '
+                          'pip install "ray[default]"')
+    if not ray.is_initialized():
+        ray.init(num_cpus=max_workers)
+    if _RAY_REMOTE is None:
+        _RAY_REMOTE = ray.remote(_ray_flow_call)
+    events = FlowEvents() if events is None else events
+    computed = [node for node in topological_order(nodes)
+                if node.uid != OUTPUT_ID]
+    token = uuid.uuid4().hex
+    nodes_ref = ray.put({node.uid: node for node in computed})
+
+    # {(node, port): ObjectRef}
+    port_refs = {}
+    record_refs = {}
+    for node in computed:
+        oports = list(dict.fromkeys(out['from_port']
+                                    for out in node.outputs))
+        edges = []
+        if not node.is_flow_root():
+            for node_in in node.inputs:
+                edges.append((node_in['to_port'],
+                              port_refs[(node_in['from_node'],
+                                         node_in['from_port'])]))
+        if progress_fun is not None:
+            progress_fun(node.uid)
+        events.node_start(node)
+        # the references nested in the lists are passed as they are, the
+        # top level ones are resolved to the outputs
+        refs = _RAY_REMOTE.options(num_returns=len(oports) + 1).remote(
+            token, [nodes_ref], node.uid, edges, oports,
+            *[ref for _, ref in edges])
+        if not oports:
+            refs = [refs]
+        for oport, ref in zip(oports, refs):
+            port_refs[(node, oport)] = ref
+        if node.profile_record is not None:
+            record_refs[node] = refs[-1]
+
+    collectors = [node for node in nodes if node.uid == OUTPUT_ID]
+    collected = [(collector, node_in['to_port'],
+                  port_refs[(node_in['from_node'], node_in['from_port'])])
+                 for collector in collectors
+                 for node_in in collector.inputs
+                 if (node_in['from_node'], node_in['from_port']) in port_refs]
+    outputs = ray.get([ref for _, _, ref in collected])
+    records = ray.get(list(record_refs.values()))
+    _collect_outputs(computed, collectors, dict(zip(record_refs, records)),
+                     [(collector, iport, output) for (collector, iport, _),
+                      output in zip(collected, outputs)],
+                     progress_fun, events)
+
+
+register_executor('serial', run_serial)
+register_executor('threads', run_threads)
+register_executor('processes', run_processes)
+register_executor('dask', run_dask)
+register_executor('ray', run_ray)
@@ -0,0 +1,73 @@
+import copy
+
+__all__ = ['FrozenDict', 'freeze', 'thaw']
+
+# value types copied to make or to thaw a frozen dictionary
+_MUTABLE_TYPES = frozenset((dict, list, set))
+
+
+def _readonly(self, *args, **kwargs):
+    raise TypeError(
+        'The metadata is shared between the nodes of the task graph and is '
+        'read only. Copy it first, e.g. dict(meta) or meta.copy().')
+
+
+class FrozenDict(dict):
+    '''
+    Read only dictionary used to share the port metadata between the
+    producer node and its consumers without copying it. `copy`, `dict(...)`
+    and `copy.deepcopy` return plain mutable dictionaries.
+    '''
+    __slots__ = ('nested',)
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        # values that are mutable containers, copied by thaw
+        self.nested = not _MUTABLE_TYPES.isdisjoint(
+            map(type, dict.values(self)))
+
+    def copy(self):
+        return thaw(self)
+
+    def __copy__(self):
+        return thaw(self)
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(meta):
+    '''
+    Read only version of a port metadata dictionary. Mutable values are
+    deep copied so the producer changing them later is not seen by the
+    consumers. Values which are not dictionaries are returned as they are.
+    '''
+    if isinstance(meta, FrozenDict) or not isinstance(meta, dict):
+        return meta
+    frozen = FrozenDict(meta)
+    if not frozen.nested:
+        return frozen
+    return FrozenDict(
+        (key, copy.deepcopy(val) if type(val) in _MUTABLE_TYPES else val)
+        for key, val in meta.items())
+
+
+def thaw(meta):
+    '''Mutable copy of a frozen metadata dictionary, shallow if possible.'''
+    if not isinstance(meta, FrozenDict):
+        return meta
+    if meta.nested:
+        return copy.deepcopy(dict(meta))
+    return dict(meta)
@@ -52,8 +52,10 @@ class NodeExtensionMixin:
 
         clsobj_list = []
         for type_str in type_str_list:
-            if type_str in TYPES_CACHE:
+            if isinstance(type_str, str) and type_str in TYPES_CACHE:
+                # resolved once per type string, skip the import machinery
                 clsobj_list.append(TYPES_CACHE[type_str])
+                continue
 
             if isinstance(type_str, type):
                 clsobj = type_str
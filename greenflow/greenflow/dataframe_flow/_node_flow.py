@@ -1,9 +1,9 @@
 from collections.abc import Iterable
 import warnings
+import weakref
 import dask
 from dask.dataframe import DataFrame as DaskDataFrame
 from dask.dataframe import from_delayed
-import copy
 from dask.base import is_dask_collection
 from dask.distributed import Future
 
@@ -12,6 +12,12 @@ from .taskSpecSchema import TaskSpecSchema
 from .metaSpec import MetaData
 from ._node import _Node
 from ._node_taskgraph_extension_mixin import NodeTaskGraphExtensionMixin
+from ._result_cache import get_result_cache
+from ._disk_cache import get_disk_cache
+from ._profiler import measure, trace_memory
+from ._frozen import freeze, thaw
+from ._partition_alignment import (
+    ALIGN_OFF, align_partitions)
 
 # OUTPUT_ID = 'f291b900-bd19-11e9-aca3-a81e84f29b0f_uni_output'
 OUTPUT_ID = 'collector_id_fd9567b6'
@@ -38,15 +44,27 @@ _VALIDATORS = {}
 _COPYS = {}
 # dictionary of clean up functions
 _CLEANUP = {}
-
-
-def _get_nodetype(node):
-    '''Identify the implementation node class. A node might be mixed in with
-    other classes. Ideally get the primary implementation class.
+# implementation node classes per node class, see _get_class_nodetype. The
+# values are (node class is one of them, the others) so they do not keep
+# their key alive
+_NODETYPES = weakref.WeakKeyDictionary()
+# number of outputs combined at once by the tree reduction of the delayed
+# outputs
+_REDUCE_SPLIT_EVERY = 8
+
+
+def _get_class_nodetype(nodecls):
+    '''The implementation node classes in the MRO of `nodecls`, see
+    _get_nodetype. The MRO scan is done once per class.
     '''
-    nodetypes = node.__class__.mro()
+    try:
+        own, basetypes = _NODETYPES[nodecls]
+        return (nodecls,) + basetypes if own else basetypes
+    except KeyError:
+        pass
+
     keeptypes = []
-    for nodet in nodetypes:
+    for nodet in nodecls.mro():
         # Exclude base Node classes i.e. _Node, NodeTaskGraphMixin, Node.
         # Using nodet.__name__ != 'Node' to avoid cyclic dependencies.
         if issubclass(nodet, _Node) and \
@@ -56,9 +74,27 @@ def _get_nodetype(node):
                 nodet.__name__ != 'Node':
             keeptypes.append(nodet)
 
+    keeptypes = tuple(keeptypes)
+    _NODETYPES[nodecls] = (nodecls in keeptypes, tuple(
+        nodet for nodet in keeptypes if nodet is not nodecls))
     return keeptypes
 
 
+def _register_mixin_nodetype(mixincls, nodecls):
+    '''Resolve the implementation classes of a NodeTaskGraphMixin class
+    mixed in with `nodecls` from the ones of `nodecls`, skipping its MRO
+    scan. The mixin classes do not add implementation classes.
+    '''
+    _NODETYPES[mixincls] = (False, _get_class_nodetype(nodecls))
+
+
+def _get_nodetype(node):
+    '''Identify the implementation node class. A node might be mixed in with
+    other classes. Ideally get the primary implementation class.
+    '''
+    return list(_get_class_nodetype(node.__class__))
+
+
 def register_validator(typename: type,
                        fun) -> None:
     # print('register validator for', typename)
@@ -71,6 +107,21 @@ def register_copy_function(typename: type,
     _COPYS[typename] = fun
 
 
+def _make_copy(obj):
+    '''Copy of the object with the copy function registered for its type,
+    the object itself if there is none.
+    '''
+    typeObj = obj.__class__
+    if typeObj in _COPYS:
+        return _COPYS[typeObj](obj)
+    return obj
+
+
+def _copy_outputs(outputs: dict) -> dict:
+    '''Copy the outputs of a node, see _make_copy.'''
+    return {oport: _make_copy(out) for oport, out in outputs.items()}
+
+
 def register_cleanup(name: str,
                      fun) -> None:
     # print('register validator for', typename)
@@ -127,6 +178,20 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
         #     user configurable i.e. "df" is just some python object which is
         #     typically a data container.
         self.clear_input = True
+        # key to store the outputs in the result cache, set by TaskGraph.run
+        self.memo_key = None
+        # store the outputs in the disk cache too
+        self.memo_persist = False
+        # NodeProfile filled in while running, set by TaskGraph.run profile
+        # and trace
+        self.profile_record = None
+        # validate the outputs after process, set by TaskGraph.run validate
+        self.validate_outputs = True
+        # object references of the inputs, set by the ray executor while the
+        # node runs
+        self.input_refs = {}
+        # partition alignments of the delayed inputs already warned about
+        self.alignments_warned = set()
 
     def update(self):
         """
@@ -310,25 +375,30 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
     def __get_input_df(self):
         return self.input_df
 
-    def get_input_meta(self, port_name=None):
+    def _get_output_meta_frozen(self):
         """
-        if port_name is None, get all the connected input metas information
+        The metadata of the output ports as read only dictionaries, shared
+        with the connected nodes. Once the node is updated it is built at
+        most once, on the first request, and cached until the next update.
         returns
-            dict, key is the current node input port name, value is the column
-            name and types
-        if port_name is not None, get meta data for the input port_name. If it
-        doesn't exist, return None
+            dict, key is the output port name, value is a FrozenDict
+        """
+        if hasattr(self, 'frozen_outports_cache'):
+            return self.frozen_outports_cache
+        frozen = {oport: freeze(meta)
+                  for oport, meta in self.meta_setup().outports.items()}
+        if hasattr(self, 'meta_data_cache'):
+            self.frozen_outports_cache = frozen
+        return frozen
+
+    def _get_input_meta_frozen(self):
+        """
+        Same as get_input_meta with port_name None, but the metadata is
+        shared with the connected nodes instead of copied and is read only.
+        Used by the framework which does not modify it.
         """
         if hasattr(self, 'input_meta_cache'):
-            if port_name is None:
-                return self.input_meta_cache
-            elif port_name in self.input_meta_cache:
-                return self.input_meta_cache[port_name]
-            else:
-                # Run the logic below to find the port
-                # Warning: Something might not be right if this happens.
-                #     Perhaps the cache needs to be reset.
-                pass
+            return self.input_meta_cache
 
         output = {}
         if not hasattr(self, 'inputs'):
@@ -336,18 +406,14 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
 
         out_port_names = []
         to_port_names = []
-        from_port_names = []
-        meta_data_list = []
+        port_metas = []
         for node_input in self.inputs:
             from_node = node_input['from_node']
-            meta_data = copy.deepcopy(from_node.meta_setup())
+            outports_meta = from_node._get_output_meta_frozen()
 
             from_port_name = node_input['from_port']
             to_port_name = node_input['to_port']
-            if port_name is not None and port_name == to_port_name:
-                return meta_data.outports[from_port_name]
-
-            if from_port_name not in meta_data.outports:
+            if from_port_name not in outports_meta:
                 nodetype_list = _get_nodetype(self)
                 nodetype_names = [inodet.__name__ for inodet in nodetype_list]
                 if 'OutputCollector' in nodetype_names:
@@ -359,34 +425,55 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
                     'node "{}" output meta: {}'.format(
                         self.uid, nodetype_list, to_port_name,
                         from_node.uid, _get_nodetype(from_node),
-                        from_port_name, from_node.uid, meta_data.outports)
+                        from_port_name, from_node.uid, outports_meta)
                 )
             else:
-                out_port_name = from_node.uid+'@'+from_port_name
-                out_port_names.append(out_port_name)
+                out_port_names.append(from_node.uid+'@'+from_port_name)
                 to_port_names.append(to_port_name)
-                from_port_names.append(from_port_name)
-                meta_data_list.append(meta_data)
-
-        if port_name is not None:
-            return None
+                port_metas.append(outports_meta[from_port_name])
 
         if len(out_port_names) > 0:
             dy = PortsSpecSchema.dynamic
             ports = self.ports_setup()
 
             inports = ports.inports
-            for out_port_name, to_port_name, from_port_name, meta_data in zip(
-                    out_port_names, to_port_names, from_port_names,
-                    meta_data_list):
+            for out_port_name, to_port_name, port_meta in zip(
+                    out_port_names, to_port_names, port_metas):
                 if out_port_name in inports and inports[out_port_name].get(
                         dy, False):
-                    output[out_port_name] = meta_data.outports[from_port_name]
+                    output[out_port_name] = port_meta
                 else:
-                    output[to_port_name] = meta_data.outports[from_port_name]
+                    output[to_port_name] = port_meta
 
         return output
 
+    def get_input_meta(self, port_name=None):
+        """
+        if port_name is None, get all the connected input metas information
+        returns
+            dict, key is the current node input port name, value is the column
+            name and types
+        if port_name is not None, get meta data for the input port_name. If it
+        doesn't exist, return None
+
+        The returned dictionaries are copies the node is free to modify.
+        """
+        if port_name is None:
+            return {iport: thaw(meta) for iport, meta in
+                    self._get_input_meta_frozen().items()}
+
+        if hasattr(self, 'input_meta_cache') and \
+                port_name in self.input_meta_cache:
+            return thaw(self.input_meta_cache[port_name])
+
+        for node_input in getattr(self, 'inputs', []):
+            if port_name == node_input['to_port']:
+                from_node = node_input['from_node']
+                return thaw(from_node._get_output_meta_frozen()[
+                    node_input['from_port']])
+
+        return None
+
     def __set_input_df(self, to_port, df):
         self.input_df[to_port] = df
 
@@ -399,19 +486,73 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
             * calls its process function to manipulate the input dataframes
             * set the resulting dataframe to the children nodes as inputs
             * flow each of the chidren nodes
+        The children are flowed with an explicit stack instead of recursion
+        so long chains of nodes do not hit the recursion limit.
+
+        Note: TaskGraph.run does not use this method. It runs the nodes in
+        topological order via the executors in module _executor.
         """
-        if progress_fun is not None:
-            progress_fun(self.uid)
-        input_ready = self.__input_ready()
-        if not input_ready:
-            return
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if progress_fun is not None:
+                progress_fun(node.uid)
+            input_ready = node.__input_ready()
+            if not input_ready:
+                continue
 
-        inputs_data = self.__get_input_df()
-        output_df = self.__call__(inputs_data)
+            output_df = node.flow_call()
+
+            children = [onode for onode in node.flow_outputs(output_df)
+                        if onode.visited]
+            # depth first in the order of the outputs
+            stack.extend(reversed(children))
 
+    def is_flow_root(self):
+        """
+        A node that does not wait on its parents during the flow. That is a
+        node without inputs or a node loading its outputs from cache.
+        """
+        if not isinstance(self.load, bool) or self.load:
+            return True
+        return len(self.inputs) == 0
+
+    def flow_call(self):
+        """
+        Run the computation of this node on the inputs set so far by the
+        parent nodes. It does not touch the children nodes so it is safe to
+        call it from a worker thread once the inputs are ready.
+        returns
+            dict, the outputs keyed by output port name
+        """
+        inputs_data = self.__get_input_df()
         if self.clear_input:
+            # drop the reference early, the inputs may be the last reference
+            # to the parent outputs
             self.input_df = {}
+        output_df = self.__call__(inputs_data)
 
+        if self.memo_key is not None:
+            record = self.profile_record
+            with measure(record), measure(record, 'save'):
+                # the outputs are modified in place downstream
+                get_result_cache().put(self.memo_key,
+                                       _copy_outputs(output_df))
+                if self.memo_persist:
+                    get_disk_cache().put(self.memo_key, output_df, self.uid)
+
+        return output_df
+
+    def flow_outputs(self, output_df):
+        """
+        Pass the outputs of this node to the input ports of the children
+        nodes.
+        @params output_df
+            dict, the outputs returned by `flow_call`
+        returns
+            list, the children nodes, one entry per outgoing edge
+        """
+        children = []
         for out in self.outputs:
             onode = out['to_node']
             iport = out['to_port']
@@ -431,16 +572,12 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
                 df = output_df[oport]
 
             onode.__set_input_df(iport, df)
+            children.append(onode)
 
-            if onode.visited:
-                onode.flow(progress_fun)
+        return children
 
     def __make_copy(self, df_obj):
-        typeObj = df_obj.__class__
-        if typeObj in _COPYS:
-            return _COPYS[typeObj](df_obj)
-        else:
-            return df_obj
+        return _make_copy(df_obj)
 
     def __check_dly_processing_prereq(self, inputs: dict):
         '''At least one input must be a dask DataFrame type. Output types must
@@ -480,8 +617,9 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
         handle delayed processing automatically, prerequisites are checked via
         call to:
             :meth:`__check_dly_processing_prereq`
-        Additionally all input dask_cudf dataframes have to be partitioned
-        the same i.e. equal number of partitions.
+        Input dask_cudf dataframes with different number of partitions are
+        aligned per self.partition_alignment, see
+        :func:`_partition_alignment.align_partitions`.
         @param inputs: dict
             key: iport name string, value: input data
         '''
@@ -522,9 +660,9 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
 
         inputs_dly = {}
         # A dask_cudf object will return a list of dask delayed object using
-        # to_delayed() API. Below the logic assumes (otherwise error) that
-        # all inputs are dask_cudf objects and are distributed in the same
-        # manner. Ex. inputs_dly:
+        # to_delayed() API. Below the logic aligns the partitions of the
+        # inputs so that they are distributed in the same manner.
+        # Ex. inputs_dly:
         #     inputs_dly = {
         #         p0: {
         #             iport0: ddf_dly_i0_p0,
@@ -540,21 +678,36 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
         # i_x - iport
         # p_x - partition index
 
-        npartitions = None
-        for iport, inarg in inputs.items():
-            # dcudf not necessarily a dask cudf frame
-            if not isinstance(inarg, DaskDataFrame):
-                continue
-            dcudf = inarg
-            ddf_dly_list = dcudf.to_delayed()
-            npartitions_ = len(ddf_dly_list)
-            if npartitions is None:
-                npartitions = npartitions_
-            if npartitions != npartitions_:
-                raise Exception(
-                    'Error DASK_CUDF PARTITIONS MISMATCH: Node "{}" input "{}"'
-                    ' has {} npartitions and other inputs have {} partitions'
-                    .format(self.uid, iport, npartitions_, npartitions))
+        if self.partition_alignment == ALIGN_OFF:
+            npartitions = None
+            for iport, inarg in inputs.items():
+                if not isinstance(inarg, DaskDataFrame):
+                    continue
+                if npartitions is None:
+                    npartitions = inarg.npartitions
+                if npartitions != inarg.npartitions:
+                    raise Exception(
+                        'Error DASK_CUDF PARTITIONS MISMATCH: Node "{}" '
+                        'input "{}" has {} npartitions and other inputs have '
+                        '{} partitions'.format(self.uid, iport,
+                                               inarg.npartitions,
+                                               npartitions))
+        partitions, alignment, costs = align_partitions(
+            inputs, self.partition_alignment)
+        if alignment is not None:
+            in_npartitions = {iport: inputs[iport].npartitions
+                              for iport in partitions}
+            # the alignment is the same on every run of unchanged inputs,
+            # warn once per node
+            warned = (alignment, tuple(sorted(in_npartitions.items())))
+            if warned not in self.alignments_warned:
+                self.alignments_warned.add(warned)
+                warnings.warn(
+                    'Node "{}" inputs have different npartitions {}. Aligned '
+                    'by "{}" partitioning when running, estimated cost in '
+                    'partitions moved: {}'.format(
+                        self.uid, in_npartitions, alignment, costs))
+        for iport, ddf_dly_list in partitions.items():
             for idly, dly in enumerate(ddf_dly_list):
                 # very import to use shallow copy of inputs_not_dly
                 inputs_dly.setdefault(idly, inputs_not_dly.copy()).update({
@@ -593,6 +746,8 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
         # print('OUTPUTS_DLY:\n{}'.format(outputs_dly))
 
         output_df = {}
+        # non dataframe outputs, computed together
+        reduce_dly = {}
         # A dask_cudf object is synthesized from a list of delayed objects.
         # Per outputs_dly above use dask_cudf.from_delayed API.
         connected_outs = set([out['from_port'] for out in self.outputs])
@@ -615,16 +770,31 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
                     output_df[oport] = from_delayed(outputs_dly[oport],
                                                     meta=meta_data[oport])
             else:
-                # outputs_dly[oport] is currently a list. Run compute on each
-                # partition, and keep the first one.
-                # This is not very generalizeable
-                # TODO: Check for equivalency and output a warning in case
-                #     outputs don't match from different partitions.
-                output_df[oport] = \
-                    [iout.compute() for iout in outputs_dly[oport]][0]
+                reduce_dly[oport] = self.__reduce_delayed(
+                    oport, port_spec, outputs_dly[oport])
+
+        if reduce_dly:
+            # a single graph so that the ports share the process calls
+            output_df.update(dask.compute(reduce_dly)[0])
 
         return output_df
 
+    def __reduce_delayed(self, oport, port_spec, outputs):
+        '''Reduce the delayed outputs of a port to one delayed object per
+        the reduction of the port spec, see PortsSpecSchema.reduction.
+        '''
+        reduction = port_spec.get(PortsSpecSchema.reduction,
+                                  PortsSpecSchema.REDUCE_FIRST)
+        if reduction == PortsSpecSchema.REDUCE_FIRST:
+            return outputs[0]
+        if reduction == PortsSpecSchema.REDUCE_GATHER:
+            return dask.delayed(list)(outputs)
+        combine = dask.delayed(self.combine_partitions)
+        while len(outputs) > 1:
+            outputs = [combine(oport, outputs[i:i + _REDUCE_SPLIT_EVERY])
+                       for i in range(0, len(outputs), _REDUCE_SPLIT_EVERY)]
+        return outputs[0]
+
     def outport_connected(self, port_name):
         """
         test whether this node's output port is connected.
@@ -678,43 +848,53 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
     def decorate_process(self):
 
         def timer(*argv):
-            import time
-            start = time.time()
-            result = self.process(*argv)
-            end = time.time()
-            print('id:%s process time:%.3fs' % (self.uid, end-start))
-            return result
-        if self.profile:
+            with measure(self.profile_record, 'process'):
+                return self.process(*argv)
+        if self.profile_record is not None:
             return timer
         else:
             return self.process
 
     def __call__(self, inputs_data):
+        record = self.profile_record
+        with measure(record, run=True), trace_memory(record):
+            output_df = self.__compute(inputs_data)
+            if record is not None and output_df is not None:
+                record.set_outputs(output_df)
+        return output_df
+
+    def __compute(self, inputs_data):
+        record = self.profile_record
         if self.load:
-            if isinstance(self.load, bool):
-                output_df = self.load_cache()
-            else:
-                output_df = self.load
+            with measure(record, 'load'):
+                if isinstance(self.load, bool):
+                    output_df = self.load_cache()
+                else:
+                    output_df = self.load
         else:
             # nodes with ports take dictionary as inputs
-            inputs = {iport: self.__make_copy(data_input)
-                      for iport, data_input in inputs_data.items()}
+            with measure(record, 'copy'):
+                inputs = {iport: self.__make_copy(data_input)
+                          for iport, data_input in inputs_data.items()}
             if not self.delayed_process:
                 output_df = self.decorate_process()(inputs)
             else:
                 use_delayed = self.__check_dly_processing_prereq(inputs)
                 if use_delayed:
-                    output_df = self.__delayed_call(inputs)
+                    with measure(record, 'delayed', exclude='process'):
+                        output_df = self.__delayed_call(inputs)
                 else:
                     output_df = self.decorate_process()(inputs)
 
         if self.uid != OUTPUT_ID and output_df is None:
             raise Exception("None output")
-        else:
-            self.__validate_output(output_df)
+        elif self.validate_outputs:
+            with measure(record, 'validate'):
+                self.__validate_output(output_df)
 
         if self.save:
-            self.save_cache(output_df)
+            with measure(record, 'save'):
+                self.save_cache(output_df)
 
         return output_df
 
@@ -841,7 +1021,7 @@ class NodeTaskGraphMixin(NodeTaskGraphExtensionMixin):
                     out_err = '{}\n{}'.format(info_msg, err_msg)
                     raise LookupError(out_err)
 
-        inputs_meta = self.get_input_meta()
+        inputs_meta = self._get_input_meta_frozen()
         required = metadata.inports
 
         if not required:
@@ -1,5 +1,6 @@
 from .portsSpecSchema import (PortsSpecSchema, NodePorts)
 from .metaSpec import (MetaDataSchema, MetaData)
+from ._frozen import thaw
 
 __all__ = ['NodeTaskGraphExtensionMixin']
 
@@ -23,11 +24,15 @@ class NodeTaskGraphExtensionMixin:
         if hasattr(self, 'meta_data_cache'):
             del self.meta_data_cache
 
+        if hasattr(self, 'frozen_outports_cache'):
+            del self.frozen_outports_cache
+
     def cache_update_result(self):
         self.reset_cache()
         # cache all the intermediate results
         self.ports_setup_cache = self.ports_setup()
-        self.input_meta_cache = self.get_input_meta()
+        # the input metadata is shared with the parent nodes, not copied
+        self.input_meta_cache = self._get_input_meta_frozen()
         self.input_connections_cache = self.get_connected_inports()
         self.meta_data_cache = self.meta_setup()
 
@@ -129,7 +134,7 @@ class NodeTaskGraphExtensionMixin:
         :return: MetaData
         :rtype: MetaData
         '''
-        input_meta = self.get_input_meta()
+        input_meta = self._get_input_meta_frozen()
 
         inports = meta.inports.copy()
         metaoutports = meta.outports
@@ -212,6 +217,8 @@ class NodeTaskGraphExtensionMixin:
                     if port_name not in metaoutports and \
                             port_name not in static_inport_names and \
                             port_name in input_meta:
-                        outports[port_name] = input_meta[port_name]
+                        # the input metadata is shared read only with
+                        # the parent node
+                        outports[port_name] = thaw(input_meta[port_name])
 
         return MetaData(inports=inports, outports=outports)
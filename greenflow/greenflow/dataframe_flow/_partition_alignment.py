@@ -0,0 +1,107 @@
+from dask.dataframe import DataFrame as DaskDataFrame
+
+__all__ = ['ALIGN_AUTO', 'ALIGN_DIVISIONS', 'ALIGN_BROADCAST',
+           'ALIGN_SHUFFLE', 'ALIGN_OFF', 'ALIGNMENTS', 'estimate_costs',
+           'align_partitions']
+
+ALIGN_AUTO = 'auto'
+# repartition to common divisions, inputs sorted on the index
+ALIGN_DIVISIONS = 'divisions'
+# pass the whole of the single partition inputs to every partition
+ALIGN_BROADCAST = 'broadcast'
+# hash partition all the inputs on the index
+ALIGN_SHUFFLE = 'shuffle'
+# raise an error as the inputs are not partitioned the same
+ALIGN_OFF = 'off'
+# strategies in the order of preference of the automatic alignment
+ALIGNMENTS = (ALIGN_DIVISIONS, ALIGN_BROADCAST, ALIGN_SHUFFLE)
+
+
+def _common_divisions(ddfs):
+    '''Divisions of the input with the most partitions extended to the index
+    range of all the inputs.
+    '''
+    widest = max(ddfs, key=lambda ddf: ddf.npartitions)
+    divisions = list(widest.divisions)
+    divisions[0] = min(ddf.divisions[0] for ddf in ddfs)
+    divisions[-1] = max(ddf.divisions[-1] for ddf in ddfs)
+    return tuple(divisions)
+
+
+def estimate_costs(ddfs):
+    '''
+    Estimate the cost of the alignment strategies applicable to dask
+    dataframes with different number of partitions. The cost is the number
+    of partition pieces moved between the tasks of the dask graph.
+
+    Arguments
+    -------
+    ddfs: list
+        dask dataframes
+
+    returns
+        dict, {strategy: cost} of the applicable strategies
+    '''
+    npartitions = max(ddf.npartitions for ddf in ddfs)
+    costs = {}
+    if all(ddf.known_divisions for ddf in ddfs):
+        divisions = _common_divisions(ddfs)
+        # every old partition overlaps about one new partition except at
+        # the new boundaries
+        costs[ALIGN_DIVISIONS] = sum(
+            ddf.npartitions + npartitions - 1
+            for ddf in ddfs if tuple(ddf.divisions) != divisions)
+    if all(ddf.npartitions in (1, npartitions) for ddf in ddfs):
+        costs[ALIGN_BROADCAST] = sum(
+            npartitions for ddf in ddfs if ddf.npartitions != npartitions)
+    # all to all transfer
+    costs[ALIGN_SHUFFLE] = sum(ddf.npartitions * npartitions for ddf in ddfs)
+    return costs
+
+
+def align_partitions(inputs, strategy=ALIGN_AUTO):
+    '''
+    Align the partitions of the dask dataframe inputs of a delayed node.
+
+    Arguments
+    -------
+    inputs: dict
+        {port name: input}, only the dask dataframes are aligned
+    strategy: str
+        one of ALIGNMENTS, or ALIGN_AUTO for the first applicable one
+
+    returns
+        tuple, ({port name: list of delayed partitions}, strategy, costs)
+        with the strategy used, None if the inputs are already aligned, and
+        the costs of the applicable strategies
+    '''
+    ddfs = {iport: inarg for iport, inarg in inputs.items()
+            if isinstance(inarg, DaskDataFrame)}
+    if len(set(ddf.npartitions for ddf in ddfs.values())) <= 1:
+        return ({iport: ddf.to_delayed() for iport, ddf in ddfs.items()},
+                None, {})
+    costs = estimate_costs(list(ddfs.values()))
+    if strategy == ALIGN_AUTO:
+        strategy = next(align for align in ALIGNMENTS if align in costs)
+    elif strategy not in costs:
+        raise ValueError(
+            'Partition alignment "{}" does not apply, applicable ones are '
+            '{}'.format(strategy, sorted(costs)))
+
+    npartitions = max(ddf.npartitions for ddf in ddfs.values())
+    if strategy == ALIGN_DIVISIONS:
+        divisions = _common_divisions(list(ddfs.values()))
+        ddfs = {iport: ddf if tuple(ddf.divisions) == divisions
+                else ddf.repartition(divisions=divisions, force=True)
+                for iport, ddf in ddfs.items()}
+    elif strategy == ALIGN_SHUFFLE:
+        ddfs = {iport: ddf.shuffle(ddf.index, npartitions=npartitions)
+                for iport, ddf in ddfs.items()}
+    partitions = {}
+    for iport, ddf in ddfs.items():
+        dly_list = ddf.to_delayed()
+        if len(dly_list) != npartitions:
+            # single partition broadcast to every partition
+            dly_list = dly_list * npartitions
+        partitions[iport] = dly_list
+    return partitions, strategy, costs
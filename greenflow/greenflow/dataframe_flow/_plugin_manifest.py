@@ -0,0 +1,314 @@
+import os
+import sys
+import json
+import hashlib
+import inspect
+import warnings
+import importlib
+import importlib.util
+try:
+    # For python 3.8 and later
+    import importlib.metadata as importlib_metadata
+except ImportError:
+    # prior to python 3.8 need to install importlib-metadata
+    import importlib_metadata
+
+from ._node import _Node
+
+__all__ = ['build_manifest', 'write_manifest', 'is_plugin', 'load_plugin',
+           'load_plugins', 'find_plugin_node', 'directory_manifest',
+           'write_directory_manifest']
+
+ENTRY_POINT_GROUP = 'greenflow.plugin'
+# manifest file in the top level package directory of a plugin
+MANIFEST_FILE = 'greenflow_manifest.json'
+
+# entry points of the plugins not loaded yet {name: EntryPoint}, None until
+# the entry points are listed
+_ENTRY_POINTS = None
+# manifest per entry point name {name: {node type: "module:qualname"}}
+_MANIFESTS = {}
+# node classes found with the manifests {(name, node type): class}
+_NODE_CLASSES = {}
+
+
+def _list_entry_points():
+    entry_points = importlib_metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        return entry_points.select(group=ENTRY_POINT_GROUP)
+    return entry_points.get(ENTRY_POINT_GROUP, ())
+
+
+def _entry_points():
+    global _ENTRY_POINTS
+    if _ENTRY_POINTS is None:
+        _ENTRY_POINTS = {entry_point.name: entry_point
+                         for entry_point in _list_entry_points()
+                         if entry_point.name not in sys.modules}
+    return _ENTRY_POINTS
+
+
+def is_plugin(name):
+    '''Whether `name` is a greenflow.plugin entry point not loaded yet.'''
+    return name not in sys.modules and name in _entry_points()
+
+
+def load_plugin(name):
+    '''Import the module of the plugin entry point and register it in
+    sys.modules under the entry point name.
+    '''
+    entry_point = _entry_points().pop(name)
+    mod = entry_point.load()
+    sys.modules[name] = mod
+    return mod
+
+
+def load_plugins():
+    '''Import all the plugins, as done when greenflow is imported if the
+    GREENFLOW_EAGER_PLUGINS environment variable is set.
+    '''
+    for name in list(_entry_points()):
+        load_plugin(name)
+
+
+def build_manifest(modules):
+    '''
+    Import the modules and map their node class attributes to the module
+    defining the class.
+
+    Arguments
+    -------
+    modules: list
+        module names, e.g. the values of the plugin entry points
+
+    returns
+        dict, {module name: {node type: "defining module:class qualname"}}
+    '''
+    manifest = {}
+    for module_name in modules:
+        mod = importlib.import_module(module_name)
+        nodes = manifest.setdefault(module_name, {})
+        for name, nodecls in inspect.getmembers(mod, inspect.isclass):
+            if not issubclass(nodecls, _Node):
+                continue
+            nodes[name] = '{}:{}'.format(nodecls.__module__,
+                                         nodecls.__qualname__)
+    return manifest
+
+
+def _package_dir(package):
+    '''The directory of a top level package, without importing it.'''
+    try:
+        spec = importlib.util.find_spec(package)
+    except (ImportError, ValueError):
+        return None
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return list(spec.submodule_search_locations)[0]
+
+
+def write_manifest(package, filename=None):
+    '''
+    Write the manifest of the plugin entry points of a package, e.g. at
+    install time, so that only the modules of the node types used by a
+    task graph are imported:
+
+        greenflow manifest greenflow_gquant_plugin
+
+    Arguments
+    -------
+    package: str
+        the top level package of the plugin
+    filename: str
+        defaults to greenflow_manifest.json in the package directory
+
+    returns
+        the manifest file name
+    '''
+    modules = sorted(set(
+        entry_point.value.split(':')[0]
+        for entry_point in _list_entry_points()
+        if entry_point.value.split('.')[0].split(':')[0] == package))
+    if not modules:
+        modules = [package]
+    if filename is None:
+        filename = os.path.join(_package_dir(package), MANIFEST_FILE)
+    with open(filename, 'w') as f:
+        json.dump(build_manifest(modules), f, indent=2, sort_keys=True)
+    return filename
+
+
+def _cache_manifest_file(entry_point):
+    '''Manifest written on the first scan of a plugin without one.'''
+    from .node import Node
+    dist = getattr(entry_point, 'dist', None)
+    if dist is None:
+        return None
+    return os.path.join(
+        os.getenv('GREENFLOW_CACHE_DIR', Node.cache_dir), 'manifests',
+        '{}-{}.json'.format(dist.metadata['Name'], dist.version))
+
+
+def _read_manifest(filename, module_name):
+    try:
+        with open(filename) as f:
+            return json.load(f).get(module_name)
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _get_manifest(name):
+    '''The node types of a plugin, from its manifest or the one written on
+    the first scan. None if there is neither.
+    '''
+    if name in _MANIFESTS:
+        return _MANIFESTS[name]
+    entry_point = _entry_points()[name]
+    module_name = entry_point.value.split(':')[0]
+    manifest = None
+    package_dir = _package_dir(module_name.split('.')[0])
+    if package_dir is not None:
+        manifest = _read_manifest(
+            os.path.join(package_dir, MANIFEST_FILE), module_name)
+    if manifest is None:
+        cache_file = _cache_manifest_file(entry_point)
+        if cache_file is not None:
+            manifest = _read_manifest(cache_file, module_name)
+    _MANIFESTS[name] = manifest
+    return manifest
+
+
+def _scan_plugin(name):
+    '''Load the plugin and write its manifest to the cache directory for the
+    next processes.
+    '''
+    entry_point = _entry_points()[name]
+    cache_file = _cache_manifest_file(entry_point)
+    mod = load_plugin(name)
+    if cache_file is not None:
+        module_name = entry_point.value.split(':')[0]
+        try:
+            manifest = {}
+            if os.path.exists(cache_file):
+                with open(cache_file) as f:
+                    manifest = json.load(f)
+            manifest.update(build_manifest([module_name]))
+            _dump_manifest(cache_file, manifest)
+        except (OSError, ValueError) as err:
+            warnings.warn('Cannot write the manifest of plugin "{}": {}'
+                          .format(name, err))
+    return mod
+
+
+def _dump_manifest(filename, manifest):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmpname = '{}.{}.tmp'.format(filename, os.getpid())
+    with open(tmpname, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmpname, filename)
+
+
+def find_plugin_node(name, node_type):
+    '''
+    Find a node class of a plugin not loaded yet. With a manifest only the
+    module defining the class is imported, otherwise the plugin is loaded
+    and its manifest written for the next time.
+
+    returns
+        the node class, None if the plugin does not have it
+    '''
+    key = (name, node_type)
+    if key in _NODE_CLASSES:
+        return _NODE_CLASSES[key]
+    manifest = _get_manifest(name)
+    if manifest is not None and node_type in manifest:
+        module_name, qualname = manifest[node_type].split(':')
+        try:
+            nodecls = importlib.import_module(module_name)
+            for attr in qualname.split('.'):
+                nodecls = getattr(nodecls, attr)
+        except (ImportError, AttributeError):
+            # stale manifest, load the whole plugin below
+            pass
+        else:
+            _NODE_CLASSES[key] = nodecls
+            return nodecls
+    mod = _scan_plugin(name) if manifest is None else load_plugin(name)
+    return getattr(mod, node_type, None)
+
+
+def _directory_stamp(path):
+    '''Relative name, modification time and size of the files of a module
+    directory.
+    '''
+    stamp = []
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+        for name in sorted(files):
+            filename = os.path.join(root, name)
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            stamp.append((os.path.relpath(filename, path), stat.st_mtime_ns,
+                          stat.st_size))
+    return stamp
+
+
+def _directory_manifest_prefix(path):
+    from .node import Node
+    return os.path.join(
+        os.getenv('GREENFLOW_CACHE_DIR', Node.cache_dir), 'manifests',
+        'dir-{}-'.format(hashlib.sha1(path.encode()).hexdigest()[:16]))
+
+
+def directory_manifest(path, module_name):
+    '''
+    The manifest of a module directory configured in the greenflowrc file,
+    written to the cache directory the last time all its submodules were
+    imported. The manifest file name has a digest of the files of the
+    directory, so a manifest is not found once any of them is modified.
+
+    Arguments
+    -------
+    path: str
+        the module directory
+    module_name: str
+        the name the directory is imported as
+
+    returns
+        tuple, the manifest file name and {node type: "module:qualname"},
+        the manifest is None if there is none for the current files
+    '''
+    path = os.path.realpath(path)
+    digest = hashlib.sha1(
+        repr(_directory_stamp(path)).encode()).hexdigest()[:16]
+    filename = '{}{}.json'.format(_directory_manifest_prefix(path), digest)
+    return filename, _read_manifest(filename, module_name)
+
+
+def write_directory_manifest(filename, path, mod):
+    '''
+    Write the manifest of a module directory once its submodules are
+    imported, replacing the manifests of its previous files.
+
+    Arguments
+    -------
+    filename: str
+        the manifest file name given by directory_manifest
+    path: str
+        the module directory
+    mod: module
+        the module of the directory
+    '''
+    prefix = _directory_manifest_prefix(os.path.realpath(path))
+    try:
+        _dump_manifest(filename, build_manifest([mod.__name__]))
+        dirname = os.path.dirname(prefix)
+        for name in os.listdir(dirname):
+            other = os.path.join(dirname, name)
+            if other.startswith(prefix) and other != filename:
+                os.remove(other)
+    except (OSError, ValueError) as err:
+        warnings.warn('Cannot write the manifest of module directory "{}": '
+                      '{}'.format(path, err))
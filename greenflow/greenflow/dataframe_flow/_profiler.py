@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dask.base import is_dask_collection
+
+from ._result_cache import nbytes_or_none
+
+__all__ = ['NodeProfile', 'Profile']
+
+# phases of the node computation
+PHASES = ('validate', 'load', 'copy', 'delayed', 'process', 'save')
+
+
+def _nrows(obj):
+    '''Number of rows of a data container, None if unknown.'''
+    if is_dask_collection(obj):
+        # would need a compute
+        return None
+    shape = getattr(obj, 'shape', None)
+    if isinstance(shape, tuple) and len(shape) > 0:
+        return shape[0]
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+def measure(record, phase=None, exclude=None, run=False):
+    '''`NodeProfile.measure` of the record, a no-op if the record is None.
+    '''
+    if record is None:
+        return nullcontext()
+    return record.measure(phase, exclude, run)
+
+
+def trace_memory(record):
+    '''`NodeProfile.trace_memory` of the record, a no-op if the record is
+    None.
+    '''
+    if record is None:
+        return nullcontext()
+    return record.trace_memory()
+
+
+class NodeProfile(object):
+    '''
+    Timings and output sizes of one node computation, filled in by
+    `TaskGraph.run(profile=True)`.
+
+    :ivar task_id: the node id
+    :ivar node_type: name of the node class
+    :ivar wall_time: seconds spent on the node, including the validation
+    :ivar cpu_time: CPU seconds of the thread running the node
+    :ivar phases: seconds per phase keyed by phase name, see `PHASES`. The
+        'delayed' phase is the dask graph construction and compute of a
+        `delayed_process` node without its 'process' time.
+    :ivar ports: (rows, bytes) of the outputs keyed by output port name.
+        Either is None if unknown, e.g. for dask collections.
+    :ivar peak_memory: peak bytes allocated by python while the node ran.
+        It only tracks the node by itself with the serial and processes
+        executors. None if not traced.
+    :ivar run_start: `time.perf_counter` when the node started to run, i.e.
+        after its inputs were ready
+    :ivar run_end: `time.perf_counter` when the node finished to run
+    :ivar spans: None, or the list of (name, start, duration, pid, tid) of
+        the measured blocks if the record traces them. The name is the task
+        id for the node run and the phase name otherwise.
+    '''
+
+    def __init__(self, task_id, node_type, trace=False):
+        self.task_id = task_id
+        self.node_type = node_type
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.ports = {}
+        self.peak_memory = None
+        self.run_start = None
+        self.run_end = None
+        self.spans = [] if trace else None
+        self.__lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_NodeProfile__lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        return 'NodeProfile({}, wall {:.3f}s, process {:.3f}s)'.format(
+            self.task_id, self.wall_time, self.phases['process'])
+
+    @contextmanager
+    def measure(self, phase=None, exclude=None, run=False):
+        '''
+        Time a block of the node computation. Top level blocks, i.e. the
+        ones not nested in another block of this node, add to the wall and
+        CPU time. A phase block adds to the time of that phase, less the
+        time added to the `exclude` phase meanwhile. Phase blocks may run in
+        other threads, e.g. dask workers. The `run` block is the top level
+        block of the node run.
+        '''
+        start = time.perf_counter()
+        start_cpu = time.thread_time() if phase is None else None
+        excluded = self.phases[exclude] if exclude is not None else 0.0
+        try:
+            yield self
+        finally:
+            end = time.perf_counter()
+            elapsed = end - start
+            with self.__lock:
+                if self.spans is not None and (phase is not None or run):
+                    self.spans.append((
+                        self.task_id if run else phase, start, elapsed,
+                        os.getpid(), threading.get_native_id()))
+                if phase is None:
+                    self.wall_time += elapsed
+                    self.cpu_time += time.thread_time() - start_cpu
+                    if run:
+                        self.run_start = start
+                        self.run_end = end
+                else:
+                    if exclude is not None:
+                        elapsed -= self.phases[exclude] - excluded
+                    self.phases[phase] += elapsed
+
+    @contextmanager
+    def trace_memory(self):
+        '''
+        Record the peak python memory allocated in the block, if tracemalloc
+        is tracing.
+        '''
+        if not tracemalloc.is_tracing():
+            yield self
+            return
+        current, _ = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        try:
+            yield self
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak - current, 0)
+            self.peak_memory = peak if self.peak_memory is None \
+                else max(self.peak_memory, peak)
+
+    def set_outputs(self, output_df):
+        for oport, out in output_df.items():
+            self.ports[oport] = (_nrows(out), nbytes_or_none(out))
+
+    def to_dict(self):
+        '''Flat dictionary, one entry per column of `Profile.to_dataframe`.
+        '''
+        rows = [nrows for nrows, _ in self.ports.values()
+                if nrows is not None]
+        nbytes = [size for _, size in self.ports.values() if size is not None]
+        record = {
+            'task_id': self.task_id,
+            'node_type': self.node_type,
+            'wall_time': self.wall_time,
+            'cpu_time': self.cpu_time
+        }
+        for phase in PHASES:
+            record[phase + '_time'] = self.phases[phase]
+        record.update({
+            'output_rows': sum(rows) if rows else None,
+            'output_bytes': sum(nbytes) if nbytes else None,
+            'peak_memory': self.peak_memory
+        })
+        return record
+
+
+class Profile(object):
+    '''
+    The node profiles of a `TaskGraph.run(profile=True)`, in topological
+    order. It is the `profile` attribute of the returned `Results`.
+
+    Example to find the slowest nodes across runs:
+
+        frames = [tgraph.run(outputs, replace=rep, profile=True)
+                  .profile.to_dataframe() for rep in replacements]
+        pd.concat(frames, keys=range(len(frames)), names=['run']) \\
+            .sort_values('wall_time', ascending=False)
+    '''
+
+    def __init__(self, nodes=(), edges=()):
+        self.nodes = list(nodes)
+        # (parent task id, child task id) of the connected nodes
+        self.edges = list(edges)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __getitem__(self, task_id):
+        for node in self.nodes:
+            if node.task_id == task_id:
+                return node
+        raise KeyError(task_id)
+
+    def __repr__(self):
+        return 'Profile({} nodes, wall {:.3f}s)'.format(
+            len(self.nodes), self.wall_time)
+
+    @property
+    def wall_time(self):
+        '''Sum of the wall time of the nodes.'''
+        return sum(node.wall_time for node in self.nodes)
+
+    def to_dataframe(self):
+        '''
+        returns
+            pandas.DataFrame, one row per node indexed by the task id
+        '''
+        import pandas as pd
+        columns = list(NodeProfile('', '').to_dict())
+        df = pd.DataFrame([node.to_dict() for node in self.nodes],
+                          columns=columns)
+        return df.set_index('task_id')
+
+    def chrome_trace(self):
+        '''
+        The node runs and their phases as Chrome Trace Events, with the
+        edges between the nodes as flow arrows. The node records must trace
+        their spans, see `TaskGraph.run` trace option. The timestamps are
+        comparable across the processes of one machine.
+        returns
+            dict, in the Trace Event Format JSON object format
+        '''
+        spans = [span for node in self.nodes for span in node.spans or ()]
+        origin = min((span[1] for span in spans), default=0.0)
+
+        def usec(seconds):
+            return (seconds - origin) * 1e6
+
+        events = []
+        for pid in sorted(set(span[3] for span in spans)):
+            name = 'greenflow' if pid == os.getpid() \
+                else 'greenflow worker {}'.format(pid)
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                           'tid': 0, 'args': {'name': name}})
+        runs = {}
+        for node in self.nodes:
+            for name, start, elapsed, pid, tid in node.spans or ():
+                run = name == node.task_id
+                event = {
+                    'name': name,
+                    'cat': 'node' if run else 'phase',
+                    'ph': 'X',
+                    'ts': usec(start),
+                    'dur': elapsed * 1e6,
+                    'pid': pid,
+                    'tid': tid,
+                    'args': {'task_id': node.task_id,
+                             'node_type': node.node_type}
+                }
+                if run:
+                    event['args'].update(
+                        {'{}_time'.format(phase): value
+                         for phase, value in node.phases.items() if value})
+                    runs[node.task_id] = event
+                events.append(event)
+        for flow_id, (parent, child) in enumerate(self.edges):
+            if parent not in runs or child not in runs:
+                continue
+            src = runs[parent]
+            dst = runs[child]
+            # both ends bind to the slice enclosing them, i.e. the parent
+            # run and the child run
+            events.append({'name': '{}->{}'.format(parent, child),
+                           'cat': 'edge', 'ph': 's', 'id': flow_id,
+                           'ts': src['ts'] + src['dur'] / 2,
+                           'pid': src['pid'], 'tid': src['tid']})
+            events.append({'name': '{}->{}'.format(parent, child),
+                           'cat': 'edge', 'ph': 'f', 'bp': 'e',
+                           'id': flow_id, 'ts': dst['ts'],
+                           'pid': dst['pid'], 'tid': dst['tid']})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, filename):
+        '''Write the `chrome_trace` to a JSON file, to open in Perfetto
+        (ui.perfetto.dev) or chrome://tracing.
+        '''
+        with open(filename, 'w') as f:
+            json.dump(self.chrome_trace(), f)
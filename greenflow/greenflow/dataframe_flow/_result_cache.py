@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dask.base import is_dask_collection
+
+__all__ = ['ResultCache', 'get_result_cache', 'register_sizeof',
+           'nbytes_or_none']
+
+# dictionary of object size functions of function signiture (obj) -> int
+_SIZEOFS = {}
+
+# default byte budget of the result cache, 1GiB
+DEFAULT_MAX_BYTES = int(os.getenv('GREENFLOW_RESULT_CACHE_BYTES',
+                                  1024 ** 3))
+
+
+def register_sizeof(typename: type,
+                    fun) -> None:
+    _SIZEOFS[typename] = fun
+
+
+def sizeof(obj):
+    '''Estimate the number of bytes held by an object. Lazy collections,
+    e.g. dask dataframes, only hold their graph and count as 0 bytes.'''
+    for typeobj in obj.__class__.mro():
+        if typeobj in _SIZEOFS:
+            return _SIZEOFS[typeobj](obj)
+    if is_dask_collection(obj):
+        return 0
+    if hasattr(obj, 'memory_usage'):
+        # pandas and cudf DataFrame or Series
+        try:
+            usage = obj.memory_usage(deep=True)
+            return int(usage.sum() if hasattr(usage, 'sum') else usage)
+        except Exception:
+            pass
+    try:
+        return int(obj.nbytes)
+    except Exception:
+        pass
+    return sys.getsizeof(obj)
+
+
+def nbytes_or_none(obj):
+    '''Number of bytes of a data container, None if unknown, e.g. for the
+    lazy collections. It never raises.'''
+    if is_dask_collection(obj):
+        return None
+    try:
+        return sizeof(obj)
+    except Exception:
+        return None
+
+
+class ResultCache(object):
+    '''
+    In memory cache of node outputs keyed by the content address of the
+    node, see `TaskGraph.run` memoize option. The least recently used
+    outputs are evicted once the cached outputs hold more than `max_bytes`.
+    It is thread safe.
+    '''
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.__lock = threading.Lock()
+        # {key: (outputs, nbytes)}
+        self.__entries = OrderedDict()
+        self.__nbytes = 0
+        self.__max_bytes = max_bytes
+
+    @property
+    def max_bytes(self):
+        return self.__max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes):
+        with self.__lock:
+            self.__max_bytes = max_bytes
+            self.__evict()
+
+    @property
+    def nbytes(self):
+        return self.__nbytes
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def __evict(self):
+        while self.__nbytes > self.__max_bytes and self.__entries:
+            _, (_, nbytes) = self.__entries.popitem(last=False)
+            self.__nbytes -= nbytes
+
+    def get(self, key):
+        '''
+        returns
+            dict, the outputs keyed by output port name or None if the key
+            is not cached
+        '''
+        with self.__lock:
+            if key not in self.__entries:
+                return None
+            self.__entries.move_to_end(key)
+            return self.__entries[key][0]
+
+    def put(self, key, outputs):
+        '''
+        Cache the outputs of a node. Outputs larger than the byte budget
+        are not cached.
+        returns
+            boolean, whether the outputs are cached or not
+        '''
+        nbytes = sum(sizeof(out) for out in outputs.values())
+        with self.__lock:
+            if key in self.__entries:
+                self.__nbytes -= self.__entries.pop(key)[1]
+            if nbytes > self.__max_bytes:
+                return False
+            self.__entries[key] = (outputs, nbytes)
+            self.__nbytes += nbytes
+            self.__evict()
+        return True
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__nbytes = 0
+
+
+_RESULT_CACHE = ResultCache()
+
+
+def get_result_cache():
+    '''The result cache shared by all the task graphs.'''
+    return _RESULT_CACHE
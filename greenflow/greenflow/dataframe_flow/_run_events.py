@@ -0,0 +1,100 @@
+import time
+import warnings
+
+from ._node_flow import OUTPUT_ID, _get_nodetype
+from ._executor import FlowEvents
+from ._result_cache import nbytes_or_none
+
+__all__ = ['register_run_hook', 'unregister_run_hook', 'RUN_EVENTS']
+
+# dictionary of run event hooks of function signiture (event: dict) -> None
+_RUN_HOOKS = {}
+
+# The events and their fields. Every event also has the fields "event", the
+# event name, "run_id", unique per TaskGraph.run call, and "time", the epoch
+# seconds when it happened.
+RUN_EVENTS = {
+    'run_start': ('outputs',),
+    'node_start': ('task_id', 'node_type'),
+    'validation_time': ('task_id', 'node_type', 'seconds'),
+    'cache_hit': ('task_id', 'node_type', 'cache'),
+    'cache_miss': ('task_id', 'node_type'),
+    'node_end': ('task_id', 'node_type', 'seconds'),
+    'bytes_out': ('task_id', 'node_type', 'port', 'nbytes'),
+    'run_end': ('seconds', 'error')
+}
+
+
+def register_run_hook(name: str,
+                      fun) -> None:
+    '''
+    Register a function called with every event of the task graph runs,
+    see `RUN_EVENTS`. The events are dictionaries. The hooks are called from
+    the thread calling `TaskGraph.run`. Registering another function with
+    the same name replaces it.
+    '''
+    _RUN_HOOKS[name] = fun
+
+
+def unregister_run_hook(name: str) -> None:
+    _RUN_HOOKS.pop(name, None)
+
+
+def has_run_hooks():
+    return len(_RUN_HOOKS) > 0
+
+
+def node_type_name(node):
+    nodetypes = _get_nodetype(node)
+    return (nodetypes[0] if nodetypes else node.__class__).__name__
+
+
+def emit_run_event(run_id, event, **fields):
+    '''Call the registered hooks with the event. A failing hook only warns.
+    '''
+    if not _RUN_HOOKS:
+        return
+    fields.update({'event': event, 'run_id': run_id, 'time': time.time()})
+    for name, fun in list(_RUN_HOOKS.items()):
+        try:
+            fun(dict(fields))
+        except Exception as err:
+            warnings.warn('Run hook "{}" failed on event "{}": {}'
+                          .format(name, event, err))
+
+
+def emit_node_event(run_id, event, node, **fields):
+    emit_run_event(run_id, event, task_id=node.uid,
+                   node_type=node_type_name(node), **fields)
+
+
+class RunHookEvents(FlowEvents):
+    '''
+    Emits the node_start, node_end and bytes_out run events of the flow and
+    forwards the flow events to `events`. The node_end seconds is the time
+    between the start and the end events, i.e. it includes the queueing time
+    of the pool executors.
+    '''
+
+    def __init__(self, run_id, events=None):
+        self.run_id = run_id
+        self.events = FlowEvents() if events is None else events
+        self.start = {}
+
+    def node_start(self, node):
+        self.events.node_start(node)
+        if node.uid == OUTPUT_ID:
+            return
+        self.start[node] = time.perf_counter()
+        emit_node_event(self.run_id, 'node_start', node)
+
+    def node_end(self, node, output_df):
+        self.events.node_end(node, output_df)
+        if node.uid == OUTPUT_ID:
+            return
+        emit_node_event(self.run_id, 'node_end', node,
+                        seconds=time.perf_counter() - self.start.pop(node))
+        for oport, out in output_df.items():
+            # None for the lazy collections and the unknown sizes
+            emit_node_event(self.run_id, 'bytes_out', node, port=oport,
+                            nbytes=nbytes_or_none(out))
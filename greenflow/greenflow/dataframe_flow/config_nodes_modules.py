@@ -7,17 +7,34 @@ import inspect
 from collections import namedtuple
 import configparser
 import importlib
+import weakref
 
 from .util import get_file_path
 from .taskSpecSchema import TaskSpecSchema
 from .task import Task
 from ._node import _Node
-from ._node_flow import NodeTaskGraphMixin
+from ._node_flow import NodeTaskGraphMixin, _register_mixin_nodetype
+from ._plugin_manifest import (is_plugin, find_plugin_node,
+                               directory_manifest, write_directory_manifest)
 
 
 DEFAULT_MODULE = os.getenv('GREENFLOW_PLUGIN_MODULE', "greenflow.plugin_nodes")
 
 MODULE_CACHE = {}
+# parsed greenflowrc modules, keyed by the file path, modification time and
+# size, and the environment used for the interpolation
+CONFIG_CACHE = {}
+# configured module of the node types found so far
+#     {node_type: (module name, module path)}
+NODE_TYPE_INDEX = {}
+# weak reference to the NodeInTaskGraph class per node class, see
+# get_node_tgraphmixin_instance. The NodeInTaskGraph class is a subclass of
+# its key, it is kept alive by its nodes only so the key can expire.
+TGRAPHMIXIN_CLASS_CACHE = weakref.WeakKeyDictionary()
+# node types of the module directories loaded with a manifest, their
+# submodules are imported on the first access of one of their node types
+#     {module: {node_type: "module:qualname"}}
+LAZY_NODE_TYPES = weakref.WeakKeyDictionary()
 
 
 class ConfigParser(configparser.ConfigParser):
@@ -34,25 +51,99 @@ class ConfigParser(configparser.ConfigParser):
             return super().options(section, **kwargs)
 
 
+def _config_stamp(filename):
+    try:
+        stat = os.stat(filename)
+    except (OSError, TypeError, ValueError):
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
 def get_greenflow_config_modules():
+    '''
+    The modules of the ModuleFiles section of the greenflowrc file set by
+    GREENFLOW_CONFIG. The file is only parsed again when it is modified.
+
+    returns
+        dict, key is the module name, value is the module path
+    '''
     if 'GREENFLOW_CONFIG' not in os.environ:
         os.environ['GREENFLOW_CONFIG'] = os.getcwd() + '/greenflowrc'
         print('\nGREENFLOW_CONFIG NOT SET. SETTING TO: {}'
               .format(os.environ['GREENFLOW_CONFIG']))
 
-    config = ConfigParser(defaults=os.environ)
     greenflow_cfg = os.getenv('GREENFLOW_CONFIG', None)
+    key = (greenflow_cfg, _config_stamp(greenflow_cfg),
+           frozenset(os.environ.items()))
+    if key in CONFIG_CACHE:
+        return dict(CONFIG_CACHE[key])
+
+    config = ConfigParser(defaults=os.environ)
     if Path(greenflow_cfg).is_file():
         config.read(greenflow_cfg)
 
     if 'ModuleFiles' not in config:
-        return {}
+        modules_list = {}
+    else:
+        modules_names = config.options('ModuleFiles')
+        modules_list = {imod: config['ModuleFiles'][imod]
+                        for imod in modules_names}
+
+    CONFIG_CACHE.clear()
+    CONFIG_CACHE[key] = modules_list
+    NODE_TYPE_INDEX.clear()
+    return dict(modules_list)
+
 
-    modules_names = config.options('ModuleFiles')
-    modules_list = {imod: config['ModuleFiles'][imod]
-                    for imod in modules_names}
+def _index_module(key, path, mod):
+    '''Add the node classes of a configured module to NODE_TYPE_INDEX.'''
+    for name, nodecls in vars(mod).items():
+        if inspect.isclass(nodecls) and issubclass(nodecls, _Node):
+            NODE_TYPE_INDEX.setdefault(name, (key, path))
+    for name in LAZY_NODE_TYPES.get(mod, ()):
+        NODE_TYPE_INDEX.setdefault(name, (key, path))
 
-    return modules_list
+
+def check_config_modules():
+    '''
+    Reset NODE_TYPE_INDEX if the greenflowrc file or the environment changed
+    since the node types were indexed.
+    '''
+    if NODE_TYPE_INDEX:
+        get_greenflow_config_modules()
+
+
+def _find_config_module(node_type, check_config=True):
+    '''
+    Find the first configured module with the node type. The modules are
+    loaded in order until one has it. The node types of the loaded modules
+    are indexed so the configuration is not read again for them.
+
+    Arguments
+    -------
+    node_type: str
+        the node class name
+    check_config: Boolean
+        check the configuration is unchanged before using the index, it can
+        be skipped if check_config_modules was just called
+
+    returns
+        namedtuple, absolute path and loaded module, or None
+    '''
+    if check_config:
+        check_config_modules()
+    if node_type in NODE_TYPE_INDEX:
+        key, path = NODE_TYPE_INDEX[node_type]
+        return load_modules(path, name=key)
+
+    # resets the index if the configuration changed
+    modules = get_greenflow_config_modules()
+    for key, path in modules.items():
+        loaded = load_modules(path, name=key)
+        _index_module(key, path, loaded.mod)
+        if hasattr(loaded.mod, node_type):
+            return loaded
+    return None
 
 
 # create a task to add path path
@@ -94,11 +185,36 @@ def import_submodules(package, recursive=True, _main_package=None):
             setattr(_main_package, nodecls.__name__, nodecls)
 
 
+def _set_lazy_node_types(mod, manifest):
+    '''Import the submodule defining a node type of the manifest on the first
+    access of the node type, see PEP 562.
+    '''
+    def __getattr__(name):
+        if name not in manifest:
+            raise AttributeError('module {!r} has no attribute {!r}'
+                                 .format(mod.__name__, name))
+        module_name, qualname = manifest[name].split(':')
+        nodecls = importlib.import_module(module_name)
+        for attr in qualname.split('.'):
+            nodecls = getattr(nodecls, attr)
+        setattr(mod, name, nodecls)
+        return nodecls
+
+    def __dir__():
+        return sorted(set(vars(mod)) | set(manifest))
+
+    mod.__getattr__ = __getattr__
+    mod.__dir__ = __dir__
+    LAZY_NODE_TYPES[mod] = manifest
+
+
 def load_modules(pathfile, name=None):
     """
     Given a py filename with path information,
     It will load the file as a python
     module, put it into the sys.modules and add the path into the pythonpath.
+    The submodules of a directory are all imported the first time, then
+    only the ones of the node types used, see directory_manifest.
     @param modulefile
         string, file name
     @returns
@@ -128,26 +244,36 @@ def load_modules(pathfile, name=None):
     spec = importlib.util.spec_from_file_location(modulename, str(modulepath))
     mod = importlib.util.module_from_spec(spec)
     sys.modules[spec.name] = mod
+    manifest = None
     if filename.is_dir():
-        import_submodules(mod)
+        manifest_file, manifest = directory_manifest(str(filename),
+                                                     spec.name)
+        if manifest is None:
+            import_submodules(mod)
 
     spec.loader.exec_module(mod)
+    if manifest is not None:
+        if '__getattr__' in vars(mod) or '__dir__' in vars(mod):
+            # the module has its own lookup of attributes
+            import_submodules(mod)
+        else:
+            _set_lazy_node_types(mod, manifest)
+    elif filename.is_dir():
+        write_directory_manifest(manifest_file, str(filename), mod)
     Load = namedtuple("Load", "path mod")
     loaded = Load(module_dir, mod)
     MODULE_CACHE[key] = loaded
     return loaded
 
 
-def get_node_tgraphmixin_instance(NodeClass, task):
-    '''Instantiate a node using task and NodeClass with NodeTaskGraphMixin
-    mixin. The returned node instance is a task graph aware node meaning it
-    can query task graph state such as its connections. Refer to the API of
-    NodeTaskGraphMixin.
-
-    :type NodeClass: a class type of a Node implementation
-    :type task: an instance of class::Task
-
+def _get_node_tgraphmixin_class(NodeClass):
+    '''The NodeClass with NodeTaskGraphMixin mixin class, created once per
+    NodeClass so the nodes of the same type share their class.
     '''
+    mixincls_ref = TGRAPHMIXIN_CLASS_CACHE.get(NodeClass)
+    mixincls = None if mixincls_ref is None else mixincls_ref()
+    if mixincls is not None:
+        return mixincls
 
     class NodeInTaskGraph(NodeTaskGraphMixin, NodeClass):
 
@@ -164,11 +290,99 @@ def get_node_tgraphmixin_instance(NodeClass, task):
                 NodeClass.__name__,
                 hex(id(self)))
 
-    return NodeInTaskGraph(task)
+    _register_mixin_nodetype(NodeInTaskGraph, NodeClass)
+    # another thread might have created it meanwhile
+    mixincls = TGRAPHMIXIN_CLASS_CACHE.setdefault(
+        NodeClass, weakref.ref(NodeInTaskGraph))()
+    if mixincls is None:
+        # the class of the other thread nodes was released
+        TGRAPHMIXIN_CLASS_CACHE[NodeClass] = weakref.ref(NodeInTaskGraph)
+        mixincls = NodeInTaskGraph
+    return mixincls
+
+
+def get_node_tgraphmixin_instance(NodeClass, task):
+    '''Instantiate a node using task and NodeClass with NodeTaskGraphMixin
+    mixin. The returned node instance is a task graph aware node meaning it
+    can query task graph state such as its connections. Refer to the API of
+    NodeTaskGraphMixin.
+
+    :type NodeClass: a class type of a Node implementation
+    :type task: an instance of class::Task
+
+    '''
+    return _get_node_tgraphmixin_class(NodeClass)(task)
+
+
+def get_node_class(task_spec, check_config=True):
+    """
+    Find the node class of a task spec with the node type given by name.
+
+    Arguments
+    -------
+    task_spec: dict
+        the task spec, the node type is a class name or a node class
+    check_config: Boolean
+        check the greenflowrc configuration is unchanged, see
+        _find_config_module
+
+    Returns
+    -----
+    tuple
+        (node class, directory of the module loaded from a file or None)
+    """
+    modulepath = task_spec.get(TaskSpecSchema.filepath)
+    module_name = task_spec.get(TaskSpecSchema.module)
+    node_type = task_spec[TaskSpecSchema.node_type]
+
+    NodeClass = None
+    module_dir = None
+    if not isinstance(node_type, str):
+        return node_type, module_dir
+    if modulepath is not None:
+        loaded = load_modules(modulepath)
+        module_dir = loaded.path
+        mod = loaded.mod
+        NodeClass = getattr(mod, node_type)
+    elif (module_name is not None):
+        mod = None
+        if module_name in sys.modules:
+            mod = sys.modules[module_name]
+        elif is_plugin(module_name):
+            # only import the module of the node type
+            NodeClass = find_plugin_node(module_name, node_type)
+        else:
+            modules = get_greenflow_config_modules()
+            loaded = load_modules(
+                modules[module_name], name=module_name)
+            module_dir = loaded.path
+            mod = loaded.mod
+        try:
+            if mod is not None:
+                NodeClass = getattr(mod, node_type)
+        except AttributeError:
+            pass
+    else:
+        try:
+            global DEFAULT_MODULE
+            plugmod = os.getenv('GREENFLOW_PLUGIN_MODULE',
+                                DEFAULT_MODULE)
+            MODLIB = importlib.import_module(plugmod)
+            NodeClass = getattr(MODLIB, node_type)
+        except AttributeError:
+            loaded = _find_config_module(node_type, check_config)
+            if loaded is not None:
+                module_dir = loaded.path
+                NodeClass = getattr(loaded.mod, node_type)
+
+    if NodeClass is None:
+        raise Exception("Cannot find the Node Class:" +
+                        node_type)
+    return NodeClass, module_dir
 
 
 def get_node_obj(task, replace=None, profile=False, tgraph_mixin=False,
-                 dask_ray_setup=True):
+                 dask_ray_setup=True, check_config=True):
     """
     Instantiate a node instance for a task given the replacement setup.
 
@@ -178,6 +392,9 @@ def get_node_obj(task, replace=None, profile=False, tgraph_mixin=False,
         conf parameters replacement
     profile: Boolean
         profile the node computation
+    check_config: Boolean
+        check the greenflowrc configuration is unchanged, see
+        _find_config_module
 
     Returns
     -----
@@ -189,55 +406,11 @@ def get_node_obj(task, replace=None, profile=False, tgraph_mixin=False,
     task_spec = copy.copy(task._task_spec)
     task_spec.update(replace)
 
-    # node_id = task_spec[TaskSpecSchema.task_id]
-    modulepath = task_spec.get(TaskSpecSchema.filepath)
-    module_name = task_spec.get(TaskSpecSchema.module)
-
     node_type = task_spec[TaskSpecSchema.node_type]
     task = Task(task_spec)
 
-    NodeClass = None
-    module_dir = None
     if isinstance(node_type, str):
-        modules = get_greenflow_config_modules()
-        if modulepath is not None:
-            loaded = load_modules(modulepath)
-            module_dir = loaded.path
-            mod = loaded.mod
-            NodeClass = getattr(mod, node_type)
-        elif (module_name is not None):
-            if module_name in sys.modules:
-                mod = sys.modules[module_name]
-            else:
-                loaded = load_modules(
-                    modules[module_name], name=module_name)
-                module_dir = loaded.path
-                mod = loaded.mod
-            try:
-                NodeClass = getattr(mod, node_type)
-            except AttributeError:
-                pass
-        else:
-            try:
-                global DEFAULT_MODULE
-                plugmod = os.getenv('GREENFLOW_PLUGIN_MODULE',
-                                    DEFAULT_MODULE)
-                MODLIB = importlib.import_module(plugmod)
-                NodeClass = getattr(MODLIB, node_type)
-            except AttributeError:
-                for key in modules:
-                    loaded = load_modules(modules[key], name=key)
-                    module_dir = loaded.path
-                    mod = loaded.mod
-                    try:
-                        NodeClass = getattr(mod, node_type)
-                        break
-                    except AttributeError:
-                        continue
-
-        if NodeClass is None:
-            raise Exception("Cannot find the Node Class:" +
-                            node_type)
+        NodeClass, module_dir = get_node_class(task_spec, check_config)
 
         if module_dir:
             append_path(module_dir)
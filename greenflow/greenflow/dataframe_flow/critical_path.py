@@ -0,0 +1,229 @@
+import heapq
+
+from .taskSpecSchema import TaskSpecSchema
+
+__all__ = ['CriticalPath']
+
+# durations in seconds below this are considered zero
+_EPS = 1e-9
+
+
+class CriticalPath(object):
+    '''
+    Critical path analysis of a task graph from the durations of its nodes,
+    typically recorded by `TaskGraph.run(profile=True)`:
+
+        result = tgraph.run(outputs, profile=True)
+        cpath = CriticalPath.from_profile(result.profile)
+        cpath.to_dataframe().sort_values('slack')
+        cpath.makespan(4)
+        tgraph.viz_graph(critical_path=cpath)
+
+    The nodes on the critical path have no slack, making any of them faster
+    makes the whole run faster. The slack of the other nodes is how much
+    longer they could take without delaying the run. Transfer and
+    scheduling overheads are not modelled.
+
+    :ivar durations: seconds per task id
+    :ivar edges: set of (parent task id, child task id)
+    :ivar path: task ids of the critical path from source to sink
+    :ivar length: duration of the critical path, i.e. the makespan with
+        unlimited workers
+    '''
+
+    def __init__(self, durations, edges):
+        self.durations = dict(durations)
+        self.edges = set((parent, child) for parent, child in edges
+                         if parent in self.durations and
+                         child in self.durations and parent != child)
+        self.parents = {task_id: [] for task_id in self.durations}
+        self.children = {task_id: [] for task_id in self.durations}
+        for parent, child in sorted(self.edges):
+            self.parents[child].append(parent)
+            self.children[parent].append(child)
+        self.order = self.__topological_order()
+        self.__analyse()
+
+    @classmethod
+    def from_profile(cls, profile, task_graph=None, weight='wall_time'):
+        '''
+        Arguments
+        -------
+        profile: Profile
+            the profile of a run, see `TaskGraph.run`
+        task_graph: TaskGraph
+            take the edges from the task specs instead of the profile
+        weight: str
+            the duration of a node, a column of `Profile.to_dataframe`, e.g.
+            'wall_time' or 'process_time'
+        '''
+        durations = {}
+        for record in profile:
+            durations[record.task_id] = record.to_dict()[weight] or 0.0
+        if task_graph is None:
+            edges = profile.edges
+        else:
+            edges = _task_graph_edges(task_graph)
+        return cls(durations, edges)
+
+    def __topological_order(self):
+        indegree = {task_id: len(parents)
+                    for task_id, parents in self.parents.items()}
+        ready = sorted(task_id for task_id, count in indegree.items()
+                       if count == 0)
+        order = []
+        while ready:
+            task_id = ready.pop()
+            order.append(task_id)
+            for child in self.children[task_id]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+        if len(order) != len(self.durations):
+            cycle = sorted(set(self.durations) - set(order))
+            raise Exception('The task graph has a cycle through tasks {}'
+                            .format(cycle))
+        return order
+
+    def __analyse(self):
+        self.earliest_start = {}
+        self.earliest_finish = {}
+        best_parent = {}
+        for task_id in self.order:
+            start = 0.0
+            if self.parents[task_id]:
+                parent = max(self.parents[task_id],
+                             key=lambda tid: self.earliest_finish[tid])
+                best_parent[task_id] = parent
+                start = self.earliest_finish[parent]
+            self.earliest_start[task_id] = start
+            self.earliest_finish[task_id] = start + self.durations[task_id]
+        self.length = max(self.earliest_finish.values(), default=0.0)
+
+        self.latest_finish = {}
+        self.latest_start = {}
+        # longest path from the start of the node to the end of the run
+        self.bottom_level = {}
+        for task_id in reversed(self.order):
+            finish = min((self.latest_start[child]
+                          for child in self.children[task_id]),
+                         default=self.length)
+            self.latest_finish[task_id] = finish
+            self.latest_start[task_id] = finish - self.durations[task_id]
+            self.bottom_level[task_id] = self.durations[task_id] + max(
+                (self.bottom_level[child]
+                 for child in self.children[task_id]), default=0.0)
+        self.slack = {task_id: max(self.latest_start[task_id] -
+                                   self.earliest_start[task_id], 0.0)
+                      for task_id in self.order}
+
+        path = []
+        if self.order:
+            task_id = max(self.order,
+                          key=lambda tid: self.earliest_finish[tid])
+            while task_id is not None:
+                path.append(task_id)
+                task_id = best_parent.get(task_id)
+        self.path = list(reversed(path))
+
+    def is_critical(self, task_id):
+        return task_id in self.path
+
+    def is_critical_edge(self, parent, child):
+        '''Whether the edge links two consecutive nodes of the path.'''
+        try:
+            index = self.path.index(parent)
+        except ValueError:
+            return False
+        return index + 1 < len(self.path) and self.path[index + 1] == child
+
+    def makespan(self, workers):
+        '''
+        Estimate the duration of the run on a number of workers, scheduling
+        the ready node with the longest path to the end of the run first.
+        It is at least the critical path length and the total duration
+        divided by the number of workers.
+        '''
+        if workers < 1:
+            raise ValueError('The number of workers must be positive')
+        pending = {task_id: len(parents)
+                   for task_id, parents in self.parents.items()}
+        ready = [(-self.bottom_level[task_id], task_id)
+                 for task_id, count in pending.items() if count == 0]
+        heapq.heapify(ready)
+        running = []
+        now = 0.0
+        while ready or running:
+            while ready and len(running) < workers:
+                _, task_id = heapq.heappop(ready)
+                heapq.heappush(running,
+                               (now + self.durations[task_id], task_id))
+            now, task_id = heapq.heappop(running)
+            for child in self.children[task_id]:
+                pending[child] -= 1
+                if pending[child] == 0:
+                    heapq.heappush(ready, (-self.bottom_level[child], child))
+        return now
+
+    def what_if(self, durations):
+        '''
+        The analysis with some durations changed, e.g. `{task_id: 0}` for a
+        node whose outputs are cached.
+        '''
+        new_durations = dict(self.durations)
+        new_durations.update(durations)
+        return CriticalPath(new_durations, self.edges)
+
+    def to_dataframe(self):
+        '''
+        returns
+            pandas.DataFrame, one row per node in topological order indexed
+            by the task id
+        '''
+        import pandas as pd
+        rows = [{
+            'task_id': task_id,
+            'duration': self.durations[task_id],
+            'earliest_start': self.earliest_start[task_id],
+            'earliest_finish': self.earliest_finish[task_id],
+            'latest_start': self.latest_start[task_id],
+            'latest_finish': self.latest_finish[task_id],
+            'slack': self.slack[task_id],
+            'critical': self.is_critical(task_id)
+        } for task_id in self.order]
+        columns = ['task_id', 'duration', 'earliest_start',
+                   'earliest_finish', 'latest_start', 'latest_finish',
+                   'slack', 'critical']
+        return pd.DataFrame(rows, columns=columns).set_index('task_id')
+
+    def makespan_table(self, workers=(1, 2, 4, 8)):
+        '''
+        returns
+            pandas.DataFrame, the estimated makespan, the speedup over one
+            worker and the lower bound per number of workers
+        '''
+        import pandas as pd
+        total = sum(self.durations.values())
+        rows = []
+        for nworkers in workers:
+            makespan = self.makespan(nworkers)
+            rows.append({
+                'workers': nworkers,
+                'makespan': makespan,
+                'speedup': total / makespan if makespan > _EPS else 1.0,
+                'lower_bound': max(self.length, total / nworkers)
+            })
+        return pd.DataFrame(rows).set_index('workers')
+
+
+def _task_graph_edges(task_graph):
+    '''(parent task id, child task id) of the task specs inputs.'''
+    edges = []
+    for task in task_graph:
+        task_inputs = task[TaskSpecSchema.inputs]
+        for iport_or_tid in task_inputs:
+            taskin_and_oport = task_inputs[iport_or_tid] \
+                if isinstance(task_inputs, dict) else iport_or_tid
+            edges.append((taskin_and_oport.split('.')[0],
+                          task[TaskSpecSchema.task_id]))
+    return edges
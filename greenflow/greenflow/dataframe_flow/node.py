@@ -97,6 +97,9 @@ class Node(NodeExtensionMixin, _PortsMixin, _Node):
         self.save = task.get(TaskSpecSchema.save, False)
 
         self.delayed_process = False
+        # alignment of the delayed inputs with different npartitions, one of
+        # 'auto', 'divisions', 'broadcast', 'shuffle' or 'off'
+        self.partition_alignment = 'auto'
         # eargerly infer the metadata, costly
         self.infer_meta = False
         # customized the column setup
@@ -179,6 +182,24 @@ class Node(NodeExtensionMixin, _PortsMixin, _Node):
         """
         pass
 
+    @classmethod
+    def reuse_key(cls, conf):
+        """
+        State the node depends on outside of its task spec, e.g. the stamps
+        of the files read by `update`. TaskGraph.run reuses the node built
+        by the previous run, and its memoized outputs, only while the task
+        spec and this key are unchanged.
+
+        Arguments
+        -------
+        conf: dict
+            the conf of the task, with the replacement
+
+        returns
+            picklable object, or None to never reuse the node
+        """
+        return ''
+
     def get_connected_inports(self) -> dict:
         """
         Get all the connected input port information. It is used by individual
@@ -203,6 +224,13 @@ class Node(NodeExtensionMixin, _PortsMixin, _Node):
         support.  In order to use Dask (for distributed computation i.e.
         multi-gpu in examples later on) we set the flag and the framework
         handles dask dataframes automatically under the hood.
+
+        Dask dataframe inputs with different number of partitions are
+        aligned automatically. The self.partition_alignment flag selects the
+        strategy instead: 'divisions' to repartition inputs sorted on the
+        index, 'broadcast' to pass a single partition input to every
+        partition, 'shuffle' to hash partition on the index, or 'off' to
+        raise an error.
         """
         pass
 
@@ -311,6 +339,32 @@ class Node(NodeExtensionMixin, _PortsMixin, _Node):
         output = None
         return output
 
+    def combine_partitions(self, port_name, outputs):
+        """
+        Combine the outputs of an output port computed on several partitions
+        into one. Override it for the output ports with the
+        PortsSpecSchema.REDUCE_TREE reduction, see PortsSpecSchema. It is
+        called on groups of the partition outputs, then on groups of the
+        combined outputs, and so on until there is one left, so it must be
+        associative.
+
+        Arguments
+        -------
+        port_name: str
+            the output port name
+        outputs: list
+            outputs of process or of combine_partitions for the port
+
+        Returns
+        -------
+        object
+            the combined output
+        """
+        raise NotImplementedError(
+            'Node "{}" output port "{}" has the tree reduction but the node '
+            'does not implement combine_partitions'.format(self.uid,
+                                                           port_name))
+
 # Validation methods ######################################
     def validate_connected_ports(self) -> None:
         """
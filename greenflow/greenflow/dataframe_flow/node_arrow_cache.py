@@ -0,0 +1,147 @@
+import os
+import pandas as pd
+
+from .portsSpecSchema import PortsSpecSchema
+
+__all__ = ['NodeArrowCacheMixin']
+
+# file extension of the cache formats
+CACHE_FORMATS = {
+    # Arrow IPC file (feather v2), uncompressed so it can be memory mapped
+    'feather': '.arrow',
+    # compressed columnar file for cold storage
+    'parquet': '.parquet'
+}
+
+
+def _is_cudf(port_type):
+    '''Whether the port type asks for a cudf DataFrame.'''
+    ptypes = port_type if isinstance(port_type, list) else [port_type]
+    for ptype in ptypes:
+        name = ptype if isinstance(ptype, str) else '{}.{}'.format(
+            getattr(ptype, '__module__', ''), getattr(ptype, '__name__', ''))
+        if name.startswith('cudf'):
+            return True
+    return False
+
+
+class NodeArrowCacheMixin:
+    '''Cache the output dataframes of a node as Arrow IPC (feather v2) or
+    Parquet files, one file per output port in the directory
+    `{cache_dir}/{uid}`. Arrow IPC files are memory mapped on load, so
+    numeric columns of pandas dataframes are near zero-copy. Parquet files
+    are compressed. It works with pandas dataframes, and with cudf
+    dataframes for the ports of cudf type.
+
+    :ivar cache_format: default format of the output ports, "feather" or
+        "parquet".
+    :ivar cache_port_formats: format per output port name, it overrides the
+        `cache_format`.
+
+    The task conf "cache_format" overrides both, it is either a format name
+    or a dictionary of formats keyed by output port name.
+    '''
+    cache_format = 'feather'
+    cache_port_formats = {}
+    parquet_compression = 'zstd'
+
+    def get_cache_format(self, oport):
+        conf_format = self.conf.get('cache_format') \
+            if isinstance(self.conf, dict) else None
+        if isinstance(conf_format, dict):
+            cache_format = conf_format.get(
+                oport, self.cache_port_formats.get(oport, self.cache_format))
+        elif conf_format is not None:
+            cache_format = conf_format
+        else:
+            cache_format = self.cache_port_formats.get(oport,
+                                                       self.cache_format)
+        if cache_format not in CACHE_FORMATS:
+            raise ValueError(
+                'Task "{}" port "{}" unknown cache format "{}". Choose one '
+                'of {}.'.format(self.uid, oport, cache_format,
+                                sorted(CACHE_FORMATS.keys())))
+        return cache_format
+
+    def __cache_path(self, filename=None):
+        if filename is not None:
+            return filename
+        cache_dir = os.getenv('GREENFLOW_CACHE_DIR', self.cache_dir)
+        return os.path.join(cache_dir, self.uid)
+
+    def load_cache(self, filename=None) -> dict:
+        """
+        Defines the behavior of how to load the cache files from the
+        `filename` directory.
+
+        Arguments
+        -------
+        filename: str
+            directory of the cache files. Leave as none to use default.
+        returns: dict
+            dictionary of the output from this node
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        cache_path = self.__cache_path(filename)
+        output_df = {}
+        for oport, pspec in \
+                self._get_output_ports(full_port_spec=True).items():
+            if not self.outport_connected(oport):
+                continue
+            cache_format = self.get_cache_format(oport)
+            portfile = os.path.join(cache_path,
+                                    oport + CACHE_FORMATS[cache_format])
+            if not os.path.exists(portfile):
+                raise Exception(
+                    'The task "{}" port "{}" cache file "{}" not found. '
+                    'Cannot load from cache.'
+                    .format(self.uid, oport, portfile))
+            if cache_format == 'feather':
+                with pa.memory_map(portfile, 'r') as source:
+                    table = pa.ipc.open_file(source).read_all()
+            else:
+                table = pq.read_table(portfile, memory_map=True)
+            if _is_cudf(pspec.get(PortsSpecSchema.port_type)):
+                import cudf
+                output_df[oport] = cudf.DataFrame.from_arrow(table)
+            else:
+                # keep the columns in separate blocks to avoid the
+                # consolidation copy
+                output_df[oport] = table.to_pandas(split_blocks=True)
+        return output_df
+
+    def save_cache(self, output_data: dict):
+        '''Defines the behavior for how to save the output of a node to
+        filesystem cache.
+
+        :param output_data: The output from :meth:`process`. The outputs
+            must be pandas or cudf dataframes.
+        '''
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        cache_path = self.__cache_path()
+        os.makedirs(cache_path, exist_ok=True)
+        for oport, odf in output_data.items():
+            if hasattr(odf, 'to_arrow'):
+                # cudf DataFrame
+                table = odf.to_arrow()
+            elif isinstance(odf, pd.DataFrame):
+                table = pa.Table.from_pandas(odf)
+            else:
+                raise Exception(
+                    'Task "{}" port "{}" output object is not a pandas or '
+                    'cudf DataFrame. Cannot save to cache.'
+                    .format(self.uid, oport))
+            cache_format = self.get_cache_format(oport)
+            portfile = os.path.join(cache_path,
+                                    oport + CACHE_FORMATS[cache_format])
+            if cache_format == 'feather':
+                with pa.OSFile(portfile, 'wb') as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+            else:
+                pq.write_table(table, portfile,
+                               compression=self.parquet_compression)
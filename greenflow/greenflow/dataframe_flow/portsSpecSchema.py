@@ -94,13 +94,26 @@ class PortsSpecSchema(object):
         the input or output might be optional so missing.
         Optional port setting.
         Default: False i.e. if port defined it is assumed required.
+    :cvar reduction: How the per partition outputs of an output port that is
+        not a dask DataFrame are reduced to one output when the node has
+        delayed_process set. One of:
+            REDUCE_FIRST - the output of the first partition only.
+            REDUCE_TREE - combined in a tree with the node method
+                combine_partitions.
+            REDUCE_GATHER - the list of the outputs of all the partitions.
+        Optional port setting.
+        Default: REDUCE_FIRST
 
     '''
 
     port_type = 'type'
     optional = 'optional'
     dynamic = 'dynamic'
+    reduction = 'reduction'
     DYN_MATCH = 'matching_outputs'
+    REDUCE_FIRST = 'first'
+    REDUCE_TREE = 'tree'
+    REDUCE_GATHER = 'gather'
 
     @classmethod
     def _typecheck(cls, schema_field, value):
@@ -122,6 +135,11 @@ class PortsSpecSchema(object):
         elif schema_field == cls.dynamic:
             assert isinstance(value, bool), 'Dynamic field must be a '\
                 'boolean. Instead got: {}'.format(value)
+        elif schema_field == cls.reduction:
+            reductions = (cls.REDUCE_FIRST, cls.REDUCE_TREE,
+                          cls.REDUCE_GATHER)
+            assert value in reductions, 'Reduction field must be one of '\
+                '{}. Instead got: {}'.format(reductions, value)
         else:
             raise KeyError('Uknown schema field "{}" in the port spec.'.format(
                 schema_field))
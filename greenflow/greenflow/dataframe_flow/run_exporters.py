@@ -0,0 +1,171 @@
+import os
+import json
+import threading
+from collections import defaultdict
+
+__all__ = ['JsonLinesLogger', 'PrometheusTextExporter']
+
+# default buckets of the node seconds histogram, the prometheus client
+# defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75,
+                   1.0, 2.5, 5.0, 7.5, 10.0, float('inf'))
+
+
+class JsonLinesLogger(object):
+    '''
+    Run hook appending every run event as a line of JSON to a file, e.g.
+
+        from greenflow.dataframe_flow._run_events import register_run_hook
+        register_run_hook('jsonl', JsonLinesLogger('runs.jsonl'))
+
+    :param filename: the log file, created if missing
+    :param events: names of the events to log, all events if None
+    '''
+
+    def __init__(self, filename, events=None):
+        self.filename = filename
+        self.events = None if events is None else set(events)
+        self.__lock = threading.Lock()
+
+    def __call__(self, event):
+        if self.events is not None and event['event'] not in self.events:
+            return
+        line = json.dumps(event, default=str)
+        with self.__lock:
+            with open(self.filename, 'a') as f:
+                f.write(line + '\n')
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace(
+            '"', '\\"').replace('\n', '\\n')
+    return ','.join('{}="{}"'.format(key, escape(value))
+                    for key, value in sorted(labels.items()))
+
+
+def _format_le(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+class PrometheusTextExporter(object):
+    '''
+    Run hook aggregating the run events into metrics written in the
+    Prometheus text format at the end of every run, e.g. for the textfile
+    collector of the node exporter. The file is replaced atomically. The
+    metrics add up over the runs of this process.
+
+        greenflow_node_seconds              histogram, node run time
+        greenflow_validation_seconds_total  counter
+        greenflow_cache_hits_total          counter, by cache
+        greenflow_cache_misses_total        counter
+        greenflow_bytes_out_total           counter, by output port
+        greenflow_runs_total                counter, by status ok or error
+        greenflow_last_run_seconds          gauge
+        greenflow_last_run_timestamp_seconds gauge
+
+    :param filename: the metrics file, e.g. `greenflow.prom`
+    :param buckets: upper bounds of the node seconds histogram
+    :param task_labels: label the node metrics by task id and node type,
+        otherwise by node type only
+    '''
+
+    def __init__(self, filename, buckets=DEFAULT_BUCKETS, task_labels=True):
+        self.filename = filename
+        self.buckets = tuple(sorted(buckets))
+        if self.buckets[-1] != float('inf'):
+            self.buckets += (float('inf'),)
+        self.task_labels = task_labels
+        self.__lock = threading.Lock()
+        # {labels: [bucket counts..., sum]}
+        self.node_seconds = {}
+        self.validation_seconds = defaultdict(float)
+        self.cache_hits = defaultdict(int)
+        self.cache_misses = defaultdict(int)
+        self.bytes_out = defaultdict(int)
+        self.runs = defaultdict(int)
+        self.last_run = None
+
+    def __node_labels(self, event, **labels):
+        if self.task_labels:
+            labels['task_id'] = event['task_id']
+        return _labels(node_type=event['node_type'], **labels)
+
+    def __call__(self, event):
+        name = event['event']
+        with self.__lock:
+            if name == 'node_end':
+                labels = self.__node_labels(event)
+                hist = self.node_seconds.setdefault(
+                    labels, [0] * len(self.buckets) + [0.0])
+                for ibucket, bound in enumerate(self.buckets):
+                    if event['seconds'] <= bound:
+                        hist[ibucket] += 1
+                hist[-1] += event['seconds']
+            elif name == 'validation_time':
+                self.validation_seconds[self.__node_labels(event)] += \
+                    event['seconds']
+            elif name == 'cache_hit':
+                self.cache_hits[
+                    self.__node_labels(event, cache=event['cache'])] += 1
+            elif name == 'cache_miss':
+                self.cache_misses[self.__node_labels(event)] += 1
+            elif name == 'bytes_out':
+                if event['nbytes'] is not None:
+                    self.bytes_out[
+                        self.__node_labels(event, port=event['port'])] += \
+                        event['nbytes']
+            elif name == 'run_end':
+                status = 'ok' if event['error'] is None else 'error'
+                self.runs[_labels(status=status)] += 1
+                self.last_run = (event['seconds'], event['time'])
+                self.write()
+
+    def to_text(self):
+        '''The metrics in the Prometheus text exposition format.'''
+        lines = []
+
+        def metric(name, kind, doc, values):
+            lines.append('# HELP {} {}'.format(name, doc))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for labels, value in sorted(values.items()):
+                if labels:
+                    lines.append('{}{{{}}} {}'.format(name, labels, value))
+                else:
+                    lines.append('{} {}'.format(name, value))
+
+        lines.append('# HELP greenflow_node_seconds Node run time in '
+                     'seconds.')
+        lines.append('# TYPE greenflow_node_seconds histogram')
+        for labels, hist in sorted(self.node_seconds.items()):
+            for bound, count in zip(self.buckets, hist):
+                lines.append('greenflow_node_seconds_bucket{{{},le="{}"}} {}'
+                             .format(labels, _format_le(bound), count))
+            lines.append('greenflow_node_seconds_sum{{{}}} {}'.format(
+                labels, hist[-1]))
+            lines.append('greenflow_node_seconds_count{{{}}} {}'.format(
+                labels, hist[-2]))
+        metric('greenflow_validation_seconds_total', 'counter',
+               'Node validation time in seconds.', self.validation_seconds)
+        metric('greenflow_cache_hits_total', 'counter',
+               'Node outputs loaded from the result cache.', self.cache_hits)
+        metric('greenflow_cache_misses_total', 'counter',
+               'Memoized nodes not found in the result cache.',
+               self.cache_misses)
+        metric('greenflow_bytes_out_total', 'counter',
+               'Bytes of the node outputs.', self.bytes_out)
+        metric('greenflow_runs_total', 'counter', 'Task graph runs.',
+               self.runs)
+        if self.last_run is not None:
+            seconds, timestamp = self.last_run
+            metric('greenflow_last_run_seconds', 'gauge',
+                   'Duration of the last task graph run.', {'': seconds})
+            metric('greenflow_last_run_timestamp_seconds', 'gauge',
+                   'End time of the last task graph run.', {'': timestamp})
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        tmpname = '{}.{}.tmp'.format(self.filename, os.getpid())
+        with open(tmpname, 'w') as f:
+            f.write(self.to_text())
+        os.replace(tmpname, self.filename)
@@ -1,29 +1,80 @@
+import os
+import sys
 import warnings
 import copy
 import traceback
+import pickle
+import marshal
+import time
+import uuid
+import hashlib
+import weakref
+import tracemalloc
 import cloudpickle
 import base64
+import dask
 from types import ModuleType
-from collections import OrderedDict
+from collections import OrderedDict, deque
 import ruamel.yaml
 
 from .node import Node
-from ._node_flow import OUTPUT_ID, OUTPUT_TYPE, _CLEANUP
+from ._node_flow import (OUTPUT_ID, OUTPUT_TYPE, _CLEANUP, _get_nodetype,
+                         _copy_outputs)
 from .task import Task
 from .taskSpecSchema import TaskSpecSchema
 from .portsSpecSchema import NodePorts, ConfSchema, PortsSpecSchema
 from .util import get_encoded_class
-from .config_nodes_modules import get_node_obj
+from .config_nodes_modules import (get_node_obj, get_node_class,
+                                   check_config_modules)
+from ._executor import (get_executor, topological_order, LiveOutputs,
+                        dask_graph, dask_port_output)
+from ._result_cache import get_result_cache
+from ._disk_cache import get_disk_cache, _file_digest
+from ._plugin_manifest import is_plugin, load_plugin
+from ._profiler import NodeProfile, Profile, measure
+from ._run_events import (has_run_hooks, emit_run_event, emit_node_event,
+                          node_type_name, RunHookEvents)
 
 __all__ = ['TaskGraph', 'OutputCollector']
 
+# the validation policies of TaskGraph.run
+VALIDATE_POLICIES = ('full', 'first-run', 'sample', 'off')
+
+# parsed task graph files {real path: ((mtime_ns, size), task spec list)}
+TASKGRAPH_CACHE = {}
+# digest of the code of the functions defined per class, see _class_digest
+#     {class: ([(name, code object)], digest)}
+CLASS_DIGESTS = weakref.WeakKeyDictionary()
+# digests of the node module files {file name: ((mtime_ns, size), digest)}
+MODULE_DIGESTS = {}
+
 server_task_graph = None
 
 
+def _load_task_spec_list(filename):
+    '''The task spec list of a yaml file. The file is only parsed again
+    when it is modified, the spec list returned is a copy.'''
+    path = os.path.realpath(filename)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = TASKGRAPH_CACHE.get(path)
+    if cached is None or cached[0] != stamp:
+        with open(path) as f:
+            yaml = ruamel.yaml.YAML(typ='safe')
+            yaml.constructor.yaml_constructors[
+                u'tag:yaml.org,2002:timestamp'] = \
+                yaml.constructor.yaml_constructors[u'tag:yaml.org,2002:str']
+            obj = yaml.load(f)
+        cached = (stamp, obj)
+        TASKGRAPH_CACHE[path] = cached
+    return copy.deepcopy(cached[1])
+
+
 def add_module_from_base64(module_name, class_str):
     class_obj = cloudpickle.loads(base64.b64decode(class_str))
     class_name = class_obj.__name__
-    import sys
+    if is_plugin(module_name):
+        load_plugin(module_name)
     if module_name in sys.modules:
         mod = sys.modules[module_name]
     else:
@@ -49,10 +100,12 @@ class OutputCollector(Node):
 
 class Results(object):
 
-    def __init__(self, values):
+    def __init__(self, values, profile=None):
         self.values = tuple([i[1] for i in values])
         self.__keys = tuple([i[0] for i in values])
         self.__dict = OrderedDict(values)
+        # Profile of the run, see TaskGraph.run
+        self.profile = profile
 
     def __iter__(self):
         return iter(self.values)
@@ -79,6 +132,129 @@ class Results(object):
         return self.__keys
 
 
+def _class_codes(cls):
+    """The code objects of the functions defined in the class, by name."""
+    codes = []
+    for name, attr in sorted(vars(cls).items()):
+        if isinstance(attr, property):
+            funcs = (attr.fget, attr.fset, attr.fdel)
+        else:
+            funcs = (getattr(attr, '__func__', attr),)
+        for func in funcs:
+            code = getattr(func, '__code__', None)
+            if code is not None:
+                codes.append((name, code))
+    return codes
+
+
+def _class_digest(cls):
+    """
+    Digest of the code of the methods, properties, static and class methods
+    defined in the class and its base classes. It is the same across
+    processes as long as their code is unchanged.
+    """
+    digest = hashlib.sha1()
+    for base in cls.__mro__:
+        if base.__module__ == 'builtins':
+            continue
+        codes = _class_codes(base)
+        cached = CLASS_DIGESTS.get(base)
+        # the cached code objects are kept alive, so a method replaced since
+        # has a code object of another id
+        if cached is None or [(name, id(code)) for name, code in codes] != \
+                [(name, id(code)) for name, code in cached[0]]:
+            base_digest = hashlib.sha1('{}:{}'.format(
+                base.__module__, base.__qualname__).encode())
+            for name, code in codes:
+                base_digest.update(name.encode())
+                # version 2 has no object references, the later versions
+                # depend on the reference counts of the code constants
+                base_digest.update(marshal.dumps(code, 2))
+            cached = (codes, base_digest.hexdigest())
+            CLASS_DIGESTS[base] = cached
+        digest.update(cached[1].encode())
+    return digest.hexdigest()
+
+
+def _task_fingerprint(task_spec, profile):
+    """
+    Digest of a task spec. Node classes are identified by their name and
+    code, the class of a node type given by name is the one it resolves to
+    now. The reuse_key of the node class is included. It is None if the task
+    spec can not be pickled, its node class can not be found, or the node
+    is never reused.
+    """
+    spec = dict(task_spec)
+    node_type = spec.get(TaskSpecSchema.node_type)
+    if isinstance(node_type, str) and node_type != OUTPUT_TYPE:
+        # the class registered under the name may have been replaced, the
+        # configuration is checked once by TaskGraph._build
+        try:
+            node_type = get_node_class(spec, check_config=False)[0]
+        except Exception:
+            return None
+    reuse_key = ''
+    if isinstance(node_type, type):
+        spec[TaskSpecSchema.node_type] = (
+            node_type.__module__, node_type.__qualname__,
+            _class_digest(node_type))
+        if hasattr(node_type, 'reuse_key'):
+            try:
+                reuse_key = node_type.reuse_key(
+                    spec.get(TaskSpecSchema.conf, {}))
+            except Exception:
+                return None
+            if reuse_key is None:
+                return None
+    try:
+        data = pickle.dumps((spec, profile, reuse_key),
+                            protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+    return hashlib.sha1(data).hexdigest()
+
+
+def _module_digest(module_name):
+    """
+    Digest of the source file of a module, computed again only once the file
+    is modified. It is empty if the module has no file.
+    """
+    filename = getattr(sys.modules.get(module_name), '__file__', None)
+    if filename is None:
+        return ''
+    try:
+        stat = os.stat(filename)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if MODULE_DIGESTS.get(filename, (None,))[0] != stamp:
+            MODULE_DIGESTS[filename] = (stamp, _file_digest(filename))
+    except OSError:
+        return ''
+    return MODULE_DIGESTS[filename][1]
+
+
+def _code_version(node):
+    """
+    Version of the package implementing the node, it is empty if the package
+    has no version, the digest of the code of the node class and its base
+    classes, and the digests of the files of the modules defining them, so
+    that the module functions and constants they use are covered.
+
+    It does not cover the code of the other modules the node calls, the
+    versions of the other packages, the environment, or the files the node
+    reads. The nodes depending on these declare them with Node.reuse_key,
+    which is part of the task fingerprint.
+    """
+    nodetypes = _get_nodetype(node)
+    if not nodetypes:
+        return ''
+    package = nodetypes[0].__module__.split('.')[0]
+    version = getattr(sys.modules.get(package), '__version__', '')
+    modules = sorted(set(base.__module__ for base in nodetypes[0].__mro__
+                         if base.__module__ != 'builtins'))
+    return ':'.join([version, _class_digest(nodetypes[0])] +
+                    [_module_digest(name) for name in modules])
+
+
 def formated_result(result):
     import ipywidgets as widgets
     from IPython.display import display
@@ -121,6 +297,22 @@ class TaskGraph(object):
         '''
         self.__task_list = {}
         self.__node_dict = {}
+        # nodes in topological order, computed once per build
+        self.__node_order = []
+        # nodes of the previous build that can be reused
+        #     {task_id: (fingerprint, node)}
+        self.__plan = {}
+        # reused nodes that are already validated
+        self.__validated = set()
+        # reused nodes whose outputs are already validated, see run validate
+        self.__outputs_validated = set()
+        # number of runs, see run validate 'sample'
+        self.__runs = 0
+        # fingerprints of the tasks of the last build
+        self.__fingerprints = {}
+        # live intermediate outputs summary of the last run with
+        # report_memory
+        self.memory_report = None
         self.__index = None
         # this is server widget that this taskgraph associated with
         self.__widget = None
@@ -199,21 +391,25 @@ class TaskGraph(object):
 
         """
 
-        if (node.visited):
-            return
-        node.visited = True
+        # depth first with an explicit stack, deep graphs would hit the
+        # recursion limit otherwise
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if (node.visited):
+                continue
+            node.visited = True
 
-        if len(node.inputs) == 0:
-            inputs.append(node)
-            return
+            if len(node.inputs) == 0:
+                inputs.append(node)
+                continue
 
-        if consider_load and node.load:
-            inputs.append(node)
-            return
+            if consider_load and node.load:
+                inputs.append(node)
+                continue
 
-        for node_in in node.inputs:
-            inode = node_in['from_node']
-            self.__find_roots(inode, inputs, consider_load)
+            stack.extend(reversed(
+                [node_in['from_node'] for node_in in node.inputs]))
 
     def start_labwidget(self):
         from IPython.display import display
@@ -254,7 +450,8 @@ class TaskGraph(object):
     @staticmethod
     def load_taskgraph(filename):
         """
-        load the yaml file to TaskGraph object
+        load the yaml file to TaskGraph object. The parsed file is cached
+        until it is modified, e.g. for the composite nodes of the same file.
 
         Arguments
         -------
@@ -266,14 +463,7 @@ class TaskGraph(object):
             the TaskGraph instance
 
         """
-
-        with open(filename) as f:
-            yaml = ruamel.yaml.YAML(typ='safe')
-            yaml.constructor.yaml_constructors[
-                u'tag:yaml.org,2002:timestamp'] = \
-                yaml.constructor.yaml_constructors[u'tag:yaml.org,2002:str']
-            obj = yaml.load(f)
-        t = TaskGraph(obj)
+        t = TaskGraph(_load_task_spec_list(filename))
         return t
 
     def export_task_speclist(self):
@@ -310,10 +500,18 @@ class TaskGraph(object):
         with open(filename, 'w') as fh:
             ruamel.yaml.dump(tlist_od, fh, default_flow_style=False)
 
-    def viz_graph(self, show_ports=False):
+    def viz_graph(self, show_ports=False, critical_path=None):
         """
         Generate the visulization of the graph in the JupyterLab
 
+        Arguments
+        -------
+        show_ports: Boolean
+            draw the ports of the nodes
+        critical_path: CriticalPath
+            label the nodes with their duration and slack, and draw the
+            critical path in red, see module `critical_path`
+
         Returns
         -----
         nx.DiGraph
@@ -336,17 +534,23 @@ class TaskGraph(object):
                 isplit = taskin_and_oport.split('.')
                 from_task = isplit[0]
                 from_port = isplit[1] if len(isplit) > 1 else None
+                edge_attrs = {}
+                if critical_path is not None and \
+                        critical_path.is_critical_edge(from_task, to_task):
+                    edge_attrs = {'color': 'red', 'penwidth': 2}
                 if show_ports and from_port is not None:
                     to_port = iport_or_tid
                     common_tip = taskin_and_oport
-                    G.add_edge(from_task, common_tip, label=from_port)
-                    G.add_edge(common_tip, to_task, label=to_port)
+                    G.add_edge(from_task, common_tip, label=from_port,
+                               **edge_attrs)
+                    G.add_edge(common_tip, to_task, label=to_port,
+                               **edge_attrs)
                     tnode = G.nodes[common_tip]
                     tnode.update({
                         # 'label': '',
                         'shape': 'point'})
                 else:
-                    G.add_edge(from_task, to_task)
+                    G.add_edge(from_task, to_task, **edge_attrs)
 
             # draw output ports
             if show_ports:
@@ -363,9 +567,109 @@ class TaskGraph(object):
                     tnode.update({
                         # 'label': '',
                         'shape': 'point'})
+
+        if critical_path is not None:
+            for task_id in critical_path.durations:
+                if task_id not in G:
+                    continue
+                G.nodes[task_id]['label'] = '{} ({:.3f}s, slack {:.3f}s)'\
+                    .format(task_id, critical_path.durations[task_id],
+                            critical_path.slack[task_id])
+                if critical_path.is_critical(task_id):
+                    G.nodes[task_id].update({'color': 'red', 'penwidth': 2})
         return G
 
-    def _build(self, replace=None, profile=False):
+    def __find_lineage(self, outputs, replace):
+        """
+        find the task ids that the `outputs` depend on by walking back the
+        inputs of the task specs. No node is instantiated.
+
+        Arguments
+        -------
+        outputs: list
+            the output ports "task_id.port" or task ids
+        replace: dict
+            conf parameters replacement, it may replace the task inputs
+        Returns
+        -----
+        set
+            the task ids of the outputs and all their ancestors
+        """
+        lineage = set()
+        stack = [output.split('.')[0] for output in outputs]
+        while stack:
+            task_id = stack.pop()
+            if task_id in lineage or task_id not in self.__task_list:
+                # missing tasks are reported when the graph is connected
+                continue
+            lineage.add(task_id)
+            task_inputs = replace.get(task_id, {}).get(
+                TaskSpecSchema.inputs,
+                self.__task_list[task_id][TaskSpecSchema.inputs])
+            stack.extend(task_inputs[iport].split('.')[0]
+                         for iport in task_inputs)
+        return lineage
+
+    def __find_fingerprints(self, task_ids, replace, profile):
+        """
+        compute a fingerprint of each task that covers its task spec with
+        the replacement and the fingerprints of all its parent tasks. A task
+        with an unchanged fingerprint computes the same outputs.
+
+        Arguments
+        -------
+        task_ids: set
+            the task ids that are built, it includes all their ancestors
+        replace: dict
+            conf parameters replacement
+        profile: Boolean
+            profile the node computation
+        Returns
+        -----
+        dict
+            fingerprint per task id. It is None if the task or one of its
+            ancestors can not be fingerprinted.
+        """
+        specs = {}
+        for task_id in task_ids:
+            task_spec = copy.copy(self.__task_list[task_id]._task_spec)
+            task_spec.update(replace.get(task_id, {}))
+            specs[task_id] = task_spec
+
+        def parents(task_id):
+            task_inputs = specs[task_id][TaskSpecSchema.inputs]
+            return [task_inputs[iport].split('.')[0] for iport in task_inputs]
+
+        fingerprints = {}
+        visiting = set()
+        for task_id in specs:
+            # post order depth first traversal, the parents first
+            stack = [task_id]
+            while stack:
+                tid = stack[-1]
+                if tid in fingerprints:
+                    stack.pop()
+                    continue
+                todo = [pid for pid in parents(tid) if pid in specs and
+                        pid not in fingerprints and pid not in visiting]
+                if todo and tid not in visiting:
+                    visiting.add(tid)
+                    stack.extend(todo)
+                    continue
+                stack.pop()
+                visiting.discard(tid)
+                # parents in a cycle or missing have no fingerprint
+                parent_fps = [fingerprints.get(pid) for pid in parents(tid)]
+                own_fp = _task_fingerprint(specs[tid], profile)
+                if own_fp is None or None in parent_fps:
+                    fingerprints[tid] = None
+                else:
+                    fingerprints[tid] = hashlib.sha1(
+                        '.'.join([own_fp] + parent_fps).encode()).hexdigest()
+        return fingerprints
+
+    def _build(self, replace=None, profile=False, outputs=None,
+               reuse=False):
         """
         compute the graph structure of the nodes. It will set the input and
         output nodes for each of the node
@@ -374,9 +678,37 @@ class TaskGraph(object):
         -------
         replace: dict
             conf parameters replacement
+        outputs: list
+            the output ports "task_id.port" or task ids. Only these tasks and
+            the tasks they depend on are instantiated. All the tasks are
+            instantiated if it is None.
+        reuse: bool
+            reuse the nodes of the previous build if their task spec,
+            replacement and upstream tasks are unchanged
+        Returns
+        -----
+        set
+            the reused nodes, they are already updated
         """
         self.__node_dict.clear()
+        self.__node_order = []
         replace = dict() if replace is None else replace
+        lineage = None if outputs is None else \
+            self.__find_lineage(outputs, replace)
+
+        # the node types are found without checking the configuration again
+        # for every node
+        check_config_modules()
+        fingerprints = {}
+        self.__fingerprints = fingerprints
+        if reuse:
+            fingerprints = self.__find_fingerprints(
+                self.__task_list.keys() if lineage is None else lineage,
+                replace, profile)
+            self.__fingerprints = fingerprints
+        else:
+            self.__plan.clear()
+        reused = set()
 
         # check if there are item in the replace that is not in the graph
         task_ids = set([task[TaskSpecSchema.task_id] for task in self])
@@ -389,8 +721,21 @@ class TaskGraph(object):
         # instantiate node objects
         for task in self:
             task_id = task[TaskSpecSchema.task_id]
+            if lineage is not None and task_id not in lineage:
+                continue
             nodetype = task[TaskSpecSchema.node_type]
-            if (task_id == OUTPUT_ID or nodetype == OUTPUT_TYPE):
+            fingerprint = fingerprints.get(task_id)
+            planned = self.__plan.get(task_id)
+            if (fingerprint is not None and planned is not None and
+                    planned[0] == fingerprint):
+                node = planned[1]
+                # the connections are made again below
+                node.inputs = []
+                node.outputs = []
+                node.visited = False
+                node.input_df = {}
+                reused.add(node)
+            elif (task_id == OUTPUT_ID or nodetype == OUTPUT_TYPE):
                 output_task = Task({
                     TaskSpecSchema.task_id: OUTPUT_ID,
                     TaskSpecSchema.conf: {},
@@ -400,7 +745,7 @@ class TaskGraph(object):
                 node = get_node_obj(output_task, tgraph_mixin=True)
             else:
                 node = get_node_obj(task, replace.get(task_id), profile,
-                                    tgraph_mixin=True)
+                                    tgraph_mixin=True, check_config=False)
             self.__node_dict[task_id] = node
 
         # build the graph
@@ -436,7 +781,17 @@ class TaskGraph(object):
                     'from_port': src_port
                 })
 
-    def build(self, replace=None, profile=False):
+        self.__node_order = topological_order(
+            list(self.__node_dict.values()))
+
+        if reuse:
+            for task_id, node in self.__node_dict.items():
+                self.__plan[task_id] = (fingerprints[task_id], node)
+        self.__validated &= reused
+        self.__outputs_validated &= reused
+        return reused
+
+    def build(self, replace=None, profile=False, outputs=None, reuse=False):
         """
         compute the graph structure of the nodes. It will set the input and
         output nodes for each of the node
@@ -445,23 +800,34 @@ class TaskGraph(object):
         -------
         replace: dict
             conf parameters replacement
+        outputs: list
+            the output ports "task_id.port" or task ids. Only the subgraph
+            these outputs depend on is built. The whole graph is built if it
+            is None.
+        reuse: bool
+            reuse the nodes of the previous build whose task spec,
+            replacement and upstream tasks are unchanged. Only the other
+            nodes are instantiated and updated.
         """
         # make connection only
-        self._build(replace=replace, profile=profile)
+        reused = self._build(replace=replace, profile=profile,
+                             outputs=outputs, reuse=reuse)
 
         # Columns type checking is done in the :meth:`TaskGraph._run` after the
         # outputs are specified and participating tasks are determined.
 
         # this part is to update each of the node so dynamic inputs can be
         # processed
-        self.breadth_first_update()
+        self.breadth_first_update(extra_updated=reused)
 
-    def breadth_first_update(self, extra_roots=[], extra_updated=set()):
+    def breadth_first_update(self, extra_roots=[], extra_updated=None):
         """
         Do a breadth first graph traversal and update nodes.
 
         Update each note following the causal order. The children notes are
-        only added to the queue if all the parents are updated.
+        only added to the queue if all the parents are updated. It keeps a
+        counter of not yet updated parents per child node (Kahn's algorithm)
+        so the traversal is O(V+E).
 
         Each node is only updated once.
 
@@ -469,26 +835,51 @@ class TaskGraph(object):
         is used for composite node when the graph is connected to other
         graph.
         """
-        queue = []
-        updated = extra_updated
-        for k in self.__node_dict.keys():
-            if len(self.__node_dict[k].inputs) == 0:
-                queue.append(self.__node_dict[k])
+        updated = set() if extra_updated is None else extra_updated
+        queue = deque(node for node in self.__node_dict.values()
+                      if len(node.inputs) == 0)
         queue.extend(extra_roots)
-        while (len(queue) != 0):
-            node_to_update = queue.pop(0)
-            # print('update {}'.format(node_to_update.uid))
-            if node_to_update not in updated:
+        # number of incoming edges from parents not updated yet
+        pending = {}
+        done = set()
+        while queue:
+            node_to_update = queue.popleft()
+            if node_to_update in done:
+                continue
+            done.add(node_to_update)
+            newly_updated = node_to_update not in updated
+            if newly_updated:
                 node_to_update.update()
-            updated.add(node_to_update)
+                updated.add(node_to_update)
+
+            nedges = {}
             for element in node_to_update.outputs:
                 child = element['to_node']
-                if all([i['from_node'] in updated for i in child.inputs]):
+                nedges[child] = nedges.get(child, 0) + 1
+
+            for child, nedge in nedges.items():
+                if child not in pending:
+                    pending[child] = sum(
+                        1 for i in child.inputs
+                        if i['from_node'] not in updated)
+                elif newly_updated:
+                    pending[child] -= nedge
+                if pending[child] == 0:
                     queue.append(child)
-        # print('----done----')
 
     def __getitem__(self, key):
-        return self.__node_dict[key]
+        '''The node of the task `key` of the last build or run. A run only
+        builds the tasks its outputs depend on.'''
+        try:
+            return self.__node_dict[key]
+        except KeyError:
+            if key not in self.__task_list:
+                raise
+        raise KeyError(
+            'Task "{}" is not built, only the tasks the outputs of the last '
+            'run or build depend on are. Call build() to build all the '
+            'tasks.'
+            .format(key))
 
     def __str__(self):
         out_str = ""
@@ -498,6 +889,10 @@ class TaskGraph(object):
 
     def reset(self):
         self.__node_dict.clear()
+        self.__node_order = []
+        self.__plan.clear()
+        self.__validated.clear()
+        self.__outputs_validated.clear()
         self.__task_list.clear()
         self.__index = None
 
@@ -515,92 +910,169 @@ class TaskGraph(object):
             add_module_from_base64(module_name, encoded_class)
             self.__widget.cache = cacheCopy
 
-    def _run(self, outputs=None, replace=None, profile=False, formated=False):
-        replace = dict() if replace is None else replace
+    def __memoize(self, outputs_collector_node, persist=False, run_id=None):
+        """
+        compute the content address of each node from its fingerprint, the
+        version and code of its node class and the addresses of its parents.
+        Walking back from the outputs, the nodes with outputs in the result
+        cache load them, just like nodes with the `load` option, so their
+        ancestors are not needed. The other nodes store their outputs in the
+        result cache.
 
-        self.build(replace, profile)
+        Arguments
+        -------
+        outputs_collector_node: Node
+            the node collecting the outputs of the run
+        persist: Boolean
+            look up and store the outputs in the disk cache too
+        run_id: str
+            emit the cache_hit and cache_miss run events with this run id
+        Returns
+        -----
+        list
+            the memoized nodes and their original `load` option
+        """
+        cache = get_result_cache()
+        disk_cache = get_disk_cache() if persist else None
+        keys = {}
+        for node in self.__node_order:
+            fingerprint = self.__fingerprints.get(node.uid)
+            parent_keys = [keys.get(node_in['from_node'])
+                           for node_in in node.inputs]
+            if fingerprint is None or None in parent_keys:
+                keys[node] = None
+                continue
+            keys[node] = hashlib.sha1('.'.join(
+                [fingerprint, _code_version(node)] + parent_keys
+            ).encode()).hexdigest()
+
+        needed = set(node_in['from_node']
+                     for node_in in outputs_collector_node.inputs)
+        memoized = []
+        for node in reversed(self.__node_order):
+            if node not in needed:
+                continue
+            key = keys[node]
+            if (key is None or isinstance(node, OutputCollector) or
+                    not isinstance(node.load, bool) or node.load):
+                # not memoizable or it loads its outputs already
+                needed.update(node_in['from_node']
+                              for node_in in node.inputs)
+                continue
+            memoized.append((node, node.load))
+            oports = set(node_out['from_port'] for node_out in node.outputs)
+            hit = 'memory'
+            outputs = cache.get(key)
+            if (outputs is None or not oports.issubset(outputs)) and \
+                    disk_cache is not None:
+                hit = 'disk'
+                outputs = disk_cache.get(key)
+                if outputs is not None:
+                    cache.put(key, outputs)
+            if outputs is not None and oports.issubset(outputs):
+                # the cached outputs are not modified by the run
+                node.load = _copy_outputs(outputs)
+                if run_id is not None:
+                    emit_node_event(run_id, 'cache_hit', node, cache=hit)
+            else:
+                node.memo_key = key
+                node.memo_persist = persist
+                needed.update(node_in['from_node']
+                              for node_in in node.inputs)
+                if run_id is not None:
+                    emit_node_event(run_id, 'cache_miss', node)
+        return memoized
+
+    def __connect_outputs(self, outputs):
+        """
+        Connect the outputs to a new output collector node, so that the
+        nodes compute these ports.
+        returns
+            the output collector node
+        """
+        output_task = Task({
+            TaskSpecSchema.task_id: OUTPUT_ID,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.node_type: OutputCollector,
+            TaskSpecSchema.inputs: []
+        })
+
+        outputs_collector_node = get_node_obj(output_task,
+                                              tgraph_mixin=True)
+        for task_id in outputs:
+            nodeid_oport = task_id.split('.')
+            nodeid = nodeid_oport[0]
+            oport = nodeid_oport[1] if len(nodeid_oport) > 1 else None
+            onode = self.__node_dict[nodeid]
+            dummy_port = task_id
+            outputs_collector_node.inputs.append({
+                'from_node': onode,
+                'from_port': oport,
+                'to_port': dummy_port
+            })
+            onode.outputs.append({
+                'to_node': outputs_collector_node,
+                'to_port': dummy_port,
+                'from_port': oport
+            })
+        return outputs_collector_node
 
-        graph_outputs = []
-        # add the output graph only if the Output Node is not in the graph
-        found_output_node = False
+    def _run(self, outputs=None, replace=None, profile=False, formated=False,
+             executor='serial', max_workers=None, memoize=False,
+             report_memory=False, trace=None, validate='full',
+             validate_every=10):
+        replace = dict() if replace is None else replace
+        if validate not in VALIDATE_POLICIES:
+            raise ValueError('Unknown validate policy "{}", expected one of '
+                             '{}'.format(validate, VALIDATE_POLICIES))
+        if validate == 'sample':
+            if validate_every < 1:
+                raise ValueError('validate_every must be positive')
+            validating = self.__runs % validate_every == 0
+        else:
+            validating = validate != 'off'
+        self.__runs += 1
+
+        # the output collector in the task spec is only used if the outputs
+        # are not specified
+        output_task_id = None
         for task in self:
             if (task[TaskSpecSchema.task_id] == OUTPUT_ID or
                     task[TaskSpecSchema.node_type] == OUTPUT_TYPE):
-                found_output_node = True
-                outputs_collector_node = self[task[TaskSpecSchema.task_id]]
-                for input_item in outputs_collector_node.inputs:
-                    from_node_id = input_item['from_node'].uid
-                    fromStr = from_node_id+'.'+input_item['from_port']
-                    graph_outputs.append(fromStr)
+                output_task_id = task[TaskSpecSchema.task_id]
                 break
+        found_output_node = outputs is None and output_task_id is not None
 
-        if outputs is None:
-            outputs = graph_outputs
-
-        if not found_output_node:
-            output_task = Task({
-                TaskSpecSchema.task_id: OUTPUT_ID,
-                TaskSpecSchema.conf: {},
-                TaskSpecSchema.node_type: OutputCollector,
-                TaskSpecSchema.inputs: []
-            })
-
-            outputs_collector_node = get_node_obj(output_task,
-                                                  tgraph_mixin=True)
+        # only build the subgraph that the outputs depend on
+        if found_output_node:
+            self.build(replace, profile, outputs=[output_task_id],
+                       reuse=True)
+        else:
+            self.build(replace, profile,
+                       outputs=[] if outputs is None else outputs,
+                       reuse=True)
+
+        if found_output_node:
+            outputs_collector_node = self[output_task_id]
+            outputs = []
+            for input_item in outputs_collector_node.inputs:
+                from_node_id = input_item['from_node'].uid
+                fromStr = from_node_id+'.'+input_item['from_port']
+                outputs.append(fromStr)
+        else:
+            if outputs is None:
+                outputs = []
+            # set the connection only if output_node is manullay created
+            outputs_collector_node = self.__connect_outputs(outputs)
 
         outputs_collector_node.clear_input = False
-        if not found_output_node or outputs is not None:
-            if found_output_node:
-                # clean all the connections to this output node
-                for uid in self.__node_dict.keys():
-                    node = self.__node_dict[uid]
-                    node.outputs = list(filter(
-                        lambda x: x['to_node'] != outputs_collector_node,
-                        node.outputs))
-
-            # remove the output
-            # set the connection only if output_node is manullay created
-            # or the output is overwritten
-            outputs_collector_node.inputs.clear()
-            outputs_collector_node.outputs.clear()
-            for task_id in outputs:
-                nodeid_oport = task_id.split('.')
-                nodeid = nodeid_oport[0]
-                oport = nodeid_oport[1] if len(nodeid_oport) > 1 else None
-                onode = self.__node_dict[nodeid]
-                dummy_port = task_id
-                outputs_collector_node.inputs.append({
-                    'from_node': onode,
-                    'from_port': oport,
-                    'to_port': dummy_port
-                })
-                onode.outputs.append({
-                    'to_node': outputs_collector_node,
-                    'to_port': dummy_port,
-                    'from_port': oport
-                })
 
         results_task_ids = outputs
 
-        inputs = []
-        self.__find_roots(outputs_collector_node, inputs, consider_load=True)
-
-        # Validate metadata prior to running heavy compute
-        for node in self.__node_dict.values():
-            if not node.visited:
-                continue
-
-            # Run ports validation.
-            PortsSpecSchema.validate_ports(node.ports_setup())
-            node.validate_connected_ports()
-
-            # Run meta setup in case the required meta are calculated
-            # within the meta_setup and are NodeTaskGraphMixin dependent.
-            # node.meta_setup()
-            node.validate_connected_metadata()
-
+        # nodes with cached outputs load them instead of computing
+        progress_fun = None
         if self.__widget is not None:
-            def progress_fun(uid):
+            def widget_progress(uid):
                 cacheCopy = copy.deepcopy(self.__widget.cache)
                 nodes = list(filter(lambda x: x['id'] == uid,
                                     cacheCopy['nodes']
@@ -609,10 +1081,126 @@ class TaskGraph(object):
                     current_node = nodes[0]
                     current_node['busy'] = True
                 self.__widget.cache = cacheCopy
-            for i in inputs:
-                i.flow(progress_fun)
-            # clean up the progress
+            progress_fun = widget_progress
+
+        run_id = None
+        if has_run_hooks():
+            run_id = uuid.uuid4().hex
+            run_start = time.perf_counter()
+            emit_run_event(run_id, 'run_start', outputs=list(outputs))
+        run_error = None
+
+        memoized = []
+        if memoize:
+            memoized = self.__memoize(outputs_collector_node,
+                                      persist=memoize == 'disk',
+                                      run_id=run_id)
+        start_tracing = profile and not tracemalloc.is_tracing()
+        try:
+            # mark the nodes that the outputs depend on as visited
+            inputs = []
+            self.__find_roots(outputs_collector_node, inputs,
+                              consider_load=True)
+
+            if start_tracing:
+                tracemalloc.start()
+            if profile or trace:
+                for node in self.__node_dict.values():
+                    if node.visited and node.uid != OUTPUT_ID:
+                        node.profile_record = NodeProfile(
+                            node.uid, node_type_name(node),
+                            trace=bool(trace))
+
+            # the nodes new since the previous build are validated by the
+            # runs not sampled too
+            for node in self.__node_dict.values():
+                node.validate_outputs = (
+                    validating or validate == 'sample' and
+                    node not in self.__validated) and not (
+                    validate == 'first-run' and
+                    node in self.__outputs_validated)
+
+            # Validate metadata prior to running heavy compute
+            for node in self.__node_dict.values():
+                if validate == 'off' or not node.visited or \
+                        node in self.__validated:
+                    continue
 
+                record = node.profile_record
+                validate_start = time.perf_counter()
+                with measure(record), measure(record, 'validate'):
+                    # Run ports validation.
+                    PortsSpecSchema.validate_ports(node.ports_setup())
+                    node.validate_connected_ports()
+
+                    # Run meta setup in case the required meta are
+                    # calculated within the meta_setup and are
+                    # NodeTaskGraphMixin dependent.
+                    # node.meta_setup()
+                    node.validate_connected_metadata()
+                self.__validated.add(node)
+                if run_id is not None:
+                    emit_node_event(
+                        run_id, 'validation_time', node,
+                        seconds=time.perf_counter() - validate_start)
+
+            flow_nodes = [node for node in self.__node_order if node.visited]
+            visited = [node for node in self.__node_dict.values()
+                       if node.visited]
+            if len(flow_nodes) != len(visited):
+                cycle = [node.uid for node in self.__node_dict.values()
+                         if node.visited and node not in flow_nodes]
+                raise Exception('The task graph has a cycle through tasks {}'
+                                .format(cycle))
+            if not found_output_node:
+                # the output collector is always a sink
+                flow_nodes.append(outputs_collector_node)
+            live_outputs = LiveOutputs(flow_nodes) if report_memory else None
+            events = live_outputs
+            if run_id is not None:
+                events = RunHookEvents(run_id, events)
+            get_executor(executor)(flow_nodes, progress_fun=progress_fun,
+                                   max_workers=max_workers,
+                                   events=events)
+            if validate == 'first-run':
+                self.__outputs_validated.update(flow_nodes)
+            if profile or trace:
+                run_profile = Profile(
+                    (node.profile_record for node in flow_nodes
+                     if node.profile_record is not None),
+                    [(node_in['from_node'].uid, node.uid)
+                     for node in flow_nodes for node_in in node.inputs])
+                if trace:
+                    run_profile.save_chrome_trace(trace)
+                if not profile:
+                    run_profile = None
+            else:
+                run_profile = None
+        except BaseException as err:
+            run_error = repr(err)
+            raise
+        finally:
+            if run_id is not None:
+                emit_run_event(run_id, 'run_end',
+                               seconds=time.perf_counter() - run_start,
+                               error=run_error)
+            for node, load in memoized:
+                node.load = load
+                node.memo_key = None
+                node.memo_persist = False
+            for node in self.__node_dict.values():
+                node.validate_outputs = True
+            if start_tracing:
+                tracemalloc.stop()
+            if profile or trace:
+                for node in self.__node_dict.values():
+                    node.profile_record = None
+
+        if report_memory:
+            self.memory_report = live_outputs.report()
+
+        if self.__widget is not None:
+            # clean up the progress
             def cleanup():
                 import time
                 cacheCopy = copy.deepcopy(self.__widget.cache)
@@ -623,9 +1211,6 @@ class TaskGraph(object):
             import threading
             t = threading.Thread(target=cleanup)
             t.start()
-        else:
-            for i in inputs:
-                i.flow()
 
         results_dfs_dict = outputs_collector_node.input_df
         port_map = {}
@@ -638,7 +1223,7 @@ class TaskGraph(object):
             results.append((task_id, results_dfs_dict[port_map[task_id]]))
         # clean the results afterwards
         outputs_collector_node.input_df = {}
-        result = Results(results)
+        result = Results(results, profile=run_profile)
         ####
         # this is for nemo work around, to clean up the nemo graph
         self.run_cleanup()
@@ -652,10 +1237,24 @@ class TaskGraph(object):
         for v in _CLEANUP.values():
             v(ui_clean)
 
-    def run(self, outputs=None, replace=None, profile=False, formated=False):
+    def run(self, outputs=None, replace=None, profile=False, formated=False,
+            executor='serial', max_workers=None, memoize=False,
+            report_memory=False, trace=None, validate='full',
+            validate_every=10):
         """
         Flow the dataframes in the graph to do the data science computations.
 
+        Only the tasks the outputs depend on are built, the other tasks
+        have no node until the next `build`: `self[task_id]` raises a
+        KeyError for them. The nodes built by the previous run are reused if
+        their task spec, replacement and upstream tasks are unchanged. Call
+        `build` to rebuild all the nodes.
+
+        The run events, e.g. node start and end, cache hits and output
+        bytes, are sent to the hooks registered with
+        `_run_events.register_run_hook`, see the exporters in module
+        `run_exporters`.
+
         Arguments
         -------
         outputs: list
@@ -663,7 +1262,65 @@ class TaskGraph(object):
         replace: list
             a dict that defines the conf parameters replacement
         profile: Boolean
-            whether profile the processing time of the nodes or not
+            profile the nodes. The `profile` attribute of the returned
+            `Results` is then a `Profile` with the wall and CPU time, the
+            time per phase (validate, load, copy, delayed, process, save),
+            the output rows and bytes, and the peak python memory of every
+            node. `Profile.to_dataframe` has one row per node. The peak
+            memory is traced with tracemalloc, which slows down allocation
+            heavy nodes.
+        executor: str
+            'serial' flows the nodes one after another in topological
+            order, computed once per build. 'threads' runs every
+            node on a thread pool as soon as all of its inputs are ready.
+            'processes' does the same on a process pool, passing large
+            outputs between the processes through shared memory.
+            'dask' runs the graph as one dask graph with a task per node,
+            see `to_dask`, on the cluster of the default dask.distributed
+            Client if any, e.g. a LocalCluster.
+            'ray' runs every node as a ray task, the outputs stay in the
+            ray object store and flow to the children tasks by reference.
+        max_workers: int
+            maximum number of workers used by the executor, not used by
+            the 'dask' and 'ray' executors on a cluster
+        memoize: Boolean or str
+            keep the node outputs in the result cache keyed by the node
+            type, conf, package version and the keys of the upstream nodes.
+            Nodes already in the cache are not computed, neither are their
+            ancestors. The cache byte budget is set by
+            `get_result_cache().max_bytes`, least recently used outputs are
+            evicted first. Set it to 'disk' to also keep the outputs in the
+            persistent cache under `GREENFLOW_CACHE_DIR`, shared across
+            processes and sessions, see the `greenflow cache` command. The
+            'processes' executor only reads the caches. The outputs of the
+            types with a copy function, see `register_copy_function`, are
+            copied in and out of the result cache. The outputs of the other
+            types are shared with the cache, they must not be modified in
+            place.
+        report_memory: Boolean
+            measure the peak number of bytes of the intermediate outputs that
+            are alive at the same time, i.e. computed and not yet picked up
+            by all their consumers. The summary is kept in
+            `TaskGraph.memory_report`, see `LiveOutputs.report`.
+        trace: str
+            file name to write a Chrome Trace Event JSON file of the run to,
+            to open in Perfetto (ui.perfetto.dev) or chrome://tracing. It
+            has a span per node run and per phase, on the process and
+            thread that ran it, and the edges as flow arrows.
+        validate: str
+            when to validate the port types and the metadata of the
+            connections before the run, and the outputs of the nodes after
+            they are computed. The connections of the nodes reused from the
+            previous build are only validated once.
+            'full' validates the outputs on every run.
+            'first-run' validates the outputs of a node on its first run
+            only, it is trusted while it is reused by the following runs.
+            'sample' validates every `validate_every`-th run, starting with
+            the first one, and only the nodes new since the previous build
+            on the other runs.
+            'off' validates nothing, for graphs already validated e.g. in CI.
+        validate_every: int
+            the sampling period of the 'sample' validate policy
 
         Returns
         -----
@@ -678,7 +1335,12 @@ class TaskGraph(object):
                 err = ""
                 result = None
                 result = self._run(outputs=outputs, replace=replace,
-                                   profile=profile, formated=formated)
+                                   profile=profile, formated=formated,
+                                   executor=executor, max_workers=max_workers,
+                                   memoize=memoize,
+                                   report_memory=report_memory,
+                                   trace=trace, validate=validate,
+                                   validate_every=validate_every)
             except Exception:
                 err = traceback.format_exc()
             finally:
@@ -692,11 +1354,69 @@ class TaskGraph(object):
             return result
         else:
             return self._run(outputs=outputs, replace=replace, profile=profile,
-                             formated=formated)
+                             formated=formated, executor=executor,
+                             max_workers=max_workers, memoize=memoize,
+                             report_memory=report_memory, trace=trace,
+                             validate=validate,
+                             validate_every=validate_every)
+
+    def to_dask(self, outputs, replace=None):
+        """
+        Turn the subgraph the outputs depend on into a dask graph, with one
+        task per node and the edges of the port connections. Nothing is
+        computed until the returned delayed objects are, e.g. with
+        `dask.compute` or `Client.compute`, so that independent nodes run
+        concurrently on the dask cluster, which takes care of the data
+        locality and of the memory spilling. The port types and metadata
+        of the connections are validated first.
+
+        Arguments
+        -------
+        outputs: list
+            the output ports "task_id.port"
+        replace: dict
+            conf parameters replacement
 
-    def to_pydot(self, show_ports=False):
+        Returns
+        -----
+        dict
+            the dask Delayed of each output
+        """
+        self.build(replace, outputs=outputs, reuse=True)
+        # the outputs are computed for the consumers of the ports only
+        self.__connect_outputs(outputs)
+        nodes = set()
+        stack = [self.__node_dict[output.split('.')[0]] for output in outputs]
+        while stack:
+            node = stack.pop()
+            if node in nodes:
+                continue
+            nodes.add(node)
+            if not node.is_flow_root():
+                stack.extend(node_in['from_node'] for node_in in node.inputs)
+        nodes = [node for node in self.__node_order if node in nodes]
+        for node in nodes:
+            if node in self.__validated:
+                continue
+            PortsSpecSchema.validate_ports(node.ports_setup())
+            node.validate_connected_ports()
+            node.validate_connected_metadata()
+            self.__validated.add(node)
+
+        graph = dask_graph(nodes)
+        delayed = {}
+        for output in outputs:
+            nodeid_oport = output.split('.')
+            node = self.__node_dict[nodeid_oport[0]]
+            oport = nodeid_oport[1] if len(nodeid_oport) > 1 else None
+            delayed[output] = dask.delayed(dask_port_output, pure=True)(
+                graph[node], oport, node.uid)
+        return delayed
+
+    def to_pydot(self, show_ports=False, critical_path=None):
         import networkx as nx
-        nx_graph = self.viz_graph(show_ports=show_ports)
+        nx_graph = self.viz_graph(show_ports=show_ports,
+                                  critical_path=critical_path)
         to_pydot = nx.drawing.nx_pydot.to_pydot
         pdot = to_pydot(nx_graph)
         return pdot
@@ -710,9 +1430,10 @@ class TaskGraph(object):
             self.__widget = widget
         return self.__widget
 
-    def draw(self, show='lab', fmt='png', show_ports=False):
+    def draw(self, show='lab', fmt='png', show_ports=False,
+             critical_path=None):
         if show in ('ipynb',):
-            pdot = self.to_pydot(show_ports)
+            pdot = self.to_pydot(show_ports, critical_path=critical_path)
             pdot_out = pdot.create(format=fmt)
             if fmt in ('svg',):
                 from IPython.display import SVG as Image  # @UnusedImport
@@ -1,17 +1,23 @@
 from greenflow.dataframe_flow.template_node_mixin import TemplateNodeMixin
 from greenflow.dataframe_flow import Node
 from greenflow.dataframe_flow import TaskGraph
+from greenflow.dataframe_flow.taskGraph import _load_task_spec_list
 from greenflow.dataframe_flow.taskSpecSchema import TaskSpecSchema
 from greenflow.dataframe_flow.portsSpecSchema import ConfSchema
 from greenflow.dataframe_flow.portsSpecSchema import NodePorts
 from greenflow.dataframe_flow.metaSpec import MetaData
 import os
+import threading
 from greenflow.dataframe_flow.util import get_file_path
-import uuid
 
 
 __all__ = ["CompositeNode"]
 
+# the subgraphs run by CompositeNode.process, not in use by a process call
+#     {(real path, mtime_ns, size): [TaskGraph]}
+SUBGRAPH_CACHE = {}
+_SUBGRAPH_LOCK = threading.Lock()
+
 
 def _get_node(port_name):
     return port_name.split('@')[0]
@@ -28,6 +34,35 @@ def fix_port_name(obj, subgraph_node_name):
     return output
 
 
+def _checkout_subgraph(filename):
+    '''
+    Take a subgraph of the file run by a previous process call out of
+    SUBGRAPH_CACHE, or load a new one. The nodes it built are reused by the
+    next run if their task spec is unchanged.
+
+    returns
+        tuple, (cache key, TaskGraph)
+    '''
+    path = os.path.realpath(filename)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _SUBGRAPH_LOCK:
+        task_graphs = SUBGRAPH_CACHE.get(key)
+        if task_graphs:
+            return key, task_graphs.pop()
+    return key, TaskGraph.load_taskgraph(path)
+
+
+def _checkin_subgraph(key, task_graph):
+    '''Put back a subgraph taken by _checkout_subgraph once it ran.'''
+    with _SUBGRAPH_LOCK:
+        # drop the subgraphs of the previous versions of the file
+        for old_key in [old_key for old_key in SUBGRAPH_CACHE
+                        if old_key[0] == key[0] and old_key != key]:
+            del SUBGRAPH_CACHE[old_key]
+        SUBGRAPH_CACHE.setdefault(key, []).append(task_graph)
+
+
 def group_ports(input_list):
     """
     group inputs ports by node id
@@ -53,6 +88,31 @@ class CompositeNode(TemplateNodeMixin, Node):
         TemplateNodeMixin.init(self)
         self.task_graph = None
 
+    @classmethod
+    def reuse_key(cls, conf, _visited=None):
+        """
+        The stamps (path, modification time, size) of the subgraph file and
+        of the subgraph files of its composite nodes, read by update.
+        """
+        if 'taskgraph' not in conf:
+            return ''
+        try:
+            path = os.path.realpath(get_file_path(conf['taskgraph']))
+            stat = os.stat(path)
+        except (FileNotFoundError, TypeError):
+            # update does not find the file either
+            return ''
+        visited = set() if _visited is None else _visited
+        if path in visited:
+            return ''
+        visited.add(path)
+        stamps = [(path, stat.st_mtime_ns, stat.st_size)]
+        for task_spec in _load_task_spec_list(path):
+            subconf = task_spec.get(TaskSpecSchema.conf) or {}
+            if isinstance(subconf, dict) and 'taskgraph' in subconf:
+                stamps.append(cls.reuse_key(subconf, visited))
+        return tuple(stamps)
+
     def update(self):
         TemplateNodeMixin.update(self)
         self.conf_update()  # update the conf
@@ -331,7 +391,10 @@ class CompositeNode(TemplateNodeMixin, Node):
 
     def process(self, inputs, **kwargs):
         """
-        Composite computation
+        Composite computation. The subgraph run is shared with the other
+        process calls of the composite nodes of the same file, see
+        SUBGRAPH_CACHE. The subgraph built by update is connected to the
+        nodes outside of this one, it is not shared.
 
         Arguments
         -------
@@ -342,10 +405,13 @@ class CompositeNode(TemplateNodeMixin, Node):
         dataframe
         """
         if 'taskgraph' in self.conf:
-            task_graph = self.task_graph
-            # task_graph = TaskGraph.load_taskgraph(
-            #     get_file_path(self.conf['taskgraph']))
-            # task_graph._build()
+            # the subgraph of the update is connected to the nodes outside,
+            # the input feeders are added to another one. It is shared by
+            # the process calls of the composite nodes of the same file, one
+            # call at a time, so the nodes not depending on the inputs are
+            # built once
+            key, task_graph = _checkout_subgraph(
+                get_file_path(self.conf['taskgraph']))
             outputLists = []
             replaceObj = {}
             input_feeders = []
@@ -374,6 +440,11 @@ class CompositeNode(TemplateNodeMixin, Node):
                     def conf_schema(self):
                         return ConfSchema()
 
+                    @classmethod
+                    def reuse_key(cls, conf):
+                        # it feeds the inputs of this call
+                        return None
+
                     def process(self, empty):
                         output = {}
                         for key in inports.keys():
@@ -381,7 +452,7 @@ class CompositeNode(TemplateNodeMixin, Node):
                                 output[key] = inputs[inputNode.uid+'@'+key]
                         return output
 
-                uni_id = str(uuid.uuid1())
+                uni_id = '__input_feed_' + inputNode.uid
                 obj = {
                     TaskSpecSchema.task_id: uni_id,
                     TaskSpecSchema.conf: {},
@@ -409,12 +480,13 @@ class CompositeNode(TemplateNodeMixin, Node):
                     if self.outport_connected(outNode.uid+'@'+key):
                         outputLists.append(outNode.uid+'.'+key)
 
-            self._make_sub_graph_connection(task_graph,
+            self._make_sub_graph_connection(self.task_graph,
                                             inputNode_fun, outNode_fun)
 
-            task_graph.extend(input_feeders)
+            task_graph.extend(input_feeders, replace=True)
             self.update_replace(replaceObj, task_graph, **kwargs)
             result = task_graph.run(outputLists, replace=replaceObj)
+            _checkin_subgraph(key, task_graph)
             output = {}
             for key in result.get_keys():
                 splits = key.split('.')
@@ -31,6 +31,7 @@ setup(
         'Operating System :: POSIX :: Linux',
     ],
     entry_points={
-        'console_scripts': ['greenflow-flow=greenflow.flow:main'],
+        'console_scripts': ['greenflow-flow=greenflow.flow:main',
+                            'greenflow=greenflow.cli:main'],
     }
 )
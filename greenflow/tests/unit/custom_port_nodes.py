@@ -1,5 +1,6 @@
 import numpy as np
 import pandas as pd
+import dask.dataframe as dd
 from greenflow.dataframe_flow import Node, MetaData
 from greenflow.dataframe_flow import NodePorts, PortsSpecSchema
 from greenflow.dataframe_flow import ConfSchema
@@ -216,3 +217,25 @@ class DistanceNode(NodeHDFCacheMixin, Node):
             copy_df['distance_abs_df'] = np.abs(df['x']) + np.abs(df['y'])
             output.update({'distance_abs_df': copy_df})
         return output
+
+
+class NodeDaskFrame(Node):
+    '''A lazy dask dataframe of `n` rows, doubled if there is an input.'''
+
+    def ports_setup(self):
+        inports = {'df_in': {PortsSpecSchema.port_type: dd.DataFrame}}
+        outports = {'df_out': {PortsSpecSchema.port_type: dd.DataFrame}}
+        return NodePorts(inports=inports, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={}, outports={'df_out': {'x': 'float64'}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        if 'df_in' in inputs:
+            return {'df_out': inputs['df_in'] * 2}
+        df = pd.DataFrame({'x': np.arange(self.conf.get('n', 10),
+                                          dtype='float64')})
+        return {'df_out': dd.from_pandas(df, npartitions=2)}
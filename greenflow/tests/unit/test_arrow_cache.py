@@ -0,0 +1,200 @@
+'''
+greenflow Arrow/Parquet Node Cache Unit Tests
+
+To run unittests:
+
+# Using standard library unittest
+
+python -m unittest -v
+python -m unittest tests/unit/test_arrow_cache.py -v
+
+or
+
+python -m unittest discover <test_directory>
+python -m unittest discover -s <directory> -p 'test_*.py'
+
+# Using pytest
+# "conda install pytest" or "pip install pytest"
+pytest -v tests
+pytest -v tests/unit/test_arrow_cache.py -s
+
+The benchmark against the HDF5 cache is skipped unless GREENFLOW_BENCHMARK
+is set, e.g.
+GREENFLOW_BENCHMARK=1 pytest -v tests/unit/test_arrow_cache.py -s
+
+It uses GREENFLOW_BENCH_ROWS rows of stock bars (56 bytes per row), e.g.
+GREENFLOW_BENCH_ROWS=50000000 for about 3GB.
+
+'''
+import os
+import time
+import shutil
+import resource
+import tempfile
+import unittest
+import warnings
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+from greenflow.dataframe_flow import (
+    Node, PortsSpecSchema, NodePorts, MetaData, ConfSchema)
+from greenflow.dataframe_flow import (TaskSpecSchema, TaskGraph)
+from greenflow.dataframe_flow.node_arrow_cache import NodeArrowCacheMixin
+
+from .custom_port_nodes import NodeHDFCacheMixin
+from .utils import make_orderer, benchmark
+
+ordered, compare = make_orderer()
+unittest.defaultTestLoader.sortTestMethodsUsing = compare
+
+
+def stock_bars(nrows):
+    rng = np.random.RandomState(0)
+    close = 100 + rng.randn(nrows).cumsum() * 0.01
+    return pd.DataFrame({
+        'datetime': pd.date_range('2000-01-01', periods=nrows, freq='min'),
+        'asset': rng.randint(0, 5000, nrows).astype('int64'),
+        'open': close + rng.rand(nrows) * 0.01,
+        'high': close + 0.02,
+        'low': close - 0.02,
+        'close': close,
+        'volume': rng.randint(0, 10000, nrows).astype('float64')
+    })
+
+
+class _BarsNode(Node):
+
+    def ports_setup(self):
+        outports = {'bars': {PortsSpecSchema.port_type: pd.DataFrame},
+                    'last': {PortsSpecSchema.port_type: pd.DataFrame}}
+        return NodePorts(inports={}, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={}, outports={'bars': {}, 'last': {}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        df = stock_bars(self.conf['nrows'])
+        return {'bars': df, 'last': df.tail(10).reset_index(drop=True)}
+
+
+class ArrowBarsNode(NodeArrowCacheMixin, _BarsNode):
+    cache_port_formats = {'last': 'parquet'}
+
+
+class HDFBarsNode(NodeHDFCacheMixin, _BarsNode):
+    pass
+
+
+def bars_graph(node_type, nrows, save=False, load=False):
+    return TaskGraph([{
+        TaskSpecSchema.task_id: 'bars_task',
+        TaskSpecSchema.node_type: node_type,
+        TaskSpecSchema.conf: {'nrows': nrows},
+        TaskSpecSchema.inputs: {},
+        TaskSpecSchema.save: save,
+        TaskSpecSchema.load: load
+    }])
+
+
+def _bench_child(node_type, op, nrows, queue):
+    '''Save or load the bars in a fresh process to measure its peak RSS.'''
+    outputs = ['bars_task.bars']
+    tgraph = bars_graph(node_type, nrows, load=(op == 'load'))
+    if op == 'save':
+        tgraph.build()
+        node = tgraph['bars_task']
+        data = {'bars': stock_bars(nrows)}
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if op == 'save':
+        node.save_cache(data)
+    else:
+        result = tgraph.run(outputs)
+        # touch the data
+        result[outputs[0]]['close'].sum()
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes
+    queue.put((elapsed, (peak_rss - start_rss) * 1024))
+
+
+def benchmark_cache(nrows):
+    '''
+    Save and load time, and peak RSS increase, of the node caches.
+    returns
+        dict, (seconds, bytes) keyed by (cache, operation)
+    '''
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    for name, node_type in (('hdf5', HDFBarsNode), ('arrow', ArrowBarsNode)):
+        for op in ('save', 'load'):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_bench_child,
+                               args=(node_type, op, nrows, queue))
+            proc.start()
+            results[(name, op)] = queue.get()
+            proc.join()
+    return results
+
+
+class TestArrowCache(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        self._test_dir = tempfile.mkdtemp()
+        os.environ['GREENFLOW_CACHE_DIR'] = os.path.join(self._test_dir,
+                                                         '.cache')
+
+    def tearDown(self):
+        os.environ['GREENFLOW_CACHE_DIR'] = Node.cache_dir
+        shutil.rmtree(self._test_dir)
+
+    @ordered
+    def test_save_load(self):
+        '''Test that outputs saved per port in the chosen format are loaded
+        back unchanged.
+        '''
+        outputs = ['bars_task.bars', 'bars_task.last']
+        saved = bars_graph(ArrowBarsNode, 1000, save=True).run(outputs)
+        cache_path = os.path.join(self._test_dir, '.cache', 'bars_task')
+        self.assertEqual(sorted(os.listdir(cache_path)),
+                         ['bars.arrow', 'last.parquet'])
+
+        loaded = bars_graph(ArrowBarsNode, 1000, load=True).run(outputs)
+        for key in outputs:
+            pd.testing.assert_frame_equal(saved[key], loaded[key])
+
+        # the conf overrides the port formats
+        tgraph = bars_graph(ArrowBarsNode, 1000, save=True)
+        replace = {'bars_task': {TaskSpecSchema.conf: {
+            'nrows': 1000, 'cache_format': 'parquet'}}}
+        tgraph.run(outputs, replace=replace)
+        self.assertIn('bars.parquet', os.listdir(cache_path))
+
+        replace = {'bars_task': {TaskSpecSchema.conf: {
+            'nrows': 1000, 'cache_format': 'csv'}}}
+        with self.assertRaises(ValueError):
+            tgraph.run(outputs, replace=replace)
+
+    @ordered
+    @benchmark
+    def test_benchmark_hdf(self):
+        '''Compare the save and load of the Arrow IPC and HDF5 caches.'''
+        nrows = int(os.getenv('GREENFLOW_BENCH_ROWS', 200000))
+        results = benchmark_cache(nrows)
+        print('\n{} rows'.format(nrows))
+        for (name, op), (elapsed, rss) in sorted(results.items()):
+            print('{:>6} {}: {:8.3f}s peak RSS +{:8.1f}MB'.format(
+                name, op, elapsed, rss / 1024 ** 2))
+        self.assertLess(results[('arrow', 'load')][0],
+                        results[('hdf5', 'load')][0])
+        self.assertLess(results[('arrow', 'save')][0],
+                        results[('hdf5', 'save')][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+'''
+greenflow Composite Node Unit Tests
+
+To run unittests:
+
+# Using standard library unittest
+
+python -m unittest -v
+python -m unittest tests/unit/test_composite_node.py -v
+
+or
+
+python -m unittest discover <test_directory>
+python -m unittest discover -s <directory> -p 'test_*.py'
+
+# Using pytest
+# "conda install pytest" or "pip install pytest"
+pytest -v tests
+pytest -v tests/unit/test_composite_node.py
+
+'''
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import warnings
+import ruamel.yaml
+
+from greenflow.dataframe_flow import (TaskSpecSchema, TaskGraph)
+from greenflow.dataframe_flow import taskGraph
+from greenflow.dataframe_flow._node_flow import _get_nodetype
+from greenflow.plugin_nodes.util import CompositeNode
+
+from .utils import make_orderer
+
+ordered, compare = make_orderer()
+unittest.defaultTestLoader.sortTestMethodsUsing = compare
+
+MODULE_CODE = '''
+from greenflow.dataframe_flow import (
+    Node, PortsSpecSchema, NodePorts, MetaData, ConfSchema)
+
+# number of NodeNumber nodes created
+CREATED = [0]
+
+
+class NodeNumber(Node):
+
+    def init(self):
+        CREATED[0] += 1
+
+    def ports_setup(self):
+        return NodePorts(inports={}, outports={
+            'out': {PortsSpecSchema.port_type: int}})
+
+    def meta_setup(self):
+        return MetaData(inports={}, outports={'out': {}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        return {'out': self.conf['value']}
+
+
+class NodeAdd(Node):
+
+    def ports_setup(self):
+        return NodePorts(
+            inports={'in': {PortsSpecSchema.port_type: int},
+                     'other': {PortsSpecSchema.port_type: int}},
+            outports={'out': {PortsSpecSchema.port_type: int}})
+
+    def meta_setup(self):
+        return MetaData(inports={'in': {}, 'other': {}},
+                        outports={'out': {}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        return {'out': inputs['in'] + inputs['other']}
+'''
+
+
+class TestCompositeNode(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        self._test_dir = tempfile.mkdtemp()
+        self.module_file = os.path.join(self._test_dir, 'sub_nodes.py')
+        with open(self.module_file, 'w') as f:
+            f.write(MODULE_CODE)
+        self.subgraph_file = os.path.join(self._test_dir, 'sub.gq.yaml')
+        self.write_subgraph(1)
+
+    def tearDown(self):
+        shutil.rmtree(self._test_dir)
+
+    def write_subgraph(self, value):
+        tasks = [{
+            TaskSpecSchema.task_id: 'number',
+            TaskSpecSchema.node_type: 'NodeNumber',
+            TaskSpecSchema.filepath: self.module_file,
+            TaskSpecSchema.conf: {'value': value},
+            TaskSpecSchema.inputs: {}
+        }, {
+            TaskSpecSchema.task_id: 'add',
+            TaskSpecSchema.node_type: 'NodeAdd',
+            TaskSpecSchema.filepath: self.module_file,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {'in': 'number.out',
+                                    'other': 'number.out'}
+        }]
+        with open(self.subgraph_file, 'w') as f:
+            ruamel.yaml.YAML(typ='safe').dump(tasks, f)
+
+    def composite_graph(self, ncomposites):
+        tspec_list = [{
+            TaskSpecSchema.task_id: 'source',
+            TaskSpecSchema.node_type: 'NodeNumber',
+            TaskSpecSchema.filepath: self.module_file,
+            TaskSpecSchema.conf: {'value': 10},
+            TaskSpecSchema.inputs: {}
+        }]
+        for icomposite in range(ncomposites):
+            tspec_list.append({
+                TaskSpecSchema.task_id: 'composite{}'.format(icomposite),
+                TaskSpecSchema.node_type: CompositeNode,
+                TaskSpecSchema.conf: {'taskgraph': self.subgraph_file,
+                                      'input': ['add.in'],
+                                      'output': ['add.out']},
+                TaskSpecSchema.inputs: {'add@in': 'source.out'}
+            })
+        return TaskGraph(tspec_list)
+
+    @ordered
+    def test_parse_once(self):
+        '''Test that the composite nodes of the same file parse it once, and
+        again once it is modified.
+        '''
+        ncomposites = 50
+        outputs = ['composite0.add@out',
+                   'composite{}.add@out'.format(ncomposites - 1)]
+        taskGraph.TASKGRAPH_CACHE.clear()
+        with mock.patch.object(taskGraph.ruamel.yaml.YAML, 'load',
+                               autospec=True,
+                               side_effect=taskGraph.ruamel.yaml.YAML
+                               .load) as load:
+            tgraph = self.composite_graph(ncomposites)
+            result = tgraph.run(outputs)
+            self.assertEqual(load.call_count, 1)
+            for output in outputs:
+                self.assertEqual(result[output], 11)
+            # the subgraph of the update is not extended by process
+            self.assertEqual(len(tgraph['composite0'].task_graph), 2)
+
+            self.write_subgraph(2)
+            stat = os.stat(self.subgraph_file)
+            # a different modification time even on coarse file systems
+            os.utime(self.subgraph_file, ns=(stat.st_atime_ns,
+                                             stat.st_mtime_ns + 10 ** 9))
+            tgraph = self.composite_graph(ncomposites)
+            result = tgraph.run(outputs)
+            self.assertEqual(load.call_count, 2)
+            for output in outputs:
+                self.assertEqual(result[output], 12)
+
+    @ordered
+    def test_reuse_modified(self):
+        '''Test that the composite nodes are rebuilt by the repeated runs
+        once the subgraph file is modified.
+        '''
+        outputs = ['composite0.add@out']
+        tgraph = self.composite_graph(1)
+        self.assertEqual(tgraph.run(outputs)[outputs[0]], 11)
+        composite = tgraph['composite0']
+        self.assertEqual(tgraph.run(outputs)[outputs[0]], 11)
+        self.assertIs(tgraph['composite0'], composite)
+
+        self.write_subgraph(2)
+        stat = os.stat(self.subgraph_file)
+        os.utime(self.subgraph_file, ns=(stat.st_atime_ns,
+                                         stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(tgraph.run(outputs)[outputs[0]], 12)
+        self.assertIsNot(tgraph['composite0'], composite)
+        self.assertEqual(
+            tgraph['composite0'].task_graph['number'].conf, {'value': 2})
+
+    @ordered
+    def test_subgraph_reuse(self):
+        '''Test that the process calls of the composite nodes of the same
+        file reuse the subgraph nodes not depending on their inputs.
+        '''
+        ncomposites = 50
+        outputs = ['composite{}.add@out'.format(i)
+                   for i in range(ncomposites)]
+        tgraph = self.composite_graph(ncomposites)
+        result = tgraph.run(outputs)
+        created = sys.modules[
+            _get_nodetype(tgraph['source'])[0].__module__].CREATED
+        ncreated = created[0]
+        # the source, one per update subgraph, and one for all the process
+        # calls
+        self.assertEqual(ncreated, ncomposites + 2)
+        # the composite nodes are reused, only process is called again
+        result = tgraph.run(outputs)
+        self.assertEqual(created[0], ncreated)
+        for output in outputs:
+            self.assertEqual(result[output], 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
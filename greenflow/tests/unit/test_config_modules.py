@@ -0,0 +1,238 @@
+'''
+greenflow Plugin Modules Configuration Unit Tests
+
+To run unittests:
+
+# Using standard library unittest
+
+python -m unittest -v
+python -m unittest tests/unit/test_config_modules.py -v
+
+or
+
+python -m unittest discover <test_directory>
+python -m unittest discover -s <directory> -p 'test_*.py'
+
+# Using pytest
+# "conda install pytest" or "pip install pytest"
+pytest -v tests
+pytest -v tests/unit/test_config_modules.py
+
+'''
+import os
+import sys
+import shutil
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+import warnings
+
+from greenflow.dataframe_flow import (TaskSpecSchema, TaskGraph)
+from greenflow.dataframe_flow import config_nodes_modules
+from greenflow.dataframe_flow.config_nodes_modules import (
+    get_greenflow_config_modules, NODE_TYPE_INDEX)
+
+from .utils import make_orderer
+
+ordered, compare = make_orderer()
+unittest.defaultTestLoader.sortTestMethodsUsing = compare
+
+MODULE_CODE = '''
+from greenflow.dataframe_flow import (
+    Node, PortsSpecSchema, NodePorts, MetaData, ConfSchema)
+
+
+class NodeConfigured(Node):
+
+    def ports_setup(self):
+        return NodePorts(inports={}, outports={
+            'out': {PortsSpecSchema.port_type: int}})
+
+    def meta_setup(self):
+        return MetaData(inports={}, outports={'out': {}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        return {'out': 1}
+'''
+
+
+class TestConfigModules(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        self._test_dir = tempfile.mkdtemp()
+        self._environ = os.environ.get('GREENFLOW_CONFIG')
+        self._cache_dir = os.environ.get('GREENFLOW_CACHE_DIR')
+        os.environ['GREENFLOW_CACHE_DIR'] = os.path.join(self._test_dir,
+                                                         'cache')
+        module_file = os.path.join(self._test_dir, 'configured_nodes.py')
+        with open(module_file, 'w') as f:
+            f.write(MODULE_CODE)
+        self.config_file = os.path.join(self._test_dir, 'greenflowrc')
+        self.write_config({'configured_nodes': module_file})
+        os.environ['GREENFLOW_CONFIG'] = self.config_file
+
+    def tearDown(self):
+        if self._environ is None:
+            os.environ.pop('GREENFLOW_CONFIG', None)
+        else:
+            os.environ['GREENFLOW_CONFIG'] = self._environ
+        if self._cache_dir is None:
+            os.environ.pop('GREENFLOW_CACHE_DIR', None)
+        else:
+            os.environ['GREENFLOW_CACHE_DIR'] = self._cache_dir
+        self.forget_directory()
+        shutil.rmtree(self._test_dir)
+
+    def forget_directory(self):
+        '''Forget the configured module directory as in a new process.'''
+        for name in list(sys.modules):
+            if name.split('.')[0] == 'configured_dir':
+                del sys.modules[name]
+        config_nodes_modules.MODULE_CACHE.clear()
+        NODE_TYPE_INDEX.clear()
+
+    def write_config(self, modules):
+        lines = ['{} = {}'.format(key, path)
+                 for key, path in modules.items()]
+        with open(self.config_file, 'w') as f:
+            f.write(textwrap.dedent('''
+                [ModuleFiles]
+                {}
+                ''').format('\n'.join(lines)))
+
+    @ordered
+    def test_config_cache(self):
+        '''Test that the greenflowrc file is only parsed again when it is
+        modified.
+        '''
+        with mock.patch.object(config_nodes_modules.ConfigParser, 'read',
+                               autospec=True,
+                               side_effect=config_nodes_modules.ConfigParser
+                               .read) as read:
+            modules = get_greenflow_config_modules()
+            self.assertIn('configured_nodes', modules)
+            modules.clear()
+            self.assertIn('configured_nodes', get_greenflow_config_modules())
+            self.assertEqual(read.call_count, 1)
+
+            self.write_config({'other_nodes': 'other_nodes.py'})
+            stat = os.stat(self.config_file)
+            # a different modification time even on coarse file systems
+            os.utime(self.config_file, ns=(stat.st_atime_ns,
+                                           stat.st_mtime_ns + 10 ** 9))
+            self.assertEqual(list(get_greenflow_config_modules()),
+                             ['other_nodes'])
+            self.assertEqual(read.call_count, 2)
+
+    @ordered
+    def test_node_type_index(self):
+        '''Test that building a graph of node types from a configured module
+        does not read the configuration for every node.
+        '''
+        tspec_list = [{
+            TaskSpecSchema.task_id: 'node{}'.format(i),
+            TaskSpecSchema.node_type: 'NodeConfigured',
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {}
+        } for i in range(500)]
+        tgraph = TaskGraph(tspec_list)
+        with mock.patch('os.stat', wraps=os.stat) as stat:
+            tgraph.build()
+        self.assertLess(stat.call_count, 10)
+        self.assertEqual(NODE_TYPE_INDEX['NodeConfigured'][0],
+                         'configured_nodes')
+        self.assertEqual(tgraph['node0'].__class__.__name__,
+                         'NodeInTaskGraph')
+        result = tgraph.run(['node499.out'])
+        self.assertEqual(result['node499.out'], 1)
+
+    @ordered
+    def test_node_type_index_config_change(self):
+        '''Test that the node types indexed are found again once the
+        configuration is modified.
+        '''
+        tgraph = TaskGraph([{
+            TaskSpecSchema.task_id: 'node',
+            TaskSpecSchema.node_type: 'NodeConfigured',
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {}
+        }])
+        self.assertEqual(tgraph.run(['node.out'])['node.out'], 1)
+        self.assertIn('NodeConfigured', NODE_TYPE_INDEX)
+
+        module_file = os.path.join(self._test_dir, 'other_nodes.py')
+        with open(module_file, 'w') as f:
+            f.write(MODULE_CODE.replace("{'out': 1}", "{'out': 2}"))
+        self.write_config({'other_nodes': module_file})
+        stat = os.stat(self.config_file)
+        # a different modification time even on coarse file systems
+        os.utime(self.config_file, ns=(stat.st_atime_ns,
+                                       stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(
+            config_nodes_modules._find_config_module(
+                'NodeConfigured').mod.__name__, 'other_nodes')
+        self.assertEqual(tgraph.run(['node.out'])['node.out'], 2)
+
+    def run_light(self):
+        self.forget_directory()
+        tgraph = TaskGraph([{
+            TaskSpecSchema.task_id: 'light',
+            TaskSpecSchema.node_type: 'NodeLight',
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {}
+        }])
+        return tgraph.run(['light.out'])['light.out']
+
+    @ordered
+    def test_directory_manifest(self):
+        '''Test that the submodules of a configured module directory are
+        all imported only until its manifest is written.
+        '''
+        package_dir = os.path.join(self._test_dir, 'configured_dir')
+        for subpackage, name, value in (('light', 'NodeLight', 1),
+                                        ('heavy', 'NodeHeavy', 2)):
+            os.makedirs(os.path.join(package_dir, subpackage))
+            with open(os.path.join(package_dir, subpackage, 'nodes.py'),
+                      'w') as f:
+                f.write(MODULE_CODE.replace('NodeConfigured', name)
+                        .replace("{'out': 1}", "{{'out': {}}}".format(value)))
+            with open(os.path.join(package_dir, subpackage, '__init__.py'),
+                      'w') as f:
+                f.write('')
+        with open(os.path.join(package_dir, '__init__.py'), 'w') as f:
+            f.write('')
+        self.write_config({'configured_dir': package_dir})
+
+        self.assertEqual(self.run_light(), 1)
+        self.assertIn('configured_dir.heavy.nodes', sys.modules)
+
+        # the next process imports the subpackage of the node type only
+        self.assertEqual(self.run_light(), 1)
+        self.assertNotIn('configured_dir.heavy.nodes', sys.modules)
+        self.assertEqual(NODE_TYPE_INDEX['NodeHeavy'][0], 'configured_dir')
+        mod = config_nodes_modules.load_modules(package_dir,
+                                                'configured_dir').mod
+        self.assertIn('NodeHeavy', dir(mod))
+        self.assertEqual(mod.NodeHeavy.__module__,
+                         'configured_dir.heavy.nodes')
+
+        # a modified directory is scanned again
+        with open(os.path.join(package_dir, 'heavy', 'nodes.py'), 'a') as f:
+            f.write('\n\nclass NodeHeavier(NodeHeavy):\n    pass\n')
+        self.assertEqual(self.run_light(), 1)
+        self.assertIn('configured_dir.heavy.nodes', sys.modules)
+        self.assertEqual(self.run_light(), 1)
+        self.assertNotIn('configured_dir.heavy.nodes', sys.modules)
+        self.assertIn('NodeHeavier', NODE_TYPE_INDEX)
+        self.assertEqual(
+            len(os.listdir(os.path.join(self._test_dir, 'cache',
+                                        'manifests'))), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+'''
+greenflow Critical Path Analysis Unit Tests
+
+To run unittests:
+
+# Using standard library unittest
+
+python -m unittest -v
+python -m unittest tests/unit/test_critical_path.py -v
+
+or
+
+python -m unittest discover <test_directory>
+python -m unittest discover -s <directory> -p 'test_*.py'
+
+# Using pytest
+# "conda install pytest" or "pip install pytest"
+pytest -v tests
+pytest -v tests/unit/test_critical_path.py
+
+'''
+import unittest
+import warnings
+
+from greenflow.dataframe_flow import TaskSpecSchema
+from greenflow.dataframe_flow.critical_path import CriticalPath
+
+from .utils import make_orderer
+from .test_executors import wide_graph
+
+ordered, compare = make_orderer()
+unittest.defaultTestLoader.sortTestMethodsUsing = compare
+
+
+class TestCriticalPath(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        # a -> b -> d and a -> c -> d, e on its own
+        self.cpath = CriticalPath(
+            {'a': 1.0, 'b': 3.0, 'c': 1.0, 'd': 1.0, 'e': 2.0},
+            [('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd')])
+
+    @ordered
+    def test_slack(self):
+        '''Test the critical path and the slack of the nodes.'''
+        cpath = self.cpath
+        self.assertEqual(cpath.path, ['a', 'b', 'd'])
+        self.assertEqual(cpath.length, 5.0)
+        self.assertEqual(cpath.slack, {'a': 0.0, 'b': 0.0, 'c': 2.0,
+                                       'd': 0.0, 'e': 3.0})
+        self.assertTrue(cpath.is_critical_edge('a', 'b'))
+        self.assertFalse(cpath.is_critical_edge('a', 'c'))
+        df = cpath.to_dataframe()
+        self.assertEqual(list(df[df['critical']].index), ['a', 'b', 'd'])
+        self.assertEqual(df.loc['c', 'latest_start'], 3.0)
+
+        # caching b moves the critical path
+        cached = cpath.what_if({'b': 0.0})
+        self.assertEqual(cached.length, 3.0)
+        self.assertEqual(cached.path, ['a', 'c', 'd'])
+
+    @ordered
+    def test_makespan(self):
+        '''Test the makespan estimate for a number of workers.'''
+        cpath = self.cpath
+        self.assertEqual(cpath.makespan(1), 8.0)
+        # e runs next to the critical path
+        self.assertEqual(cpath.makespan(2), 5.0)
+        self.assertEqual(cpath.makespan(10), cpath.length)
+        table = cpath.makespan_table(workers=(1, 2))
+        self.assertEqual(list(table['makespan']), [8.0, 5.0])
+        self.assertEqual(list(table['lower_bound']), [8.0, 5.0])
+        with self.assertRaises(ValueError):
+            cpath.makespan(0)
+
+    @ordered
+    def test_from_profile(self):
+        '''Test the analysis of a recorded run and the graph overlay.'''
+        tgraph, outputs = wide_graph(2, sleep=0.01)
+        replace = {'branch1_0': {TaskSpecSchema.conf: {
+            'sleep': 0.1, 'offset': 1}}}
+        profile = tgraph.run(outputs, replace=replace, profile=True).profile
+        cpath = CriticalPath.from_profile(profile)
+        self.assertEqual(cpath.path, ['source', 'branch1_0', 'branch1_1'])
+        self.assertGreater(cpath.slack['branch0_1'], 0.05)
+        self.assertEqual(
+            CriticalPath.from_profile(profile, task_graph=tgraph).edges,
+            cpath.edges)
+
+        nx_graph = tgraph.viz_graph(critical_path=cpath)
+        self.assertEqual(nx_graph.nodes['branch1_0']['color'], 'red')
+        self.assertNotIn('color', nx_graph.nodes['branch0_0'])
+        self.assertIn('slack', nx_graph.nodes['branch0_0']['label'])
+        self.assertEqual(nx_graph.edges['branch1_0', 'branch1_1']['color'],
+                         'red')
+        self.assertNotIn('color', nx_graph.edges['branch0_0', 'branch0_1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
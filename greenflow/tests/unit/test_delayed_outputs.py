@@ -0,0 +1,288 @@
+'''
+greenflow Delayed Processing Outputs Unit Tests
+
+To run unittests:
+
+# Using standard library unittest
+
+python -m unittest -v
+python -m unittest tests/unit/test_delayed_outputs.py -v
+
+or
+
+python -m unittest discover <test_directory>
+python -m unittest discover -s <directory> -p 'test_*.py'
+
+# Using pytest
+# "conda install pytest" or "pip install pytest"
+pytest -v tests
+pytest -v tests/unit/test_delayed_outputs.py
+
+'''
+import threading
+import unittest
+import warnings
+
+import numpy as np
+import pandas as pd
+import dask.dataframe as dd
+
+from greenflow.dataframe_flow import (
+    Node, PortsSpecSchema, NodePorts, MetaData, ConfSchema)
+from greenflow.dataframe_flow import (TaskSpecSchema, TaskGraph)
+
+from .utils import make_orderer
+
+ordered, compare = make_orderer()
+unittest.defaultTestLoader.sortTestMethodsUsing = compare
+
+
+class NodePartitions(Node):
+    '''A dask dataframe of 0 to 99 in `npartitions` partitions.'''
+
+    def ports_setup(self):
+        outports = {'df_out': {PortsSpecSchema.port_type: dd.DataFrame}}
+        return NodePorts(inports={}, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={}, outports={'df_out': {'x': 'float64'}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        df = pd.DataFrame({'x': np.arange(100, dtype='float64')})
+        return {'df_out': dd.from_pandas(
+            df, npartitions=self.conf['npartitions'])}
+
+
+class NodePartitionStats(Node):
+    '''Statistics of the partitions with one port per reduction.'''
+
+    calls = []
+    lock = threading.Lock()
+
+    def init(self):
+        self.delayed_process = True
+
+    def ports_setup(self):
+        inports = {'df_in': {PortsSpecSchema.port_type: [dd.DataFrame,
+                                                         pd.DataFrame]}}
+        outports = {
+            'first': {PortsSpecSchema.port_type: float},
+            'total': {PortsSpecSchema.port_type: float,
+                      PortsSpecSchema.reduction: PortsSpecSchema.REDUCE_TREE},
+            'sizes': {PortsSpecSchema.port_type: [int, list],
+                      PortsSpecSchema.reduction:
+                      PortsSpecSchema.REDUCE_GATHER}
+        }
+        return NodePorts(inports=inports, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={'df_in': {'x': 'float64'}},
+                        outports={'first': {}, 'total': {}, 'sizes': {}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        df = inputs['df_in']
+        with self.lock:
+            self.calls.append(len(df))
+        total = float(df['x'].sum())
+        return {'first': total, 'total': total, 'sizes': len(df)}
+
+    def combine_partitions(self, port_name, outputs):
+        return sum(outputs)
+
+
+class NodeIndexed(Node):
+    '''A dask dataframe of the conf column indexed from start to stop.'''
+
+    def ports_setup(self):
+        outports = {'df_out': {PortsSpecSchema.port_type: dd.DataFrame}}
+        return NodePorts(inports={}, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={},
+                        outports={'df_out': {self.conf['column']: 'float64'}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        index = np.arange(self.conf['start'], self.conf['stop'])
+        df = pd.DataFrame({self.conf['column']: index.astype('float64')},
+                          index=index)
+        ddf = dd.from_pandas(df, npartitions=self.conf['npartitions'])
+        if not self.conf.get('sorted', True):
+            ddf = ddf.clear_divisions()
+        return {'df_out': ddf}
+
+
+class NodeJoin(Node):
+    '''Join of the partitions of the left and right inputs.'''
+
+    def init(self):
+        self.delayed_process = True
+        self.partition_alignment = self.conf.get('alignment', 'auto')
+
+    def ports_setup(self):
+        inports = {'left': {PortsSpecSchema.port_type: [dd.DataFrame,
+                                                        pd.DataFrame]},
+                   'right': {PortsSpecSchema.port_type: [dd.DataFrame,
+                                                         pd.DataFrame]}}
+        outports = {'df_out': {PortsSpecSchema.port_type: [dd.DataFrame,
+                                                           pd.DataFrame]}}
+        return NodePorts(inports=inports, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={'left': {'x': 'float64'},
+                                 'right': {'y': 'float64'}},
+                        outports={'df_out': {'x': 'float64',
+                                             'y': 'float64'}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        return {'df_out': inputs['left'].join(inputs['right'], how='inner')}
+
+
+def join_graph(right_conf, alignment='auto'):
+    return TaskGraph([{
+        TaskSpecSchema.task_id: 'left',
+        TaskSpecSchema.node_type: NodeIndexed,
+        TaskSpecSchema.conf: {'column': 'x', 'start': 0, 'stop': 100,
+                              'npartitions': 4},
+        TaskSpecSchema.inputs: {}
+    }, {
+        TaskSpecSchema.task_id: 'right',
+        TaskSpecSchema.node_type: NodeIndexed,
+        TaskSpecSchema.conf: dict(column='y', **right_conf),
+        TaskSpecSchema.inputs: {}
+    }, {
+        TaskSpecSchema.task_id: 'join',
+        TaskSpecSchema.node_type: NodeJoin,
+        TaskSpecSchema.conf: {'alignment': alignment},
+        TaskSpecSchema.inputs: {'left': 'left.df_out',
+                                'right': 'right.df_out'}
+    }])
+
+
+def stats_graph(npartitions):
+    return TaskGraph([{
+        TaskSpecSchema.task_id: 'frame',
+        TaskSpecSchema.node_type: NodePartitions,
+        TaskSpecSchema.conf: {'npartitions': npartitions},
+        TaskSpecSchema.inputs: {}
+    }, {
+        TaskSpecSchema.task_id: 'stats',
+        TaskSpecSchema.node_type: NodePartitionStats,
+        TaskSpecSchema.conf: {},
+        TaskSpecSchema.inputs: {'df_in': 'frame.df_out'}
+    }])
+
+
+class TestDelayedOutputs(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        del NodePartitionStats.calls[:]
+
+    @ordered
+    def test_reductions(self):
+        '''Test the reductions of the non dataframe outputs, computed in one
+        graph with one process call per partition.
+        '''
+        tgraph = stats_graph(20)
+        outputs = ['stats.first', 'stats.total', 'stats.sizes']
+        result = tgraph.run(outputs)
+        self.assertEqual(result['stats.first'], float(sum(range(5))))
+        # more partitions than combined at once, combined in two levels
+        self.assertEqual(result['stats.total'], float(sum(range(100))))
+        self.assertEqual(result['stats.sizes'], [5] * 20)
+        self.assertEqual(len(NodePartitionStats.calls), 20)
+
+        # only the first partition is processed for the first port
+        del NodePartitionStats.calls[:]
+        result = tgraph.run(['stats.first'])
+        self.assertEqual(result['stats.first'], float(sum(range(5))))
+        self.assertEqual(NodePartitionStats.calls, [5])
+
+    @ordered
+    def test_reduction_spec(self):
+        '''Test the validation of the reduction of the port spec.'''
+        PortsSpecSchema.validate_ports(NodePorts(outports={
+            'out': {PortsSpecSchema.port_type: float,
+                    PortsSpecSchema.reduction: PortsSpecSchema.REDUCE_TREE}
+        }))
+        with self.assertRaises(AssertionError):
+            PortsSpecSchema.validate_ports(NodePorts(outports={
+                'out': {PortsSpecSchema.port_type: float,
+                        PortsSpecSchema.reduction: 'mean'}
+            }))
+
+    def run_join(self, right_conf, alignment='auto'):
+        with warnings.catch_warnings(record=True) as records:
+            warnings.simplefilter('always')
+            result = join_graph(right_conf, alignment).run(['join.df_out'])
+        messages = [str(record.message) for record in records
+                    if 'npartitions' in str(record.message)]
+        df = result['join.df_out'].compute().sort_index()
+        start, stop = right_conf['start'], right_conf['stop']
+        index = np.arange(start, stop)
+        self.assertEqual(list(df.index), list(index))
+        self.assertEqual(list(df['x']), list(index.astype('float64')))
+        self.assertEqual(list(df['y']), list(index.astype('float64')))
+        return messages
+
+    @ordered
+    def test_partition_alignment(self):
+        '''Test the alignment of delayed inputs with different number of
+        partitions.
+        '''
+        # sorted on the index
+        messages = self.run_join({'start': 10, 'stop': 90, 'npartitions': 3})
+        self.assertEqual(len(messages), 1)
+        self.assertIn('"divisions"', messages[0])
+        self.assertIn("{'divisions': 6, 'shuffle': 28}", messages[0])
+
+        # single partition
+        messages = self.run_join({'start': 10, 'stop': 90, 'npartitions': 1,
+                                  'sorted': False})
+        self.assertIn('"broadcast"', messages[0])
+        self.assertIn("'broadcast': 4", messages[0])
+
+        # neither
+        messages = self.run_join({'start': 10, 'stop': 90, 'npartitions': 3,
+                                  'sorted': False})
+        self.assertIn('"shuffle"', messages[0])
+
+        # strategy of the node
+        messages = self.run_join({'start': 10, 'stop': 90, 'npartitions': 3},
+                                 alignment='shuffle')
+        self.assertIn('"shuffle"', messages[0])
+
+        with self.assertRaises(Exception) as cm:
+            self.run_join({'start': 10, 'stop': 90, 'npartitions': 3},
+                          alignment='off')
+        self.assertIn('PARTITIONS MISMATCH', str(cm.exception))
+
+        with self.assertRaises(ValueError):
+            self.run_join({'start': 10, 'stop': 90, 'npartitions': 3,
+                           'sorted': False}, alignment='divisions')
+
+        # the repeated runs of the node do not warn again
+        tgraph = join_graph({'start': 10, 'stop': 90, 'npartitions': 3})
+        with warnings.catch_warnings(record=True) as records:
+            warnings.simplefilter('always')
+            for _ in range(3):
+                tgraph.run(['join.df_out'])
+        messages = [str(record.message) for record in records
+                    if 'npartitions' in str(record.message)]
+        self.assertEqual(len(messages), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,241 @@
+'''
+greenflow Persistent Result Cache Unit Tests
+
+To run unittests:
+
+# Using standard library unittest
+
+python -m unittest -v
+python -m unittest tests/unit/test_disk_cache.py -v
+
+or
+
+python -m unittest discover <test_directory>
+python -m unittest discover -s <directory> -p 'test_*.py'
+
+# Using pytest
+# "conda install pytest" or "pip install pytest"
+pytest -v tests
+pytest -v tests/unit/test_disk_cache.py
+
+'''
+import os
+import io
+import sys
+import shutil
+import importlib
+import tempfile
+import unittest
+import warnings
+import textwrap
+from contextlib import redirect_stdout
+import numpy as np
+
+from greenflow.dataframe_flow import Node
+from greenflow.dataframe_flow import TaskSpecSchema, TaskGraph
+from greenflow.dataframe_flow._disk_cache import DiskCache
+from greenflow.dataframe_flow._result_cache import get_result_cache
+from greenflow.cli import main, parse_size
+
+from .utils import make_orderer
+from .test_memoize import CALLS, sweep_graph
+
+ordered, compare = make_orderer()
+unittest.defaultTestLoader.sortTestMethodsUsing = compare
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        self._test_dir = tempfile.mkdtemp()
+        os.environ['GREENFLOW_CACHE_DIR'] = os.path.join(self._test_dir,
+                                                         '.cache')
+        self.cache_dir = os.path.join(self._test_dir, '.cache', 'results')
+        CALLS.clear()
+        get_result_cache().clear()
+
+    def tearDown(self):
+        os.environ['GREENFLOW_CACHE_DIR'] = Node.cache_dir
+        shutil.rmtree(self._test_dir)
+        get_result_cache().clear()
+
+    @ordered
+    def test_put_get(self):
+        '''Test the cache entries and the manifest.'''
+        cache = DiskCache(self.cache_dir)
+        self.assertIsNone(cache.get('a'))
+        self.assertTrue(cache.put('a', {'out': np.arange(10)}, 'task_a'))
+        # not picklable
+        self.assertFalse(cache.put('b', {'out': lambda x: x}, 'task_b'))
+        np.testing.assert_array_equal(cache.get('a')['out'], np.arange(10))
+        entries = DiskCache(self.cache_dir).entries()
+        self.assertEqual(list(entries.keys()), ['a'])
+        self.assertEqual(entries['a']['task_id'], 'task_a')
+        self.assertEqual(entries['a']['ports'], ['out'])
+        self.assertGreater(entries['a']['nbytes'], 80)
+        self.assertGreaterEqual(entries['a']['accessed'],
+                                entries['a']['created'])
+
+    @ordered
+    def test_prune_verify(self):
+        '''Test that prune evicts the least recently used entries and that
+        verify finds the broken entries.
+        '''
+        cache = DiskCache(self.cache_dir)
+        for key in ('a', 'b', 'c'):
+            cache.put(key, {'out': np.zeros(1000)})
+        cache.get('a')
+        self.assertEqual(cache.prune(max_entries=2), ['b'])
+        nbytes = cache.entries()['a']['nbytes']
+        self.assertEqual(cache.prune(max_bytes=nbytes), ['c'])
+        self.assertEqual(list(cache.entries()), ['a'])
+
+        cache.put('d', {'out': np.zeros(1000)})
+        with open(os.path.join(self.cache_dir, 'a.pkl'), 'r+b') as f:
+            f.seek(-8, os.SEEK_END)
+            f.write(b'\xff' * 8)
+        os.remove(os.path.join(self.cache_dir, 'd.pkl'))
+        self.assertEqual(cache.verify(), {'a': 'checksum mismatch',
+                                          'd': 'missing file'})
+        cache.verify(remove=True)
+        self.assertEqual(cache.entries(), {})
+
+    @ordered
+    def test_run_across_sessions(self):
+        '''Test that the outputs are reused by another task graph once the
+        in memory cache is gone.
+        '''
+        outputs = ['slow.out']
+        first = sweep_graph().run(outputs, memoize='disk')
+        self.assertEqual(CALLS, {'data': 1, 'fast': 1, 'slow': 1})
+        self.assertEqual(len(DiskCache(self.cache_dir).entries()), 3)
+
+        get_result_cache().clear()
+        replace = {'slow': {TaskSpecSchema.conf: {'window': 5}}}
+        sweep_graph().run(outputs, replace=replace, memoize='disk')
+        self.assertEqual(CALLS, {'data': 1, 'fast': 1, 'slow': 2})
+
+        get_result_cache().clear()
+        again = sweep_graph().run(outputs, memoize='disk')
+        self.assertEqual(CALLS, {'data': 1, 'fast': 1, 'slow': 2})
+        np.testing.assert_array_equal(first['slow.out'], again['slow.out'])
+        # only the last node is loaded
+        entries = DiskCache(self.cache_dir).entries()
+        accessed = [entry['task_id'] for entry in entries.values()
+                    if entry['accessed'] > entry['created']]
+        self.assertIn('slow', accessed)
+        self.assertNotIn('data', accessed)
+
+    @ordered
+    def test_cli(self):
+        '''Test the greenflow cache command.'''
+        self.assertEqual(parse_size('10M'), 10 * 1024 ** 2)
+        self.assertEqual(parse_size('2GiB'), 2 * 1024 ** 3)
+        cache = DiskCache(self.cache_dir)
+        for key in ('a', 'b', 'c'):
+            cache.put(key, {'out': np.zeros(1000)}, 'task_' + key)
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.assertEqual(main(['cache', 'list']), 0)
+        self.assertIn('task_b', out.getvalue())
+        self.assertIn('3 entries', out.getvalue())
+
+        with redirect_stdout(io.StringIO()):
+            main(['cache', '--cache-dir', self.cache_dir, 'prune',
+                  '--max-entries', '1'])
+        self.assertEqual(list(cache.entries()), ['c'])
+
+        os.remove(os.path.join(self.cache_dir, 'c.pkl'))
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.assertEqual(main(['cache', 'verify']), 1)
+            self.assertEqual(main(['cache', 'verify', '--remove']), 0)
+        self.assertIn('c: missing file', out.getvalue())
+        self.assertEqual(cache.entries(), {})
+
+    @ordered
+    def test_unloadable_entry(self):
+        '''Test that an entry pickled with a class that can not be imported
+        anymore is a miss and is removed.
+        '''
+        module_file = os.path.join(self._test_dir, 'gone_outputs.py')
+        with open(module_file, 'w') as f:
+            f.write('class Output(object):\n    pass\n')
+        sys.path.append(self._test_dir)
+        try:
+            import gone_outputs
+            cache = DiskCache(self.cache_dir)
+            self.assertTrue(cache.put('a', {'out': gone_outputs.Output()}))
+        finally:
+            sys.path.remove(self._test_dir)
+            sys.modules.pop('gone_outputs', None)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.entries(), {})
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir,
+                                                     'a.pkl')))
+
+    @ordered
+    def test_code_version(self):
+        '''Test that the outputs are computed again once a base class of
+        the node, or the module defining it, is modified.
+        '''
+        module_file = os.path.join(self._test_dir, 'versioned_nodes.py')
+        code = textwrap.dedent('''
+            from .test_memoize import NodeArray
+
+            SCALE = {}
+
+
+            class NodeBase(NodeArray):
+
+                def scale(self):
+                    return SCALE
+
+
+            class NodeScaled(NodeBase):
+
+                def process(self, inputs):
+                    # counted in CALLS by NodeArray
+                    return {{'out': self.scale() * super().process(inputs)[
+                        'out']}}
+            ''').replace('.test_memoize', __package__ + '.test_memoize')
+        with open(module_file, 'w') as f:
+            f.write(code.format(1))
+        sys.path.append(self._test_dir)
+        self.addCleanup(sys.modules.pop, 'versioned_nodes', None)
+        self.addCleanup(sys.path.remove, self._test_dir)
+        import versioned_nodes
+
+        def run():
+            get_result_cache().clear()
+            tgraph = TaskGraph([{
+                TaskSpecSchema.task_id: 'scaled',
+                TaskSpecSchema.node_type: versioned_nodes.NodeScaled,
+                TaskSpecSchema.conf: {'n': 3},
+                TaskSpecSchema.inputs: {}
+            }])
+            return list(tgraph.run(['scaled.out'],
+                                   memoize='disk')['scaled.out'])
+
+        self.assertEqual(run(), [0, 1, 2])
+        self.assertEqual(run(), [0, 1, 2])
+        self.assertEqual(CALLS['scaled'], 1)
+
+        # a method of the base class
+        versioned_nodes.NodeBase.scale = lambda self: 3
+        self.assertEqual(run(), [0, 3, 6])
+        self.assertEqual(CALLS['scaled'], 2)
+
+        # a module constant, as in a new process
+        with open(module_file, 'w') as f:
+            f.write(code.format(2))
+        importlib.reload(versioned_nodes)
+        self.assertEqual(run(), [0, 2, 4])
+        self.assertEqual(run(), [0, 2, 4])
+        self.assertEqual(CALLS['scaled'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
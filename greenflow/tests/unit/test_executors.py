@@ -0,0 +1,424 @@
+'''
+greenflow TaskGraph Executors Unit Tests
+
+To run unittests:
+
+# Using standard library unittest
+
+python -m unittest -v
+python -m unittest tests/unit/test_executors.py -v
+
+or
+
+python -m unittest discover <test_directory>
+python -m unittest discover -s <directory> -p 'test_*.py'
+
+# Using pytest
+# "conda install pytest" or "pip install pytest"
+pytest -v tests
+pytest -v tests/unit/test_executors.py
+
+'''
+import os
+import io
+import sys
+import time
+import threading
+import multiprocessing
+import unittest
+import warnings
+from contextlib import redirect_stdout
+import numpy as np
+import pandas as pd
+import dask
+from dask.distributed import Client, LocalCluster
+try:
+    import ray
+except ImportError:
+    ray = None
+
+from greenflow.dataframe_flow import (
+    Node, PortsSpecSchema, NodePorts, MetaData, ConfSchema)
+from greenflow.dataframe_flow import (TaskSpecSchema, TaskGraph)
+from greenflow.dataframe_flow._executor import topological_order
+
+from .utils import make_orderer
+from .custom_port_nodes import NodeDaskFrame
+
+ordered, compare = make_orderer()
+unittest.defaultTestLoader.sortTestMethodsUsing = compare
+
+
+class NodeSource(Node):
+
+    def ports_setup(self):
+        outports = {'out': {PortsSpecSchema.port_type: list}}
+        return NodePorts(inports={}, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={}, outports={'out': {}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        return {'out': list(range(self.conf.get('n', 10)))}
+
+
+class NodeSleepSum(Node):
+    '''Sleeps (releasing the GIL), waits for the other nodes sharing its
+    barrier if any, and then sums up the inputs.'''
+
+    def ports_setup(self):
+        inports = {'in': {PortsSpecSchema.port_type: list}}
+        outports = {'out': {PortsSpecSchema.port_type: list}}
+        return NodePorts(inports=inports, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={}, outports={'out': {}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        time.sleep(self.conf.get('sleep', 0.0))
+        barrier = self.conf.get('barrier')
+        if barrier is not None:
+            # raises BrokenBarrierError unless all the parties run at once
+            barrier.wait(timeout=BARRIER_TIMEOUT)
+        threads = self.conf.get('threads')
+        if threads is not None:
+            threads.add(threading.get_ident())
+        offset = self.conf.get('offset', 0)
+        return {'out': [val + offset for val in inputs['in']]}
+
+
+# seconds the nodes sharing a barrier wait for each other
+BARRIER_TIMEOUT = 60
+
+
+class NodeFrame(Node):
+
+    def ports_setup(self):
+        outports = {'df_out': {PortsSpecSchema.port_type: pd.DataFrame}}
+        return NodePorts(inports={}, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={},
+                        outports={'df_out': {'key': 'int64', 'x': 'float64'}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        npts = self.conf['npts']
+        rng = np.random.RandomState(self.conf.get('nseed', 0))
+        df = pd.DataFrame({'key': np.arange(npts) % 10,
+                           'x': rng.rand(npts)})
+        return {'df_out': df}
+
+
+class NodeGroupMean(Node):
+    '''Pandas groupby, i.e. holds the GIL.'''
+
+    def ports_setup(self):
+        inports = {'df_in': {PortsSpecSchema.port_type: pd.DataFrame}}
+        outports = {'df_out': {PortsSpecSchema.port_type: pd.DataFrame},
+                    'pid': {PortsSpecSchema.port_type: int}}
+        return NodePorts(inports=inports, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={},
+                        outports={'df_out': {}, 'pid': {}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        df = inputs['df_in']
+        mean = df.groupby('key')['x'].apply(lambda s: s.mean() * 1.0)
+        return {'df_out': mean.to_frame(), 'pid': os.getpid()}
+
+
+def wide_graph(width, sleep=0.0, threads=None, barrier=None):
+    '''One source node feeding `width` independent branches of length two.
+    The first nodes of the branches share the `barrier`, they complete only
+    if they run concurrently.
+    '''
+    tspec_list = [{
+        TaskSpecSchema.task_id: 'source',
+        TaskSpecSchema.node_type: NodeSource,
+        TaskSpecSchema.conf: {'n': 10},
+        TaskSpecSchema.inputs: {}
+    }]
+    outputs = []
+    for ibranch in range(width):
+        for ilevel in range(2):
+            parent = 'source' if ilevel == 0 else \
+                'branch{}_{}'.format(ibranch, ilevel - 1)
+            task_id = 'branch{}_{}'.format(ibranch, ilevel)
+            conf = {'sleep': sleep, 'offset': ibranch, 'threads': threads}
+            if ilevel == 0 and barrier is not None:
+                conf['barrier'] = barrier
+            tspec_list.append({
+                TaskSpecSchema.task_id: task_id,
+                TaskSpecSchema.node_type: NodeSleepSum,
+                TaskSpecSchema.conf: conf,
+                TaskSpecSchema.inputs: {'in': parent + '.out'}
+            })
+        outputs.append(task_id + '.out')
+    return TaskGraph(tspec_list), outputs
+
+
+def chain_graph(length):
+    '''A source node followed by a chain of `length` nodes.'''
+    tspec_list = [{
+        TaskSpecSchema.task_id: 'source',
+        TaskSpecSchema.node_type: NodeSource,
+        TaskSpecSchema.conf: {'n': 3},
+        TaskSpecSchema.inputs: {}
+    }]
+    parent = 'source'
+    for ilevel in range(length):
+        task_id = 'chain{}'.format(ilevel)
+        tspec_list.append({
+            TaskSpecSchema.task_id: task_id,
+            TaskSpecSchema.node_type: NodeSleepSum,
+            TaskSpecSchema.conf: {'offset': 1},
+            TaskSpecSchema.inputs: {'in': parent + '.out'}
+        })
+        parent = task_id
+    return TaskGraph(tspec_list), [parent + '.out']
+
+
+class TestExecutors(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    @ordered
+    def test_topological_order(self):
+        '''Test that every node comes after its parents in the order
+        computed at build time, regardless of the task spec order.
+        '''
+        tgraph, outputs = wide_graph(3)
+        tspec_list = [task._task_spec for task in tgraph]
+        tgraph = TaskGraph(list(reversed(tspec_list)))
+        tgraph.build()
+        nodes = [tgraph[task[TaskSpecSchema.task_id]] for task in tgraph]
+        order = topological_order(nodes)
+        self.assertEqual(len(order), len(nodes))
+        position = {node: index for index, node in enumerate(order)}
+        for node in nodes:
+            for node_in in node.inputs:
+                self.assertLess(position[node_in['from_node']],
+                                position[node])
+
+    @ordered
+    def test_serial_long_chain(self):
+        '''Test that a chain longer than the recursion limit runs.'''
+        length = sys.getrecursionlimit() + 100
+        tgraph, outputs = chain_graph(length)
+        result = tgraph.run(outputs)
+        self.assertEqual(result[outputs[0]],
+                         [val + length for val in range(3)])
+
+    @ordered
+    def test_threads_same_results(self):
+        '''Test that the thread executor produces the same results as the
+        default serial flow.
+        '''
+        tgraph, outputs = wide_graph(4)
+        serial = tgraph.run(outputs)
+        threaded = tgraph.run(outputs, executor='threads', max_workers=2)
+        self.assertEqual(serial.get_keys(), threaded.get_keys())
+        for key in outputs:
+            self.assertEqual(serial[key], threaded[key])
+
+    @ordered
+    def test_threads_overlap_branches(self):
+        '''Test that independent branches run concurrently.'''
+        threads = set()
+        width = 4
+        tgraph, outputs = wide_graph(width, threads=threads,
+                                     barrier=threading.Barrier(width))
+        tgraph.run(outputs, executor='threads', max_workers=width)
+        self.assertGreaterEqual(len(threads), width)
+
+    @ordered
+    def test_processes_same_results(self):
+        '''Test that the process executor produces the same results as the
+        default serial flow. The source frame is large enough to be passed
+        between the processes through shared memory.
+        '''
+        tspec_list = [{
+            TaskSpecSchema.task_id: 'frame',
+            TaskSpecSchema.node_type: NodeFrame,
+            TaskSpecSchema.conf: {'npts': 100000},
+            TaskSpecSchema.inputs: {}
+        }]
+        for ibranch in range(3):
+            tspec_list.append({
+                TaskSpecSchema.task_id: 'mean{}'.format(ibranch),
+                TaskSpecSchema.node_type: NodeGroupMean,
+                TaskSpecSchema.conf: {},
+                TaskSpecSchema.inputs: {'df_in': 'frame.df_out'}
+            })
+        tgraph = TaskGraph(tspec_list)
+        outputs = ['mean{}.df_out'.format(i) for i in range(3)]
+        pids = ['mean{}.pid'.format(i) for i in range(3)]
+        serial = tgraph.run(outputs + pids)
+        parallel = tgraph.run(outputs + pids, executor='processes',
+                              max_workers=2)
+        for key in outputs:
+            pd.testing.assert_frame_equal(serial[key], parallel[key])
+        for key in pids:
+            self.assertEqual(serial[key], os.getpid())
+            self.assertNotEqual(parallel[key], os.getpid())
+
+    @ordered
+    def test_processes_overlap_branches(self):
+        '''Test that independent branches run concurrently in several
+        processes.
+        '''
+        width = 4
+        tgraph, outputs = wide_graph(width)
+        serial = tgraph.run(outputs)
+        with multiprocessing.Manager() as manager:
+            tgraph, outputs = wide_graph(width,
+                                         barrier=manager.Barrier(width))
+            parallel = tgraph.run(outputs, executor='processes',
+                                  max_workers=width)
+        for key in outputs:
+            self.assertEqual(serial[key], parallel[key])
+
+    @ordered
+    def test_report_memory(self):
+        '''Test that an output is alive until its last consumer started.'''
+        tgraph, outputs = wide_graph(3)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            tgraph.run(outputs, report_memory=True)
+        # the report is returned, not printed
+        self.assertEqual(out.getvalue(), '')
+        report = tgraph.memory_report
+        # the source output is released once the last branch started
+        self.assertEqual(report['peak_task'], 'branch2_0')
+        self.assertEqual(report['peak_ports'],
+                         ['branch0_0.out', 'branch1_0.out', 'branch2_0.out'])
+        branch_out = sys.getsizeof([val for val in range(10)])
+        self.assertEqual(report['peak_bytes'], 3 * branch_out)
+        self.assertEqual(report['total_bytes'],
+                         sys.getsizeof(list(range(10))) + 6 * branch_out)
+
+        chain, outputs = chain_graph(5)
+        chain.run(outputs, report_memory=True)
+        # at most one link of the chain is alive at a time
+        self.assertEqual(len(chain.memory_report['peak_ports']), 1)
+
+        # the lazy dask outputs are not sized
+        tgraph = TaskGraph([{
+            TaskSpecSchema.task_id: 'frame',
+            TaskSpecSchema.node_type: NodeDaskFrame,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {}
+        }, {
+            TaskSpecSchema.task_id: 'double',
+            TaskSpecSchema.node_type: NodeDaskFrame,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {'df_in': 'frame.df_out'}
+        }])
+        result = tgraph.run(['double.df_out'], report_memory=True)
+        self.assertEqual(result['double.df_out'].compute()['x'].sum(), 90)
+        self.assertEqual(tgraph.memory_report['unsized_ports'],
+                         ['frame.df_out', 'double.df_out'])
+        self.assertEqual(tgraph.memory_report['total_bytes'], 0)
+
+    @ordered
+    def test_unknown_executor(self):
+        '''Test that an unknown executor name is rejected.'''
+        tgraph, outputs = wide_graph(1)
+        with self.assertRaises(ValueError) as cm:
+            tgraph.run(outputs, executor='no_such_executor')
+        self.assertIn('Unknown executor "no_such_executor"',
+                      str(cm.exception))
+
+    @ordered
+    def test_threads_error(self):
+        '''Test that an exception raised in a worker thread is re-raised.'''
+        tgraph, outputs = wide_graph(2)
+        replace = {'branch0_0': {TaskSpecSchema.conf: {'offset': 'x'}}}
+        with self.assertRaises(TypeError):
+            tgraph.run(outputs, replace=replace, executor='threads')
+
+    @ordered
+    def test_dask_same_results(self):
+        '''Test that the dask executor produces the same results as the
+        default serial flow, and that independent branches overlap on the
+        local dask scheduler.
+        '''
+        width = 4
+        tgraph, outputs = wide_graph(width)
+        serial = tgraph.run(outputs)
+        overlap, _ = wide_graph(width, barrier=threading.Barrier(width))
+        result = overlap.run(outputs, executor='dask', max_workers=width,
+                             profile=True)
+        for key in outputs:
+            self.assertEqual(serial[key], result[key])
+        self.assertEqual(len(result.profile.to_dataframe()), 2 * width + 1)
+
+        # one task per node
+        delayed = tgraph.to_dask(outputs)
+        self.assertEqual(sorted(delayed), sorted(outputs))
+        result = dask.compute(delayed, scheduler='threads')[0]
+        for key in outputs:
+            self.assertEqual(serial[key], result[key])
+
+    @ordered
+    def test_dask_local_cluster(self):
+        '''Test the dask executor on a CPU LocalCluster with pandas nodes
+        computed in the worker processes.
+        '''
+        tspec_list = [{
+            TaskSpecSchema.task_id: 'frame',
+            TaskSpecSchema.node_type: NodeFrame,
+            TaskSpecSchema.conf: {'npts': 1000},
+            TaskSpecSchema.inputs: {}
+        }]
+        for ibranch in range(2):
+            tspec_list.append({
+                TaskSpecSchema.task_id: 'mean{}'.format(ibranch),
+                TaskSpecSchema.node_type: NodeGroupMean,
+                TaskSpecSchema.conf: {},
+                TaskSpecSchema.inputs: {'df_in': 'frame.df_out'}
+            })
+        tgraph = TaskGraph(tspec_list)
+        outputs = ['mean0.df_out', 'mean1.df_out', 'mean0.pid', 'mean1.pid']
+        serial = tgraph.run(outputs)
+        with LocalCluster(n_workers=2, threads_per_worker=1,
+                          dashboard_address=None) as cluster, \
+                Client(cluster):
+            result = tgraph.run(outputs, executor='dask')
+        for key in outputs[:2]:
+            pd.testing.assert_frame_equal(serial[key], result[key])
+        for key in outputs[2:]:
+            self.assertNotEqual(result[key], os.getpid())
+
+    @ordered
+    @unittest.skipIf(ray is None, 'ray is not installed')
+    def test_ray_same_results(self):
+        '''Test that the ray executor produces the same results as the
+        default serial flow, the nodes computed in the ray workers.
+        '''
+        tgraph, outputs = wide_graph(4)
+        serial = tgraph.run(outputs)
+        result = tgraph.run(outputs, executor='ray', max_workers=2,
+                            profile=True)
+        for key in outputs:
+            self.assertEqual(serial[key], result[key])
+        self.assertEqual(len(result.profile.to_dataframe()), 9)
+        ray.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
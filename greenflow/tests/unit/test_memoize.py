@@ -0,0 +1,222 @@
+'''
+greenflow Result Cache Unit Tests
+
+To run unittests:
+
+# Using standard library unittest
+
+python -m unittest -v
+python -m unittest tests/unit/test_memoize.py -v
+
+or
+
+python -m unittest discover <test_directory>
+python -m unittest discover -s <directory> -p 'test_*.py'
+
+# Using pytest
+# "conda install pytest" or "pip install pytest"
+pytest -v tests
+pytest -v tests/unit/test_memoize.py
+
+'''
+import unittest
+import warnings
+import numpy as np
+
+from greenflow.dataframe_flow import (
+    Node, PortsSpecSchema, NodePorts, MetaData, ConfSchema)
+from greenflow.dataframe_flow import (TaskSpecSchema, TaskGraph)
+from greenflow.dataframe_flow._result_cache import (
+    ResultCache, get_result_cache)
+from greenflow.dataframe_flow._node_flow import (
+    register_copy_function, _COPYS)
+
+from .utils import make_orderer
+from .custom_port_nodes import NodeDaskFrame
+
+ordered, compare = make_orderer()
+unittest.defaultTestLoader.sortTestMethodsUsing = compare
+
+# number of process calls per task id
+CALLS = {}
+
+
+class NodeArray(Node):
+
+    def ports_setup(self):
+        outports = {'out': {PortsSpecSchema.port_type: np.ndarray}}
+        return NodePorts(inports={}, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={}, outports={'out': {}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        CALLS[self.uid] = CALLS.get(self.uid, 0) + 1
+        return {'out': np.arange(self.conf['n'], dtype=np.float64)}
+
+
+class NodeWindow(Node):
+
+    def ports_setup(self):
+        inports = {'in': {PortsSpecSchema.port_type: np.ndarray}}
+        outports = {'out': {PortsSpecSchema.port_type: np.ndarray}}
+        return NodePorts(inports=inports, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={}, outports={'out': {}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        CALLS[self.uid] = CALLS.get(self.uid, 0) + 1
+        window = self.conf['window']
+        kernel = np.ones(window) / window
+        return {'out': np.convolve(inputs['in'], kernel, mode='valid')}
+
+
+class NodeDaskCounted(NodeDaskFrame):
+
+    def process(self, inputs):
+        CALLS[self.uid] = CALLS.get(self.uid, 0) + 1
+        return super().process(inputs)
+
+
+def sweep_graph():
+    tspec_list = [{
+        TaskSpecSchema.task_id: 'data',
+        TaskSpecSchema.node_type: NodeArray,
+        TaskSpecSchema.conf: {'n': 100},
+        TaskSpecSchema.inputs: {}
+    }, {
+        TaskSpecSchema.task_id: 'fast',
+        TaskSpecSchema.node_type: NodeWindow,
+        TaskSpecSchema.conf: {'window': 3},
+        TaskSpecSchema.inputs: {'in': 'data.out'}
+    }, {
+        TaskSpecSchema.task_id: 'slow',
+        TaskSpecSchema.node_type: NodeWindow,
+        TaskSpecSchema.conf: {'window': 10},
+        TaskSpecSchema.inputs: {'in': 'fast.out'}
+    }]
+    return TaskGraph(tspec_list)
+
+
+class TestMemoize(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        CALLS.clear()
+        get_result_cache().clear()
+
+    def tearDown(self):
+        get_result_cache().clear()
+
+    @ordered
+    def test_lru_budget(self):
+        '''Test that the least recently used outputs are evicted first.'''
+        cache = ResultCache(max_bytes=3000)
+        for key in ('a', 'b', 'c'):
+            self.assertTrue(cache.put(key, {'out': np.zeros(100)}))
+        self.assertEqual(cache.nbytes, 2400)
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('d', {'out': np.zeros(100)})
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+        self.assertLessEqual(cache.nbytes, 3000)
+        # larger than the budget
+        self.assertFalse(cache.put('e', {'out': np.zeros(1000)}))
+        self.assertNotIn('e', cache)
+        cache.max_bytes = 800
+        self.assertEqual(len(cache), 1)
+        self.assertIn('d', cache)
+
+    @ordered
+    def test_sweep_downstream(self):
+        '''Test that a replace sweep on a downstream node does not compute
+        the upstream nodes again.
+        '''
+        tgraph = sweep_graph()
+        outputs = ['slow.out']
+        first = tgraph.run(outputs, memoize=True)
+        self.assertEqual(CALLS, {'data': 1, 'fast': 1, 'slow': 1})
+
+        replace = {'slow': {TaskSpecSchema.conf: {'window': 20}}}
+        result = tgraph.run(outputs, replace=replace, memoize=True)
+        self.assertEqual(CALLS, {'data': 1, 'fast': 1, 'slow': 2})
+        self.assertEqual(len(result['slow.out']), 100 - 2 - 19)
+
+        # back to the first conf, all cached
+        again = tgraph.run(outputs, memoize=True)
+        self.assertEqual(CALLS, {'data': 1, 'fast': 1, 'slow': 2})
+        np.testing.assert_array_equal(first['slow.out'], again['slow.out'])
+
+        # upstream change invalidates the downstream nodes
+        replace = {'data': {TaskSpecSchema.conf: {'n': 50}}}
+        tgraph.run(outputs, replace=replace, memoize=True)
+        self.assertEqual(CALLS, {'data': 2, 'fast': 2, 'slow': 3})
+
+    @ordered
+    def test_no_memoize(self):
+        '''Test that the cache is neither used nor filled by default.'''
+        tgraph = sweep_graph()
+        tgraph.run(['slow.out'])
+        tgraph.run(['slow.out'])
+        self.assertEqual(CALLS, {'data': 2, 'fast': 2, 'slow': 2})
+        self.assertEqual(len(get_result_cache()), 0)
+        # the load option is restored after a memoized run
+        tgraph.run(['slow.out'], memoize=True)
+        tgraph.run(['slow.out'], memoize=True)
+        self.assertEqual(tgraph['data'].load, False)
+        self.assertIsNone(tgraph['data'].memo_key)
+        tgraph.run(['slow.out'])
+        self.assertEqual(CALLS, {'data': 4, 'fast': 4, 'slow': 4})
+
+    @ordered
+    def test_memoize_dask(self):
+        '''Test that the lazy dask outputs are memoized.'''
+        tgraph = TaskGraph([{
+            TaskSpecSchema.task_id: 'frame',
+            TaskSpecSchema.node_type: NodeDaskCounted,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {}
+        }, {
+            TaskSpecSchema.task_id: 'double',
+            TaskSpecSchema.node_type: NodeDaskCounted,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {'df_in': 'frame.df_out'}
+        }])
+        first = tgraph.run(['double.df_out'], memoize=True)
+        again = tgraph.run(['double.df_out'], memoize=True)
+        self.assertEqual(CALLS, {'frame': 1, 'double': 1})
+        self.assertEqual(len(get_result_cache()), 2)
+        self.assertEqual(list(again['double.df_out'].compute()['x']),
+                         list(first['double.df_out'].compute()['x']))
+
+    @ordered
+    def test_modify_outputs(self):
+        '''Test that modifying the outputs of a run in place does not
+        modify the cached outputs of the types with a copy function.
+        '''
+        register_copy_function(np.ndarray, np.copy)
+        self.addCleanup(_COPYS.pop, np.ndarray)
+        tgraph = sweep_graph()
+        outputs = ['fast.out', 'slow.out']
+        expected = tgraph.run(outputs)['slow.out'].copy()
+
+        # computed, then served from the cache
+        for _ in range(2):
+            result = tgraph.run(outputs, memoize=True)
+            result['fast.out'][:] = -1
+            result['slow.out'][:] = -1
+        self.assertEqual(CALLS, {'data': 2, 'fast': 2, 'slow': 2})
+        result = tgraph.run(outputs, memoize=True)
+        np.testing.assert_array_equal(result['slow.out'], expected)
+        self.assertEqual(result['fast.out'][0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,6 +24,8 @@ import warnings
 from greenflow.dataframe_flow import (
     Node, PortsSpecSchema, NodePorts, MetaData)
 from greenflow.dataframe_flow import (TaskSpecSchema, TaskGraph)
+from greenflow.dataframe_flow._node_flow import (
+    register_validator, _VALIDATORS)
 
 from .utils import make_orderer
 
@@ -237,6 +239,65 @@ class TestNodeTaskGraphTypechecking(unittest.TestCase):
 
         self.assertEqual(sumout, 45)
 
+    @ordered
+    def test_validate_policies(self):
+        '''Test the number of output validations of the validate policies
+        of the run.
+        '''
+        numgen_spec = copy.deepcopy(self.numgen_spec)
+        numproc_spec = copy.deepcopy(self.numproc_spec)
+        numgen_spec[TaskSpecSchema.conf] = {'columns_option': 'mylistnums'}
+        tspec_list = [numgen_spec, numproc_spec]
+
+        validated = []
+
+        def validate_mylist(val, meta, node):
+            validated.append(node.uid)
+            return True
+
+        register_validator(MyList, validate_mylist)
+        try:
+            for validate, nvalidated in (('full', 4), ('first-run', 1),
+                                         ('sample', 2), ('off', 0)):
+                del validated[:]
+                tgraph = TaskGraph(tspec_list)
+                for _ in range(4):
+                    sumout, = tgraph.run(['numproc.sum'], validate=validate,
+                                         validate_every=3)
+                    self.assertEqual(sumout, 45)
+                self.assertEqual(validated, ['numgen'] * nvalidated,
+                                 validate)
+
+            # a new node of the plan is validated again
+            tgraph.run(['numproc.sum'], validate='first-run',
+                       replace={'numgen': {TaskSpecSchema.conf: {
+                           'columns_option': 'mylistnums', 'seed': 1}}})
+            self.assertEqual(validated, ['numgen'])
+        finally:
+            _VALIDATORS.pop(MyList)
+
+        # the metadata mismatch is not checked either
+        numgen_spec[TaskSpecSchema.conf] = {'columns_option': 'rangenums',
+                                            'out_type': 'listnums'}
+        tgraph = TaskGraph(tspec_list)
+        sumout, = tgraph.run(['numproc.sum'], validate='off')
+        self.assertEqual(sumout, 45)
+        with self.assertRaises(LookupError):
+            tgraph.run(['numproc.sum'])
+        with self.assertRaises(ValueError):
+            tgraph.run(['numproc.sum'], validate='never')
+
+        # the new nodes are validated by the runs not sampled
+        numgen_spec[TaskSpecSchema.conf] = {'columns_option': 'listnums'}
+        tgraph = TaskGraph(tspec_list)
+        sumout, = tgraph.run(['numproc.sum'], validate='sample')
+        self.assertEqual(sumout, 45)
+        with self.assertRaises(LookupError):
+            tgraph.run(['numproc.sum'], validate='sample',
+                       replace={'numgen': {TaskSpecSchema.conf: {
+                           'columns_option': 'rangenums',
+                           'out_type': 'listnums'}}})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,359 @@
+'''
+greenflow TaskGraph Performance Unit Tests
+
+To run unittests:
+
+# Using standard library unittest
+
+python -m unittest -v
+python -m unittest tests/unit/test_performance.py -v
+
+or
+
+python -m unittest discover <test_directory>
+python -m unittest discover -s <directory> -p 'test_*.py'
+
+# Using pytest
+# "conda install pytest" or "pip install pytest"
+pytest -v tests
+pytest -v tests/unit/test_performance.py
+
+# The benchmarks with timing assertions are skipped unless
+GREENFLOW_BENCHMARK=1 pytest -v tests/unit/test_performance.py
+
+'''
+import gc
+import time
+import unittest
+import weakref
+import warnings
+import cloudpickle
+
+from greenflow.dataframe_flow import (
+    Node, PortsSpecSchema, NodePorts, MetaData, ConfSchema)
+from greenflow.dataframe_flow import (TaskSpecSchema, TaskGraph)
+from greenflow.dataframe_flow._node_flow import (
+    _get_nodetype, _get_class_nodetype, _NODETYPES)
+from greenflow.dataframe_flow.task import Task
+from greenflow.dataframe_flow.template_node_mixin import TemplateNodeMixin
+from greenflow.dataframe_flow.config_nodes_modules import (
+    get_node_tgraphmixin_instance, TGRAPHMIXIN_CLASS_CACHE)
+
+from .utils import make_orderer, benchmark
+
+ordered, compare = make_orderer()
+unittest.defaultTestLoader.sortTestMethodsUsing = compare
+
+
+class NodeFanIn(Node):
+    '''Node with `nports` input ports and one output port.'''
+
+    def ports_setup(self):
+        inports = {'in{}'.format(i): {PortsSpecSchema.port_type: int}
+                   for i in range(self.conf.get('nports', 0))}
+        outports = {'out': {PortsSpecSchema.port_type: int}}
+        return NodePorts(inports=inports, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={}, outports={'out': {}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        return {'out': sum(inputs.values())}
+
+
+class NodeWideMeta(Node):
+    '''Node adding a column to the metadata of its input port.'''
+
+    def ports_setup(self):
+        inports = {} if self.conf.get('ncols') else {
+            'in0': {PortsSpecSchema.port_type: int}}
+        outports = {'out': {PortsSpecSchema.port_type: int}}
+        return NodePorts(inports=inports, outports=outports)
+
+    def meta_setup(self):
+        ncols = self.conf.get('ncols')
+        if ncols:
+            columns = {'col{}'.format(i): 'float64' for i in range(ncols)}
+        else:
+            columns = self.get_input_meta('in0') or {}
+            columns[self.uid] = 'float64'
+        return MetaData(inports={'in0': {'col0': 'float64'}},
+                        outports={'out': columns})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        return {'out': 0}
+
+
+class NodeDynamic(TemplateNodeMixin, Node):
+    '''Node passing its dynamic input ports through, adding a column to
+    their metadata.
+    '''
+
+    def init(self):
+        TemplateNodeMixin.init(self)
+        self.template_ports_setup(in_ports={'in': {
+            PortsSpecSchema.port_type: int,
+            PortsSpecSchema.dynamic: {PortsSpecSchema.DYN_MATCH: True}
+        }}, out_ports={})
+        self.template_meta_setup(in_ports={}, out_ports={})
+
+    def meta_setup(self):
+        meta = super().meta_setup()
+        for columns in meta.outports.values():
+            columns[self.uid] = 'float64'
+        return meta
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        return {port: val for port, val in inputs.items() if port != 'in'}
+
+
+def wide_meta_graph(nnodes, ncols):
+    '''A source node with `ncols` columns feeding `nnodes - 1` nodes, each
+    adding a column to the columns of the source.
+    '''
+    tspec_list = [{
+        TaskSpecSchema.task_id: 'source',
+        TaskSpecSchema.node_type: NodeWideMeta,
+        TaskSpecSchema.conf: {'ncols': ncols},
+        TaskSpecSchema.inputs: {}
+    }]
+    for i in range(1, nnodes):
+        tspec_list.append({
+            TaskSpecSchema.task_id: 'node{}'.format(i),
+            TaskSpecSchema.node_type: NodeWideMeta,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {'in0': 'source.out'}
+        })
+    return TaskGraph(tspec_list)
+
+
+def fan_graph(nnodes):
+    '''A source node fanning out to `nnodes - 2` nodes which all fan in to a
+    single sink node.
+    '''
+    width = nnodes - 2
+    tspec_list = [{
+        TaskSpecSchema.task_id: 'source',
+        TaskSpecSchema.node_type: NodeFanIn,
+        TaskSpecSchema.conf: {},
+        TaskSpecSchema.inputs: {}
+    }]
+    for i in range(width):
+        tspec_list.append({
+            TaskSpecSchema.task_id: 'mid{}'.format(i),
+            TaskSpecSchema.node_type: NodeFanIn,
+            TaskSpecSchema.conf: {'nports': 1},
+            TaskSpecSchema.inputs: {'in0': 'source.out'}
+        })
+    tspec_list.append({
+        TaskSpecSchema.task_id: 'sink',
+        TaskSpecSchema.node_type: NodeFanIn,
+        TaskSpecSchema.conf: {'nports': width},
+        TaskSpecSchema.inputs: {'in{}'.format(i): 'mid{}.out'.format(i)
+                                for i in range(width)}
+    })
+    return TaskGraph(tspec_list)
+
+
+def time_build(tgraph, repeat=3):
+    '''Best of `repeat` build times in seconds.'''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tgraph.build()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+class TestPerformance(unittest.TestCase):
+    '''Benchmark the graph build on synthetic graphs.'''
+
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    @ordered
+    @benchmark
+    def test_build_scales_linearly(self):
+        '''Build time of a 10k nodes graph should be about 10 times the build
+        time of a 1k nodes graph. The fan in of the sink node grows with the
+        graph size, which is quadratic for a naive breadth first update.
+        '''
+        timings = {}
+        for nnodes in (1000, 10000):
+            timings[nnodes] = time_build(fan_graph(nnodes))
+        ratio = timings[10000] / timings[1000]
+        print('build time 1k nodes: {:.3f}s 10k nodes: {:.3f}s ratio: {:.1f}'
+              .format(timings[1000], timings[10000], ratio))
+        # linear is 10, quadratic would be 100
+        self.assertLess(ratio, 30)
+
+    @ordered
+    def test_build_wide_metadata(self):
+        '''The metadata of 300 columns is shared by the consumers instead of
+        deep copied per edge, and copied when a node asks for it.
+        '''
+        tgraph = wide_meta_graph(200, 300)
+        print('build time 200 nodes 300 columns: {:.3f}s'.format(
+            time_build(tgraph)))
+        source = tgraph['source']
+        out_meta = source._get_output_meta_frozen()['out']
+        for i in range(1, 200):
+            node = tgraph['node{}'.format(i)]
+            self.assertIs(node._get_input_meta_frozen()['in0'], out_meta)
+            self.assertEqual(len(node.meta_setup().outports['out']), 301)
+
+        with self.assertRaises(TypeError):
+            out_meta['col0'] = 'int64'
+        in_meta = tgraph['node1'].get_input_meta()
+        in_meta['in0']['col0'] = 'int64'
+        del in_meta['in0']['col1']
+        self.assertEqual(source.meta_setup().outports['out']['col0'],
+                         'float64')
+        self.assertEqual(tgraph['node2'].get_input_meta('in0')['col0'],
+                         'float64')
+        self.assertEqual(len(out_meta), 300)
+
+    @ordered
+    def test_dynamic_port_metadata(self):
+        '''The metadata passed to the dynamic output ports can be modified
+        without modifying the metadata of the parent node.
+        '''
+        tgraph = TaskGraph([{
+            TaskSpecSchema.task_id: 'source',
+            TaskSpecSchema.node_type: NodeWideMeta,
+            TaskSpecSchema.conf: {'ncols': 3},
+            TaskSpecSchema.inputs: {}
+        }, {
+            TaskSpecSchema.task_id: 'dynamic',
+            TaskSpecSchema.node_type: NodeDynamic,
+            TaskSpecSchema.conf: {},
+            # dynamic ports are named after the output port they pass
+            TaskSpecSchema.inputs: {'source@out': 'source.out'}
+        }])
+        tgraph.build()
+        self.assertEqual(
+            list(tgraph['dynamic'].meta_setup().outports['source@out']),
+            ['col0', 'col1', 'col2', 'dynamic'])
+        self.assertEqual(len(tgraph['source'].meta_setup().outports['out']),
+                         3)
+        result = tgraph.run(['dynamic.source@out'])
+        self.assertEqual(result['dynamic.source@out'], 0)
+
+    @ordered
+    def test_nodetype_resolution(self):
+        '''The implementation classes of a node are resolved once per class
+        instead of scanning the MRO on every call.
+        '''
+        tgraph = fan_graph(1000)
+        tgraph.build()
+        node = tgraph['sink']
+        # registered when the task graph node class is created
+        self.assertIn(node.__class__, _NODETYPES)
+        self.assertEqual(_get_nodetype(node), [NodeFanIn])
+
+        # the resolved node classes are not kept alive
+        nodecls = type('NodeFanInCopy', (NodeFanIn,), {})
+        self.assertEqual(_get_class_nodetype(nodecls), (nodecls, NodeFanIn))
+        self.assertEqual(_get_class_nodetype(nodecls), (nodecls, NodeFanIn))
+        nodecls_ref = weakref.ref(nodecls)
+        del nodecls
+        gc.collect()
+        self.assertIsNone(nodecls_ref())
+
+    @ordered
+    def test_instantiate_nodes(self):
+        '''The task graph nodes of the same node class share their class.'''
+        tasks = [Task({
+            TaskSpecSchema.task_id: 'node{}'.format(i),
+            TaskSpecSchema.node_type: NodeFanIn,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {}
+        }) for i in range(10000)]
+
+        nodes = [get_node_tgraphmixin_instance(NodeFanIn, task)
+                 for task in tasks]
+        self.assertEqual(len(set(node.__class__ for node in nodes)), 1)
+
+        node = nodes[0]
+        self.assertTrue(repr(node).startswith('<NodeInTaskGraph {}.NodeFanIn'
+                                              .format(__name__)))
+        node_copy = cloudpickle.loads(cloudpickle.dumps(node))
+        self.assertEqual(node_copy.uid, 'node0')
+        self.assertEqual(_get_nodetype(node_copy), [NodeFanIn])
+        self.assertTrue(repr(node_copy).startswith('<NodeInTaskGraph'))
+
+        # the node classes are released with their nodes
+        nodecls = type('NodeFanInCopy', (NodeFanIn,), {})
+        node = get_node_tgraphmixin_instance(nodecls, tasks[0])
+        self.assertIs(get_node_tgraphmixin_instance(nodecls, tasks[1])
+                      .__class__, node.__class__)
+        nodecls_ref = weakref.ref(nodecls)
+        del nodecls, node
+        # the first collection releases the task graph node class
+        gc.collect()
+        gc.collect()
+        self.assertIsNone(nodecls_ref())
+
+    @ordered
+    @benchmark
+    def test_benchmark_nodetype_resolution(self):
+        '''Resolving the implementation classes of a node from the cache is
+        faster than scanning the MRO.
+        '''
+        tgraph = fan_graph(1000)
+        tgraph.build()
+        node = tgraph['sink']
+        ncalls = 10000
+        start = time.perf_counter()
+        for _ in range(ncalls):
+            _NODETYPES.pop(node.__class__, None)
+            _get_nodetype(node)
+        scan = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(ncalls):
+            _get_nodetype(node)
+        cached = time.perf_counter() - start
+        print('node type resolution {} calls scan: {:.3f}s cached: {:.3f}s'
+              .format(ncalls, scan, cached))
+        self.assertLess(cached, scan)
+        print('build time 1k nodes: {:.3f}s'.format(time_build(tgraph)))
+
+    @ordered
+    @benchmark
+    def test_benchmark_instantiate_nodes(self):
+        '''Instantiating the nodes of a shared class is faster than creating
+        a class per node.
+        '''
+        tasks = [Task({
+            TaskSpecSchema.task_id: 'node{}'.format(i),
+            TaskSpecSchema.node_type: NodeFanIn,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {}
+        }) for i in range(10000)]
+
+        start = time.perf_counter()
+        for task in tasks:
+            TGRAPHMIXIN_CLASS_CACHE.pop(NodeFanIn, None)
+            get_node_tgraphmixin_instance(NodeFanIn, task)
+        per_node = time.perf_counter() - start
+        start = time.perf_counter()
+        nodes = [get_node_tgraphmixin_instance(NodeFanIn, task)
+                 for task in tasks]
+        cached = time.perf_counter() - start
+        print('instantiate 10k nodes class per node: {:.3f}s cached: {:.3f}s'
+              .format(per_node, cached))
+        self.assertEqual(len(set(node.__class__ for node in nodes)), 1)
+        self.assertLess(cached, per_node)
+
+
+if __name__ == '__main__':
+    unittest.main()
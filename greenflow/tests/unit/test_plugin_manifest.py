@@ -0,0 +1,187 @@
+'''
+greenflow Lazy Plugin Loading Unit Tests
+
+To run unittests:
+
+# Using standard library unittest
+
+python -m unittest -v
+python -m unittest tests/unit/test_plugin_manifest.py -v
+
+or
+
+python -m unittest discover <test_directory>
+python -m unittest discover -s <directory> -p 'test_*.py'
+
+# Using pytest
+# "conda install pytest" or "pip install pytest"
+pytest -v tests
+pytest -v tests/unit/test_plugin_manifest.py
+
+'''
+import os
+import sys
+import json
+import shutil
+import tempfile
+import importlib
+import unittest
+import warnings
+
+from greenflow.dataframe_flow import (TaskSpecSchema, TaskGraph)
+from greenflow.dataframe_flow import _plugin_manifest
+from greenflow.dataframe_flow._plugin_manifest import (
+    write_manifest, MANIFEST_FILE)
+from greenflow.cli import main
+
+from .utils import make_orderer
+
+ordered, compare = make_orderer()
+unittest.defaultTestLoader.sortTestMethodsUsing = compare
+
+PLUGIN = 'greenflow_test_plugin'
+
+NODES_CODE = '''
+from greenflow.dataframe_flow import (
+    Node, PortsSpecSchema, NodePorts, MetaData, ConfSchema)
+
+
+class {name}(Node):
+
+    def ports_setup(self):
+        return NodePorts(inports={{}}, outports={{
+            'out': {{PortsSpecSchema.port_type: int}}}})
+
+    def meta_setup(self):
+        return MetaData(inports={{}}, outports={{'out': {{}}}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        return {{'out': {value}}}
+'''
+
+ENTRY_POINTS = '''
+[greenflow.plugin]
+{plugin}.light = {plugin}.light
+{plugin}.heavy = {plugin}.heavy
+'''
+
+
+class TestPluginManifest(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        self._test_dir = tempfile.mkdtemp()
+        self._cache_dir = os.environ.get('GREENFLOW_CACHE_DIR')
+        os.environ['GREENFLOW_CACHE_DIR'] = os.path.join(self._test_dir,
+                                                         'cache')
+        package_dir = os.path.join(self._test_dir, PLUGIN)
+        for subpackage, name, value in (('light', 'NodeLight', 1),
+                                        ('heavy', 'NodeHeavy', 2)):
+            os.makedirs(os.path.join(package_dir, subpackage))
+            with open(os.path.join(package_dir, subpackage, 'nodes.py'),
+                      'w') as f:
+                f.write(NODES_CODE.format(name=name, value=value))
+            with open(os.path.join(package_dir, subpackage, '__init__.py'),
+                      'w') as f:
+                f.write('from .nodes import {}\n'.format(name))
+        with open(os.path.join(package_dir, '__init__.py'), 'w') as f:
+            f.write('')
+        dist_info = os.path.join(self._test_dir,
+                                 '{}-0.1.dist-info'.format(PLUGIN))
+        os.makedirs(dist_info)
+        with open(os.path.join(dist_info, 'METADATA'), 'w') as f:
+            f.write('Metadata-Version: 2.1\nName: {}\nVersion: 0.1\n'
+                    .format(PLUGIN))
+        with open(os.path.join(dist_info, 'entry_points.txt'), 'w') as f:
+            f.write(ENTRY_POINTS.format(plugin=PLUGIN))
+        sys.path.append(self._test_dir)
+        importlib.invalidate_caches()
+        self.reset_plugins()
+
+    def tearDown(self):
+        sys.path.remove(self._test_dir)
+        self.reset_plugins()
+        if self._cache_dir is None:
+            os.environ.pop('GREENFLOW_CACHE_DIR', None)
+        else:
+            os.environ['GREENFLOW_CACHE_DIR'] = self._cache_dir
+        shutil.rmtree(self._test_dir)
+
+    def reset_plugins(self):
+        '''Forget the test plugin as in a new process.'''
+        for name in list(sys.modules):
+            if name.startswith(PLUGIN):
+                del sys.modules[name]
+        _plugin_manifest._ENTRY_POINTS = None
+        _plugin_manifest._MANIFESTS.clear()
+        _plugin_manifest._NODE_CLASSES.clear()
+
+    def run_light(self):
+        tgraph = TaskGraph([{
+            TaskSpecSchema.task_id: 'light',
+            TaskSpecSchema.node_type: 'NodeLight',
+            TaskSpecSchema.module: PLUGIN + '.light',
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {}
+        }])
+        return tgraph.run(['light.out'])['light.out']
+
+    @ordered
+    def test_first_scan(self):
+        '''Test that only the plugin of the graph is imported, and that its
+        manifest is written to the cache directory on the first scan.
+        '''
+        self.assertTrue(_plugin_manifest.is_plugin(PLUGIN + '.light'))
+        self.assertEqual(self.run_light(), 1)
+        self.assertIn(PLUGIN + '.light', sys.modules)
+        self.assertNotIn(PLUGIN + '.heavy', sys.modules)
+
+        cache_file = os.path.join(self._test_dir, 'cache', 'manifests',
+                                  '{}-0.1.json'.format(PLUGIN))
+        with open(cache_file) as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest, {PLUGIN + '.light': {
+            'NodeLight': PLUGIN + '.light.nodes:NodeLight'}})
+
+        # the next process finds the node class with the manifest
+        self.reset_plugins()
+        self.assertEqual(self.run_light(), 1)
+        self.assertIn((PLUGIN + '.light', 'NodeLight'),
+                      _plugin_manifest._NODE_CLASSES)
+        self.assertNotIn(PLUGIN + '.heavy', sys.modules)
+
+    @ordered
+    def test_package_manifest(self):
+        '''Test the manifest written in the package directory.'''
+        self.assertEqual(main(['manifest', PLUGIN]), 0)
+        filename = os.path.join(self._test_dir, PLUGIN, MANIFEST_FILE)
+        with open(filename) as f:
+            manifest = json.load(f)
+        self.assertEqual(sorted(manifest), [PLUGIN + '.heavy',
+                                            PLUGIN + '.light'])
+        self.assertEqual(manifest[PLUGIN + '.heavy'],
+                         {'NodeHeavy': PLUGIN + '.heavy.nodes:NodeHeavy'})
+
+        self.reset_plugins()
+        self.assertEqual(self.run_light(), 1)
+        self.assertNotIn(PLUGIN + '.heavy', sys.modules)
+        # no manifest written on a scan
+        self.assertFalse(os.path.exists(os.path.join(self._test_dir,
+                                                     'cache')))
+
+        # a stale manifest falls back to loading the plugin
+        other = os.path.join(self._test_dir, 'other.json')
+        self.assertEqual(write_manifest(PLUGIN, filename=other), other)
+        manifest[PLUGIN + '.light']['NodeLight'] = \
+            PLUGIN + '.light.nodes:NodeMissing'
+        with open(filename, 'w') as f:
+            json.dump(manifest, f)
+        self.reset_plugins()
+        self.assertEqual(self.run_light(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
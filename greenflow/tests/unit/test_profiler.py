@@ -0,0 +1,184 @@
+'''
+greenflow TaskGraph Profiler Unit Tests
+
+To run unittests:
+
+# Using standard library unittest
+
+python -m unittest -v
+python -m unittest tests/unit/test_profiler.py -v
+
+or
+
+python -m unittest discover <test_directory>
+python -m unittest discover -s <directory> -p 'test_*.py'
+
+# Using pytest
+# "conda install pytest" or "pip install pytest"
+pytest -v tests
+pytest -v tests/unit/test_profiler.py
+
+'''
+import os
+import json
+import time
+import shutil
+import tempfile
+import unittest
+import warnings
+import pandas as pd
+import dask.dataframe as dd
+
+from greenflow.dataframe_flow import (
+    Node, PortsSpecSchema, NodePorts, MetaData, ConfSchema)
+from greenflow.dataframe_flow import (TaskSpecSchema, TaskGraph)
+
+from .utils import make_orderer
+from .test_executors import wide_graph
+from .custom_port_nodes import NodeDaskFrame
+
+ordered, compare = make_orderer()
+unittest.defaultTestLoader.sortTestMethodsUsing = compare
+
+
+class NodeDelayedScale(Node):
+    '''Processes the partitions of the input with dask delayed.'''
+
+    def init(self):
+        self.delayed_process = True
+
+    def ports_setup(self):
+        inports = {'df_in': {PortsSpecSchema.port_type: [dd.DataFrame,
+                                                         pd.DataFrame]}}
+        outports = {'df_out': {PortsSpecSchema.port_type: [dd.DataFrame,
+                                                           pd.DataFrame]},
+                    'nrows': {PortsSpecSchema.port_type: int}}
+        return NodePorts(inports=inports, outports=outports)
+
+    def meta_setup(self):
+        return MetaData(inports={'df_in': {'x': 'float64'}},
+                        outports={'df_out': {'x': 'float64'}, 'nrows': {}})
+
+    def conf_schema(self):
+        return ConfSchema()
+
+    def process(self, inputs):
+        time.sleep(0.1)
+        df = inputs['df_in']
+        return {'df_out': df * 2.0, 'nrows': len(df)}
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+
+    @ordered
+    def test_profile(self):
+        '''Test the node profiles of a serial run.'''
+        sleep = 0.05
+        tgraph, outputs = wide_graph(2, sleep=sleep)
+        self.assertIsNone(tgraph.run(outputs).profile)
+
+        profile = tgraph.run(outputs, profile=True).profile
+        df = profile.to_dataframe()
+        self.assertEqual(sorted(df.index),
+                         ['branch0_0', 'branch0_1', 'branch1_0', 'branch1_1',
+                          'source'])
+        self.assertEqual(df.loc['source', 'node_type'], 'NodeSource')
+        for column in ('wall_time', 'cpu_time', 'validate_time',
+                       'copy_time', 'process_time', 'save_time',
+                       'output_rows', 'output_bytes', 'peak_memory'):
+            self.assertIn(column, df.columns)
+        branch = df.loc['branch1_1']
+        self.assertGreaterEqual(branch['process_time'], sleep)
+        self.assertGreaterEqual(branch['wall_time'],
+                                branch['process_time'] +
+                                branch['validate_time'])
+        # sleeping does not use the CPU
+        self.assertLess(branch['cpu_time'], sleep)
+        self.assertGreater(branch['validate_time'], 0)
+        self.assertEqual(branch['output_rows'], 10)
+        self.assertGreater(branch['output_bytes'], 0)
+        self.assertGreater(branch['peak_memory'], 0)
+        self.assertEqual(profile['source'].ports['out'][0], 10)
+
+    @ordered
+    def test_profile_processes(self):
+        '''Test that the profiles are sent back by the worker processes.'''
+        sleep = 0.05
+        tgraph, outputs = wide_graph(2, sleep=sleep)
+        profile = tgraph.run(outputs, profile=True, executor='processes',
+                             max_workers=2).profile
+        self.assertEqual(len(profile), 5)
+        for record in profile:
+            if record.task_id != 'source':
+                self.assertGreaterEqual(record.phases['process'], sleep)
+            self.assertIsNotNone(record.peak_memory)
+
+    @ordered
+    def test_profile_delayed(self):
+        '''Test that the dask graph time of a delayed node is not counted as
+        process time.
+        '''
+        tgraph = TaskGraph([{
+            TaskSpecSchema.task_id: 'frame',
+            TaskSpecSchema.node_type: NodeDaskFrame,
+            TaskSpecSchema.conf: {'n': 100},
+            TaskSpecSchema.inputs: {}
+        }, {
+            TaskSpecSchema.task_id: 'scale',
+            TaskSpecSchema.node_type: NodeDelayedScale,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {'df_in': 'frame.df_out'}
+        }])
+        result = tgraph.run(['scale.df_out', 'scale.nrows'], profile=True)
+        self.assertEqual(result['scale.nrows'], 50)
+        record = result.profile['scale']
+        # one partition is computed for the nrows port
+        self.assertGreaterEqual(record.phases['process'], 0.1)
+        self.assertGreater(record.phases['delayed'], 0)
+        self.assertLess(record.phases['delayed'], record.wall_time)
+        # the rows of a dask dataframe are unknown without a compute
+        self.assertEqual(record.ports['df_out'], (None, None))
+        self.assertEqual(record.ports['nrows'][0], None)
+
+    @ordered
+    def test_trace(self):
+        '''Test the Chrome trace of a run on several processes.'''
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'run.json')
+            tgraph, outputs = wide_graph(2, sleep=0.05)
+            result = tgraph.run(outputs, executor='processes',
+                                max_workers=2, trace=filename)
+            self.assertIsNone(result.profile)
+            with open(filename) as f:
+                events = json.load(f)['traceEvents']
+        finally:
+            shutil.rmtree(tmpdir)
+
+        runs = {event['name']: event for event in events
+                if event.get('cat') == 'node'}
+        self.assertEqual(sorted(runs), ['branch0_0', 'branch0_1',
+                                        'branch1_0', 'branch1_1', 'source'])
+        self.assertNotEqual(runs['branch0_0']['pid'], os.getpid())
+        # the children start after the parents
+        self.assertGreaterEqual(runs['branch0_1']['ts'],
+                                runs['branch0_0']['ts'] +
+                                runs['branch0_0']['dur'])
+        phases = [event for event in events if event.get('cat') == 'phase']
+        process = [event for event in phases if event['name'] == 'process']
+        self.assertEqual(len(process), 5)
+        for event in process:
+            run = runs[event['args']['task_id']]
+            self.assertEqual(event['tid'], run['tid'])
+            self.assertGreaterEqual(event['ts'], run['ts'])
+        arrows = [event for event in events if event.get('cat') == 'edge']
+        # source to the two branches and along the two branches
+        self.assertEqual(sorted(event['ph'] for event in arrows),
+                         ['f'] * 4 + ['s'] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+'''
+greenflow TaskGraph Run Events Unit Tests
+
+To run unittests:
+
+# Using standard library unittest
+
+python -m unittest -v
+python -m unittest tests/unit/test_run_events.py -v
+
+or
+
+python -m unittest discover <test_directory>
+python -m unittest discover -s <directory> -p 'test_*.py'
+
+# Using pytest
+# "conda install pytest" or "pip install pytest"
+pytest -v tests
+pytest -v tests/unit/test_run_events.py
+
+'''
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import warnings
+
+from greenflow.dataframe_flow import (TaskSpecSchema, TaskGraph)
+from greenflow.dataframe_flow._run_events import (
+    register_run_hook, unregister_run_hook, RUN_EVENTS)
+from greenflow.dataframe_flow._result_cache import get_result_cache
+from greenflow.dataframe_flow.run_exporters import (
+    JsonLinesLogger, PrometheusTextExporter)
+
+from .utils import make_orderer
+from .test_executors import wide_graph
+from .custom_port_nodes import NodeDaskFrame
+
+ordered, compare = make_orderer()
+unittest.defaultTestLoader.sortTestMethodsUsing = compare
+
+
+class TestRunEvents(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', category=DeprecationWarning)
+        self._test_dir = tempfile.mkdtemp()
+        self.events = []
+        register_run_hook('test', self.events.append)
+        get_result_cache().clear()
+
+    def tearDown(self):
+        for name in ('test', 'jsonl', 'prometheus', 'broken'):
+            unregister_run_hook(name)
+        shutil.rmtree(self._test_dir)
+        get_result_cache().clear()
+
+    @ordered
+    def test_events(self):
+        '''Test the events of a run, and the cache events of memoized runs.
+        '''
+        tgraph, outputs = wide_graph(2, sleep=0.02)
+        tgraph.run(outputs, executor='threads')
+        names = [event['event'] for event in self.events]
+        self.assertEqual(names[0], 'run_start')
+        self.assertEqual(names[-1], 'run_end')
+        self.assertEqual(names.count('node_start'), 5)
+        self.assertEqual(names.count('node_end'), 5)
+        self.assertEqual(names.count('validation_time'), 5)
+        self.assertEqual(names.count('bytes_out'), 5)
+        self.assertEqual(len(set(event['run_id'] for event in self.events)),
+                         1)
+        for event in self.events:
+            for field in RUN_EVENTS[event['event']]:
+                self.assertIn(field, event)
+        node_end = [event for event in self.events
+                    if event['event'] == 'node_end' and
+                    event['task_id'] == 'branch0_1'][0]
+        self.assertEqual(node_end['node_type'], 'NodeSleepSum')
+        self.assertGreaterEqual(node_end['seconds'], 0.02)
+        self.assertIsNone(self.events[-1]['error'])
+
+        del self.events[:]
+        tgraph.run(outputs, memoize=True)
+        misses = [event['task_id'] for event in self.events
+                  if event['event'] == 'cache_miss']
+        self.assertEqual(len(misses), 5)
+        del self.events[:]
+        tgraph.run(outputs, memoize=True)
+        hits = [event for event in self.events
+                if event['event'] == 'cache_hit']
+        self.assertEqual(sorted(event['task_id'] for event in hits),
+                         ['branch0_1', 'branch1_1'])
+        self.assertEqual(hits[0]['cache'], 'memory')
+
+    @ordered
+    def test_failures(self):
+        '''Test that a failing hook only warns and that the end event of a
+        failed run has the error.
+        '''
+        def broken(event):
+            raise RuntimeError('broken hook')
+
+        register_run_hook('broken', broken)
+        tgraph, outputs = wide_graph(1)
+        with warnings.catch_warnings(record=True) as warns:
+            warnings.simplefilter('always')
+            tgraph.run(outputs)
+        self.assertTrue(any('broken hook' in str(warn.message)
+                            for warn in warns))
+        unregister_run_hook('broken')
+
+        del self.events[:]
+        replace = {'branch0_0': {TaskSpecSchema.conf: {'offset': 'x'}}}
+        with self.assertRaises(TypeError):
+            tgraph.run(outputs, replace=replace)
+        self.assertEqual(self.events[-1]['event'], 'run_end')
+        self.assertIn('TypeError', self.events[-1]['error'])
+
+    @ordered
+    def test_exporters(self):
+        '''Test the JSON lines logger and the Prometheus text exporter.'''
+        log = os.path.join(self._test_dir, 'runs.jsonl')
+        prom = os.path.join(self._test_dir, 'greenflow.prom')
+        register_run_hook('jsonl', JsonLinesLogger(log))
+        register_run_hook('prometheus', PrometheusTextExporter(prom))
+        tgraph, outputs = wide_graph(2)
+        tgraph.run(outputs, memoize=True)
+        tgraph.run(outputs, memoize=True)
+
+        with open(log) as f:
+            logged = [json.loads(line) for line in f]
+        self.assertEqual(len(logged), len(self.events))
+        self.assertEqual([event['event'] for event in logged],
+                         [event['event'] for event in self.events])
+
+        with open(prom) as f:
+            text = f.read()
+        labels = 'node_type="NodeSleepSum",task_id="branch0_0"'
+        # the second run loads the outputs of the last nodes from the cache
+        self.assertIn('greenflow_node_seconds_count{{{}}} 1'.format(labels),
+                      text)
+        self.assertIn('greenflow_node_seconds_bucket{{{},le="+Inf"}} 1'
+                      .format(labels), text)
+        labels = 'node_type="NodeSleepSum",task_id="branch0_1"'
+        self.assertIn('greenflow_cache_hits_total{{cache="memory",{}}} 1'
+                      .format(labels), text)
+        self.assertIn('greenflow_cache_misses_total{{{}}} 1'.format(labels),
+                      text)
+        self.assertIn('greenflow_runs_total{status="ok"} 2', text)
+        self.assertIn('# TYPE greenflow_node_seconds histogram', text)
+        # no temporary file left behind
+        self.assertEqual(sorted(os.listdir(self._test_dir)),
+                         ['greenflow.prom', 'runs.jsonl'])
+
+    @ordered
+    def test_lazy_outputs(self):
+        '''Test that the lazy dask outputs are not sized and do not break
+        the exporters.
+        '''
+        prom = os.path.join(self._test_dir, 'greenflow.prom')
+        register_run_hook('prometheus', PrometheusTextExporter(prom))
+        tgraph = TaskGraph([{
+            TaskSpecSchema.task_id: 'frame',
+            TaskSpecSchema.node_type: NodeDaskFrame,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {}
+        }, {
+            TaskSpecSchema.task_id: 'double',
+            TaskSpecSchema.node_type: NodeDaskFrame,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {'df_in': 'frame.df_out'}
+        }])
+        with warnings.catch_warnings(record=True) as warns:
+            warnings.simplefilter('always')
+            result = tgraph.run(['double.df_out'])
+        self.assertEqual(result['double.df_out'].compute()['x'].sum(), 90)
+        self.assertFalse(any('Run hook' in str(warn.message)
+                             for warn in warns))
+        sizes = [event['nbytes'] for event in self.events
+                 if event['event'] == 'bytes_out']
+        self.assertEqual(sizes, [None, None])
+        with open(prom) as f:
+            self.assertIn('greenflow_runs_total{status="ok"} 1', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
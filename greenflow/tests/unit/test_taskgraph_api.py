@@ -20,6 +20,7 @@ pytest -v tests/unit/test_taskgraph_api.py
 
 '''
 import os
+import sys
 import shutil
 import tempfile
 from difflib import context_diff
@@ -31,6 +32,10 @@ import pandas as pd
 from greenflow.dataframe_flow import (TaskSpecSchema, TaskGraph)
 from greenflow.dataframe_flow.config_nodes_modules import DEFAULT_MODULE
 from greenflow.dataframe_flow import Node
+from greenflow.dataframe_flow import (NodePorts, MetaData, ConfSchema,
+                                      PortsSpecSchema)
+from greenflow.dataframe_flow.taskGraph import add_module_from_base64
+from greenflow.dataframe_flow.util import get_encoded_class
 
 from .utils import make_orderer
 
@@ -173,6 +178,149 @@ class TestTaskGraphAPI(unittest.TestCase):
         # self.assertAlmostEqual(dist_sum, 0.0, places, msg, delta)
         self.assertAlmostEqual(dist_sum, 761.062831178)  # match to 7 places
 
+    @ordered
+    def test_run_subgraph(self):
+        '''Test that only the tasks the outputs depend on are built.
+        '''
+        # this task fails if it is instantiated
+        self.tgraph.extend([{
+            TaskSpecSchema.task_id: 'broken_task',
+            TaskSpecSchema.node_type: 'NoSuchNode',
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {
+                'points_df_in': 'points_task.points_df_out'
+            }
+        }])
+        with self.assertRaises(Exception):
+            self.tgraph.build()
+
+        self.tgraph.build(outputs=['distance_by_df.distance_df'])
+        points_node = self.tgraph['points_task']
+        self.assertEqual([out['to_node'].uid for out in points_node.outputs],
+                         ['distance_by_df'])
+        with self.assertRaises(KeyError):
+            self.tgraph['broken_task']
+
+        outlist = ['points_task.points_df_out']
+        (points_df, ) = self.tgraph.run(outputs=outlist)
+        self.assertEqual(len(points_df), 1000)
+        # the run does not build the other tasks either
+        with self.assertRaises(KeyError) as cm:
+            self.tgraph['distance_by_df']
+        self.assertIn('build()', str(cm.exception))
+        with self.assertRaises(KeyError) as cm:
+            self.tgraph['no_such_task']
+        self.assertNotIn('build()', str(cm.exception))
+
+    @ordered
+    def test_run_reuse(self):
+        '''Test that repeated runs reuse the nodes that are unchanged.
+        '''
+        outlist = ['distance_by_df.distance_df']
+        replace_spec = {
+            'points_task': {
+                TaskSpecSchema.conf: {
+                    'npts': 1000,
+                    'nseed': 2335
+                }
+            }
+        }
+        (dist_df, ) = self.tgraph.run(outputs=outlist, replace=replace_spec)
+        points_node = self.tgraph['points_task']
+        distance_node = self.tgraph['distance_by_df']
+
+        (dist_df_reuse, ) = self.tgraph.run(outputs=outlist,
+                                            replace=replace_spec)
+        self.assertIs(points_node, self.tgraph['points_task'])
+        self.assertIs(distance_node, self.tgraph['distance_by_df'])
+        pd.testing.assert_frame_equal(dist_df, dist_df_reuse)
+
+        # downstream change, the upstream node is reused
+        replace_spec['distance_by_df'] = {TaskSpecSchema.conf: {'x': 1}}
+        self.tgraph.run(outputs=outlist, replace=replace_spec)
+        self.assertIs(points_node, self.tgraph['points_task'])
+        self.assertIsNot(distance_node, self.tgraph['distance_by_df'])
+
+        # upstream change, all the nodes are rebuilt
+        distance_node = self.tgraph['distance_by_df']
+        replace_spec['points_task'][TaskSpecSchema.conf]['nseed'] = 1
+        (dist_df_new, ) = self.tgraph.run(outputs=outlist,
+                                          replace=replace_spec)
+        self.assertIsNot(points_node, self.tgraph['points_task'])
+        self.assertIsNot(distance_node, self.tgraph['distance_by_df'])
+        self.assertNotAlmostEqual(dist_df['distance_df'].sum(),
+                                  dist_df_new['distance_df'].sum())
+
+        # explicit build does not reuse the nodes
+        points_node = self.tgraph['points_task']
+        self.tgraph.build(replace=replace_spec)
+        self.assertIsNot(points_node, self.tgraph['points_task'])
+
+    @ordered
+    def test_run_reuse_registered(self):
+        '''Test that the nodes are not reused once their class is replaced
+        in the module the node type is found in.
+        '''
+        class NodeNumber(Node):
+
+            def ports_setup(self):
+                return NodePorts(inports={}, outports={
+                    'out': {PortsSpecSchema.port_type: int}})
+
+            def meta_setup(self):
+                return MetaData(inports={}, outports={'out': {}})
+
+            def conf_schema(self):
+                return ConfSchema()
+
+            def process(self, inputs):
+                return {'out': 1}
+
+        class NodeNumberChanged(NodeNumber):
+
+            def process(self, inputs):
+                return {'out': 2}
+
+        # the changed class replaces the registered one of the same name
+        NodeNumberChanged.__name__ = 'NodeNumber'
+
+        module_name = 'test_reuse_registered_nodes'
+        self.addCleanup(sys.modules.pop, module_name, None)
+        tgraph = TaskGraph([{
+            TaskSpecSchema.task_id: 'number',
+            TaskSpecSchema.node_type: 'NodeNumber',
+            TaskSpecSchema.module: module_name,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {}
+        }])
+        add_module_from_base64(module_name,
+                               get_encoded_class(NodeNumber))
+        (out, ) = tgraph.run(outputs=['number.out'])
+        self.assertEqual(out, 1)
+
+        add_module_from_base64(module_name,
+                               get_encoded_class(NodeNumberChanged))
+        (out, ) = tgraph.run(outputs=['number.out'])
+        self.assertEqual(out, 2)
+
+        # the nodes opting out of the reuse are built again
+        class NodeNumberFresh(NodeNumber):
+
+            @classmethod
+            def reuse_key(cls, conf):
+                return None
+
+        tgraph = TaskGraph([{
+            TaskSpecSchema.task_id: 'number',
+            TaskSpecSchema.node_type: NodeNumberFresh,
+            TaskSpecSchema.conf: {},
+            TaskSpecSchema.inputs: {}
+        }])
+        tgraph.run(outputs=['number.out'])
+        node = tgraph['number']
+        tgraph.run(outputs=['number.out'])
+        self.assertIsNot(tgraph['number'], node)
+
     @ordered
     def test_save(self):
         '''Test that a taskgraph can be save to a yaml file.